@@ -0,0 +1,74 @@
+"""
+Compara la memoria que ocupa una ch maquina llena con el modelo anterior (una lista
+de diccionarios) y con la memoria por columnas.
+
+Uso: python benchmarks/memoria.py [celdas]
+"""
+import sys
+import tracemalloc
+
+from chmaquina.memoria import Memoria
+
+
+def celdas(cantidad):
+    """Celdas parecidas a las que deja `Maquina.cargar`: código, variables y acumulador"""
+    for posicion in range(cantidad):
+        programa = f"{posicion // 32:03d}"
+        desplazamiento = posicion % 32
+        if desplazamiento < 24:
+            yield {
+                "nombre": f"L{desplazamiento + 1:03d}",
+                "programa": programa,
+                "tipo": "CODIGO",
+                "valor": "cargue variable",
+            }
+        elif desplazamiento < 31:
+            yield {
+                "nombre": f"v{desplazamiento}",
+                "programa": programa,
+                "tipo": "I",
+                "valor": desplazamiento,
+            }
+        else:
+            yield {
+                "nombre": "acumulador",
+                "programa": programa,
+                "tipo": "MULTIPLE",
+                "valor": None,
+            }
+
+
+def lista_de_diccionarios(cantidad):
+    memoria = [{}] * cantidad
+    for posicion, dato in enumerate(celdas(cantidad)):
+        memoria[posicion] = dato
+    return memoria
+
+
+def por_columnas(cantidad):
+    memoria = Memoria(cantidad)
+    for posicion, dato in enumerate(celdas(cantidad)):
+        memoria[posicion] = dato
+    return memoria
+
+
+def medir(construir, cantidad):
+    tracemalloc.start()
+    memoria = construir(cantidad)
+    usada, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del memoria
+    return usada
+
+
+def main(cantidad=100_000):
+    anterior = medir(lista_de_diccionarios, cantidad)
+    nueva = medir(por_columnas, cantidad)
+    print(f"celdas: {cantidad}")
+    print(f"lista de diccionarios: {anterior / cantidad:8.1f} bytes por celda")
+    print(f"por columnas:          {nueva / cantidad:8.1f} bytes por celda")
+    print(f"reducción:             {anterior / nueva:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(argumento) for argumento in sys.argv[1:]))
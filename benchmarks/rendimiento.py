@@ -0,0 +1,259 @@
+"""
+Mide el rendimiento de la ch maquina: verificación, carga, pasos, planeación y
+corridas completas sobre los programas de `ejemplos/` y programas sintéticos.
+
+Uso:
+
+    python benchmarks/rendimiento.py                # muestra los resultados
+    python benchmarks/rendimiento.py --guardar      # actualiza la línea base
+    python benchmarks/rendimiento.py --comparar     # falla si hay regresiones
+
+La línea base se guarda en `benchmarks/linea_base.json` y se debe regenerar al
+agregar una medida. Una medida es una regresión si tarda más que la línea base
+multiplicada por (1 + tolerancia) y además la diferencia supera el piso de ruido.
+Las medidas muy cortas repiten su trabajo varias veces para no quedar por debajo de
+la resolución del reloj.
+"""
+import argparse
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+
+from chmaquina.latencia import LatenciaAleatoria
+from chmaquina.maquina import Maquina
+from chmaquina.paginacion import REEMPLAZOS, Paginacion
+from chmaquina.sintaxis import verificar
+
+DIRECTORIO = pathlib.Path(__file__).parent
+EJEMPLOS = DIRECTORIO.parent / "ejemplos"
+LINEA_BASE = DIRECTORIO / "linea_base.json"
+
+# Programas de ejemplo que cargan y terminan sin errores
+PROGRAMAS_DE_EJEMPLO = [
+    "factorial.ch",
+    "factorialvar.ch",
+    "multipllque.ch",
+    "multipllqueco.ch",
+    "peq.ch",
+    "pruebagral.ch",
+]
+
+
+class TecladoConstante(object):
+    """
+    Un teclado que siempre lee el mismo valor.
+    """
+
+    def __init__(self, valor="5"):
+        self.valor = valor
+
+    def lea(self):
+        return self.valor
+
+
+def ciclo_largo(vueltas):
+    """Un programa que resta uno a un contador `vueltas` veces"""
+    return "\n".join(
+        [
+            f"nueva contador I {vueltas}",
+            "nueva uno I 1",
+            "cargue contador",
+            "reste uno",
+            "vayasi ciclo fin",
+            "etiqueta ciclo 4",
+            "etiqueta fin 8",
+            "retorne 0",
+        ]
+    )
+
+
+def ejemplos():
+    return {
+        nombre: (EJEMPLOS / nombre).read_text() for nombre in PROGRAMAS_DE_EJEMPLO
+    }
+
+
+def cronometrar(funcion, repeticiones, maquina=None):
+    """
+    El mejor tiempo de `repeticiones` ejecuciones y el resultado de la última.
+
+    Si se da la máquina, su latencia se reinicia antes de cada ejecución para que
+    todas ejecuten lo mismo.
+    """
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        if maquina is not None:
+            maquina.latencia.reiniciar()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def maquina_para(tamano_memoria=4096, algoritmo="RR", quantum=5, paginacion=None):
+    return Maquina(
+        tamano_memoria=tamano_memoria,
+        tamano_kernel=79,
+        teclado=TecladoConstante(),
+        quantum=quantum,
+        algoritmo=algoritmo,
+        latencia=LatenciaAleatoria(semilla=0),
+        paginacion=paginacion,
+    )
+
+
+def cargar_todos(maquina, programas):
+    estado = maquina.encender()
+    for programa in programas:
+        estado = maquina.cargar(estado, programa)
+    return estado
+
+
+def contar_pasos(maquina, estado):
+    return sum(1 for _ in maquina.iterar(estado, en_sitio=True))
+
+
+def escenarios(escala):
+    """
+    Cada escenario es (nombre, tamaño de memoria, programas).
+    """
+    fuentes = list(ejemplos().values())
+    factorial = (EJEMPLOS / "factorial.ch").read_text()
+    return [
+        ("ejemplos", 4096, fuentes),
+        ("ciclo_largo", 1024, [ciclo_largo(10000 * escala)]),
+        ("muchos_programas", 40 * 30 * escala, [factorial] * (30 * escala)),
+        ("memoria_grande", 1_000_000, [factorial] * 4),
+    ]
+
+
+def medir(escala=1, repeticiones=3):
+    resultados = {}
+
+    fuentes = list(ejemplos().values()) * 20
+    tiempo, _ = cronometrar(
+        lambda: [verificar(fuente) for fuente in fuentes], repeticiones
+    )
+    resultados["verificar/ejemplos"] = {"segundos": tiempo}
+
+    for nombre, tamano_memoria, programas in escenarios(escala):
+        maquina = maquina_para(tamano_memoria)
+        tiempo, estado = cronometrar(
+            lambda: cargar_todos(maquina, programas), repeticiones
+        )
+        resultados[f"cargar/{nombre}"] = {"segundos": tiempo}
+        tiempo, _ = cronometrar(
+            lambda: maquina.cargar_lote(maquina.encender(), programas), repeticiones
+        )
+        resultados[f"cargar_lote/{nombre}"] = {"segundos": tiempo}
+
+        maquina.latencia.reiniciar()
+        pasos = contar_pasos(maquina, estado)
+
+        # Sin en_sitio cada paso copia el estado, como al llamar `paso`
+        tiempo, _ = cronometrar(lambda: maquina.correr(estado), repeticiones, maquina)
+        resultados[f"correr_copiando/{nombre}"] = {
+            "segundos": tiempo,
+            "instrucciones_por_segundo": pasos / tiempo,
+        }
+
+        tiempo, _ = cronometrar(
+            lambda: maquina.correr(estado, en_sitio=True), repeticiones, maquina
+        )
+        resultados[f"correr/{nombre}"] = {
+            "segundos": tiempo,
+            "instrucciones_por_segundo": pasos / tiempo,
+        }
+
+        maquina.latencia.reiniciar()
+        tracemalloc.start()
+        maquina.correr(estado, en_sitio=True)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultados[f"correr/{nombre}"]["memoria_pico"] = pico
+
+    # La misma corrida con memoria virtual; con 4 marcos el programa cabe y la
+    # diferencia con correr/ciclo_largo es el costo de traducir las direcciones
+    for reemplazo in REEMPLAZOS:
+        maquina = maquina_para(1024, paginacion=Paginacion(4, reemplazo))
+        estado = cargar_todos(maquina, [ciclo_largo(10000 * escala)])
+        pasos = contar_pasos(maquina, estado)
+        tiempo, final = cronometrar(
+            lambda: maquina.correr(estado, en_sitio=True), repeticiones, maquina
+        )
+        resultados[f"paginada/{reemplazo}"] = {
+            "segundos": tiempo,
+            "instrucciones_por_segundo": pasos / tiempo,
+            "tasa_de_fallos": final.memoria.estadisticas.tasa_de_fallos,
+        }
+
+    for algoritmo in ("FCFS", "RR", "SJF"):
+        maquina = maquina_para(40 * 200 * escala, algoritmo=algoritmo)
+        estado = cargar_todos(maquina, [ciclo_largo(10)] * (200 * escala))
+        estado.reloj = estado.tiempo_llegada
+        tiempo, _ = cronometrar(
+            lambda: [maquina.planear(estado) for _ in range(20)], repeticiones
+        )
+        resultados[f"planear/{algoritmo}"] = {"segundos": tiempo}
+
+    return resultados
+
+
+def mostrar(resultados, base=None):
+    for nombre, medida in resultados.items():
+        linea = f"{nombre:34} {medida['segundos'] * 1000:10.2f} ms"
+        if "instrucciones_por_segundo" in medida:
+            linea += f" {medida['instrucciones_por_segundo']:12.0f} instr/s"
+        if "memoria_pico" in medida:
+            linea += f" {medida['memoria_pico'] / 1024:10.0f} KiB"
+        if base and nombre in base:
+            linea += f"   x{medida['segundos'] / base[nombre]['segundos']:.2f}"
+        print(linea)
+
+
+def regresiones(resultados, base, tolerancia, piso):
+    return [
+        nombre
+        for nombre, medida in resultados.items()
+        if nombre in base
+        and medida["segundos"] > base[nombre]["segundos"] * (1 + tolerancia)
+        and medida["segundos"] - base[nombre]["segundos"] > piso
+    ]
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--guardar", action="store_true")
+    parser.add_argument("--comparar", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument(
+        "--piso",
+        type=float,
+        default=0.002,
+        help="segundos de diferencia que se consideran ruido",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--escala", type=int, default=1)
+    opciones = parser.parse_args(argumentos)
+
+    base = json.loads(LINEA_BASE.read_text()) if LINEA_BASE.exists() else None
+    resultados = medir(opciones.escala, opciones.repeticiones)
+    mostrar(resultados, base)
+
+    if opciones.guardar:
+        LINEA_BASE.write_text(json.dumps(resultados, indent=2, sort_keys=True) + "\n")
+    if opciones.comparar and base:
+        nuevas = sorted(set(resultados) - set(base))
+        if nuevas:
+            print(f"Sin línea base: {', '.join(nuevas)}", file=sys.stderr)
+        lentas = regresiones(resultados, base, opciones.tolerancia, opciones.piso)
+        if lentas:
+            print(f"Regresiones: {', '.join(lentas)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
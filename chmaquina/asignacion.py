@@ -0,0 +1,135 @@
+"""
+Administración de la memoria libre de la ch maquina.
+"""
+import bisect
+import collections
+
+from chmaquina.colas import Compartida
+
+# Estrategias para escoger el hueco donde se ubica un programa
+PRIMER_AJUSTE = "primero"
+MEJOR_AJUSTE = "mejor"
+PEOR_AJUSTE = "peor"
+ESTRATEGIAS = (PRIMER_AJUSTE, MEJOR_AJUSTE, PEOR_AJUSTE)
+
+Fragmentacion = collections.namedtuple(
+    "Fragmentacion", ["libre", "huecos", "mayor_hueco", "externa"]
+)
+
+
+class Huecos(Compartida):
+    """
+    Los bloques libres de la memoria de usuario, entre `inicio` y `fin`, como pares
+    (posición, tamaño) ordenados por posición y sin bloques contiguos.
+
+    Sin liberar memoria, reservar con cualquier estrategia ubica los programas uno
+    detrás del otro, como el pivote original.
+    """
+
+    def __init__(self, inicio, fin, estrategia=PRIMER_AJUSTE):
+        super().__init__()
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(
+                f"Estrategia desconocida: {estrategia}. "
+                f"Las disponibles son {', '.join(ESTRATEGIAS)}"
+            )
+        self.inicio = inicio
+        self.fin = fin
+        self.estrategia = estrategia
+        self._huecos = [(inicio, fin - inicio)] if fin > inicio else []
+
+    def _duplicar(self):
+        self._huecos = list(self._huecos)
+
+    def _escoger(self, tamano):
+        """El índice del hueco donde se reservarían `tamano` celdas, o None"""
+        candidatos = (
+            (numero, hueco)
+            for numero, hueco in enumerate(self._huecos)
+            if hueco[1] >= tamano
+        )
+        if self.estrategia == PRIMER_AJUSTE:
+            escogido = next(candidatos, None)
+        elif self.estrategia == MEJOR_AJUSTE:
+            escogido = min(candidatos, key=lambda c: c[1][1], default=None)
+        else:
+            escogido = max(candidatos, key=lambda c: (c[1][1], -c[0]), default=None)
+        return None if escogido is None else escogido[0]
+
+    def cabe(self, tamano):
+        return self._escoger(tamano) is not None
+
+    def reservar(self, tamano):
+        """Reserva `tamano` celdas contiguas y retorna dónde empiezan, o None"""
+        numero = self._escoger(tamano)
+        if numero is None:
+            return None
+        posicion = self._huecos[numero][0]
+        self.ocupar(posicion, tamano)
+        return posicion
+
+    def ocupar(self, posicion, tamano):
+        """Reserva `tamano` celdas al comienzo del hueco que empieza en `posicion`"""
+        self._propia()
+        numero = bisect.bisect_left(self._huecos, (posicion,))
+        inicio, disponible = self._huecos[numero]
+        if inicio != posicion or disponible < tamano:
+            raise ValueError(f"No hay {tamano} celdas libres en {posicion}")
+        if disponible == tamano:
+            del self._huecos[numero]
+        else:
+            self._huecos[numero] = (inicio + tamano, disponible - tamano)
+
+    def liberar(self, posicion, tamano):
+        """Devuelve un bloque, uniéndolo con los huecos vecinos"""
+        self._propia()
+        numero = bisect.bisect_left(self._huecos, (posicion,))
+        if numero < len(self._huecos):
+            siguiente, tamano_siguiente = self._huecos[numero]
+            if posicion + tamano == siguiente:
+                tamano += tamano_siguiente
+                del self._huecos[numero]
+        if numero > 0:
+            anterior, tamano_anterior = self._huecos[numero - 1]
+            if anterior + tamano_anterior == posicion:
+                self._huecos[numero - 1] = (anterior, tamano_anterior + tamano)
+                return
+        self._huecos.insert(numero, (posicion, tamano))
+
+    def reiniciar(self, posicion):
+        """Deja libre sólo un hueco desde `posicion` hasta el final"""
+        self._propia()
+        self._huecos = []
+        if self.fin > posicion:
+            self._huecos.append((posicion, self.fin - posicion))
+
+    def mayor(self):
+        """El hueco más grande (el primero si hay empate) o None"""
+        return max(self._huecos, key=lambda h: (h[1], -h[0]), default=None)
+
+    def ocupado_hasta(self):
+        """La posición donde termina el último bloque ocupado"""
+        if self._huecos and sum(self._huecos[-1]) == self.fin:
+            return self._huecos[-1][0]
+        return self.fin
+
+    @property
+    def libre(self):
+        return sum(tamano for _, tamano in self._huecos)
+
+    def fragmentacion(self):
+        """
+        La memoria libre, el número de huecos, el más grande y la fragmentación
+        externa: la fracción de la memoria libre que no está en el hueco más grande.
+        """
+        libre = self.libre
+        mayor = self.mayor()
+        mayor_hueco = mayor[1] if mayor else 0
+        externa = 1 - mayor_hueco / libre if libre else 0.0
+        return Fragmentacion(libre, len(self._huecos), mayor_hueco, externa)
+
+    def __len__(self):
+        return len(self._huecos)
+
+    def __iter__(self):
+        return iter(self._huecos)
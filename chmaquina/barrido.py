@@ -0,0 +1,201 @@
+"""
+Barridos de parámetros: corre los mismos ch programas con muchas configuraciones de
+la máquina en paralelo y reúne las métricas de planeación de cada una.
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import itertools
+import os
+import sys
+
+from chmaquina.errores import ChProgramaInvalido, ErrorDeSintaxis
+from chmaquina.latencia import LatenciaAleatoria
+from chmaquina.maquina import Maquina
+from chmaquina.metricas import Resumen
+from chmaquina.planificadores import PLANIFICADORES
+from chmaquina.sintaxis import verificar
+
+Configuracion = collections.namedtuple(
+    "Configuracion",
+    ["tamano_memoria", "tamano_kernel", "algoritmo", "quantum", "semilla"],
+)
+
+COLUMNAS = list(Configuracion._fields) + ["reloj", "pasos"] + list(Resumen._fields)
+COLUMNAS.append("error")
+
+# Programas verificados de cada proceso del barrido
+_programas = None
+
+
+class TecladoFijo(object):
+    """
+    Un teclado que siempre lee el mismo valor, para correr sin intervención.
+    """
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def lea(self):
+        return self.valor
+
+
+def configuraciones(memorias, kernels, algoritmos, quantums, semillas):
+    """Todas las combinaciones de los valores dados"""
+    return [
+        Configuracion(*combinacion)
+        for combinacion in itertools.product(
+            memorias, kernels, algoritmos, quantums, semillas
+        )
+    ]
+
+
+def correr_configuracion(programas, configuracion, entrada="0"):
+    """
+    Carga y corre los programas verificados con la configuración dada y retorna una
+    fila con la configuración, el reloj final, el número de pasos y el resumen de
+    las métricas. Los errores de la corrida quedan en la columna `error`.
+    """
+    fila = dict.fromkeys(COLUMNAS)
+    fila.update(configuracion._asdict())
+    maquina = Maquina(
+        tamano_memoria=configuracion.tamano_memoria,
+        tamano_kernel=configuracion.tamano_kernel,
+        teclado=TecladoFijo(entrada),
+        quantum=configuracion.quantum or None,
+        algoritmo=configuracion.algoritmo,
+        latencia=LatenciaAleatoria(semilla=configuracion.semilla),
+    )
+    estado = maquina.encender()
+    pasos = 0
+    try:
+        estado = maquina.cargar_lote(estado, programas)
+        for estado in maquina.iterar(estado, en_sitio=True):
+            pasos += 1
+    except Exception as e:
+        # Una configuración que falla no detiene el resto del barrido
+        fila["error"] = f"{e.__class__.__name__}: {e}"
+    fila["reloj"] = estado.reloj
+    fila["pasos"] = pasos
+    fila.update(estado.metricas.resumen(estado.reloj)._asdict())
+    return fila
+
+
+def _iniciar_proceso(programas):
+    global _programas
+    _programas = programas
+
+
+def _correr_en_proceso(configuracion, entrada):
+    return correr_configuracion(_programas, configuracion, entrada)
+
+
+def barrer(programas, configuraciones, procesos=None, entrada="0"):
+    """
+    Corre los programas (textos) con cada configuración y retorna las filas en el
+    mismo orden de las configuraciones.
+
+    Los programas se verifican una sola vez y cada proceso los recibe una sola vez
+    al iniciar. Con `procesos=1` todo corre en el proceso actual.
+    """
+    try:
+        verificados = [verificar(programa) for programa in programas]
+    except ErrorDeSintaxis as e:
+        raise ChProgramaInvalido from e
+
+    if procesos == 1:
+        return [
+            correr_configuracion(verificados, configuracion, entrada)
+            for configuracion in configuraciones
+        ]
+
+    procesos = procesos or os.cpu_count() or 1
+    # Varias configuraciones por envío para no pagar la comunicación en cada una
+    lote = max(1, len(configuraciones) // (4 * procesos))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=procesos, initializer=_iniciar_proceso, initargs=(verificados,)
+    ) as ejecutor:
+        return list(
+            ejecutor.map(
+                _correr_en_proceso,
+                configuraciones,
+                itertools.repeat(entrada),
+                chunksize=lote,
+            )
+        )
+
+
+def escribir_tabla(filas, salida):
+    escritor = csv.DictWriter(salida, fieldnames=COLUMNAS, lineterminator="\n")
+    escritor.writeheader()
+    escritor.writerows(filas)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="chmaquina-barrido",
+        description="Corre ch programas con cada combinación de parámetros y "
+        "escribe las métricas de planeación en CSV.",
+    )
+    parser.add_argument("programas", nargs="+", help="archivos .ch a cargar en orden")
+    parser.add_argument("-m", "--memoria", type=int, nargs="+", default=[512])
+    parser.add_argument("-k", "--kernel", type=int, nargs="+", default=[79])
+    parser.add_argument(
+        "-a",
+        "--algoritmo",
+        nargs="+",
+        choices=sorted(PLANIFICADORES),
+        default=sorted(PLANIFICADORES),
+    )
+    parser.add_argument(
+        "-q", "--quantum", type=int, nargs="+", default=[5], help="0 para no expropiar"
+    )
+    parser.add_argument("-s", "--semilla", type=int, nargs="+", default=[0])
+    parser.add_argument(
+        "-p", "--procesos", type=int, help="procesos en paralelo (todos los núcleos)"
+    )
+    parser.add_argument(
+        "--entrada", default="0", help="valor que lee el teclado en cada lea"
+    )
+    parser.add_argument("-o", "--salida", default="-", help="archivo CSV (- es stdout)")
+    return parser
+
+
+def main(argumentos=None):
+    opciones = crear_parser().parse_args(argumentos)
+    programas = []
+    try:
+        for ruta in opciones.programas:
+            with open(ruta) as programa:
+                programas.append(programa.read())
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"No se pudo cargar {ruta}: {e}", file=sys.stderr)
+        return 1
+    try:
+        filas = barrer(
+            programas,
+            configuraciones(
+                opciones.memoria,
+                opciones.kernel,
+                opciones.algoritmo,
+                opciones.quantum,
+                opciones.semilla,
+            ),
+            procesos=opciones.procesos,
+            entrada=opciones.entrada,
+        )
+    except ChProgramaInvalido as e:
+        print(f"Programa inválido: {e.__cause__ or e}", file=sys.stderr)
+        return 1
+
+    if opciones.salida == "-":
+        escribir_tabla(filas, sys.stdout)
+    else:
+        with open(opciones.salida, "w", newline="") as salida:
+            escribir_tabla(filas, salida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
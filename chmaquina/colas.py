@@ -0,0 +1,289 @@
+"""
+Estructuras de datos del planeador de la ch maquina.
+
+Todas se comparten entre copias del estado y sólo duplican su contenido la primera
+vez que se modifican luego de copiarse.
+"""
+import collections
+import heapq
+
+
+class Compartida(object):
+    """
+    Base para las estructuras que se copian al escribir.
+    """
+
+    def __init__(self):
+        self._compartida = False
+
+    def copiar(self):
+        copia = self.__class__.__new__(self.__class__)
+        copia.__dict__.update(self.__dict__)
+        copia._compartida = True
+        self._compartida = True
+        return copia
+
+    def _propia(self):
+        """Duplica el contenido si se comparte con otra copia"""
+        if self._compartida:
+            self._duplicar()
+            self._compartida = False
+
+    def _duplicar(self):
+        raise NotImplementedError
+
+    def __eq__(self, otra):
+        try:
+            return list(self) == list(otra)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)})"
+
+
+class ColaFifo(Compartida):
+    """
+    Cola de listos en orden de llegada. El primero es el programa en ejecución.
+
+    Las colas de listos guardan en `despacho` el programa que estaba primero y el
+    reloj en la última planeación, para que el planificador sepa cuánto ha corrido.
+    """
+
+    def __init__(self, nombres=()):
+        super().__init__()
+        self._cola = collections.deque(nombres)
+        self._miembros = set(self._cola)
+        self.despacho = None
+
+    def _duplicar(self):
+        self._cola = collections.deque(self._cola)
+        self._miembros = set(self._miembros)
+
+    def agregar(self, nombre, programa=None):
+        self._propia()
+        self._cola.append(nombre)
+        self._miembros.add(nombre)
+
+    def quitar(self, nombre):
+        self._propia()
+        if self._cola[0] == nombre:
+            self._cola.popleft()
+        else:
+            self._cola.remove(nombre)
+        self._miembros.discard(nombre)
+
+    def rotar(self):
+        """El último programa pasa a ser el primero"""
+        self._propia()
+        self._cola.rotate(1)
+
+    def ordenar(self):
+        pass
+
+    def __contains__(self, nombre):
+        return nombre in self._miembros
+
+    def __len__(self):
+        return len(self._cola)
+
+    def __iter__(self):
+        return iter(self._cola)
+
+    def __getitem__(self, posicion):
+        return self._cola[posicion]
+
+
+class ColaPrioridad(Compartida):
+    """
+    Cola de listos ordenada por un dato del programa (`llave`), menor primero.
+
+    `llave` es el nombre de un campo del programa o una función que recibe el nombre
+    y los datos del programa y retorna su prioridad.
+
+    Los programas agregados esperan al final, en orden de llegada, hasta que se llama
+    `ordenar`; así se comporta igual que ordenar una lista en cada planeación, pero
+    cada programa entra al montículo sólo una vez. Los empates se resuelven por el
+    orden en que se agregaron.
+    """
+
+    def __init__(self, llave):
+        super().__init__()
+        self.llave = llave
+        self._monticulo = []
+        self._espera = collections.deque()
+        self._miembros = set()
+        self._secuencia = 0
+        self.despacho = None
+
+    def _duplicar(self):
+        self._monticulo = list(self._monticulo)
+        self._espera = collections.deque(self._espera)
+        self._miembros = set(self._miembros)
+
+    def agregar(self, nombre, programa):
+        self._propia()
+        if callable(self.llave):
+            clave = self.llave(nombre, programa)
+        else:
+            clave = programa[self.llave]
+        self._espera.append((clave, self._secuencia, nombre))
+        self._secuencia += 1
+        self._miembros.add(nombre)
+
+    def quitar(self, nombre):
+        self._propia()
+        if self._monticulo and self._monticulo[0][2] == nombre:
+            heapq.heappop(self._monticulo)
+        elif not self._monticulo and self._espera[0][2] == nombre:
+            self._espera.popleft()
+        else:
+            self._monticulo = [e for e in self._monticulo if e[2] != nombre]
+            heapq.heapify(self._monticulo)
+            self._espera = collections.deque(
+                e for e in self._espera if e[2] != nombre
+            )
+        self._miembros.discard(nombre)
+
+    def rotar(self):
+        pass
+
+    def clave_del_primero(self):
+        return self._monticulo[0][0] if self._monticulo else self._espera[0][0]
+
+    def cambiar_clave_del_primero(self, clave):
+        """Cambia la prioridad del primer programa y lo reubica"""
+        self._propia()
+        if self._monticulo:
+            _, secuencia, nombre = self._monticulo[0]
+            heapq.heapreplace(self._monticulo, (clave, secuencia, nombre))
+        else:
+            _, secuencia, nombre = self._espera.popleft()
+            heapq.heappush(self._monticulo, (clave, secuencia, nombre))
+
+    def ordenar(self):
+        """Pone en su lugar a los programas que esperan"""
+        if self._espera:
+            self._propia()
+            while self._espera:
+                heapq.heappush(self._monticulo, self._espera.popleft())
+
+    def __contains__(self, nombre):
+        return nombre in self._miembros
+
+    def __len__(self):
+        return len(self._monticulo) + len(self._espera)
+
+    def __iter__(self):
+        for _, _, nombre in sorted(self._monticulo):
+            yield nombre
+        for _, _, nombre in self._espera:
+            yield nombre
+
+    def __getitem__(self, posicion):
+        if posicion == 0:
+            if self._monticulo:
+                return self._monticulo[0][2]
+            return self._espera[0][2]
+        return list(self)[posicion]
+
+
+class ColaMultinivel(Compartida):
+    """
+    Varias colas fifo con prioridad decreciente; el primero es el primer programa de
+    la cola de mayor prioridad que no esté vacía.
+    """
+
+    def __init__(self, niveles):
+        super().__init__()
+        self._colas = [collections.deque() for _ in range(niveles)]
+        self._niveles = {}
+        self.despacho = None
+
+    def _duplicar(self):
+        self._colas = [collections.deque(cola) for cola in self._colas]
+        self._niveles = dict(self._niveles)
+
+    def agregar(self, nombre, programa=None, nivel=0):
+        self._propia()
+        self._colas[nivel].append(nombre)
+        self._niveles[nombre] = nivel
+
+    def nivel(self, nombre):
+        return self._niveles[nombre]
+
+    def quitar(self, nombre):
+        self._propia()
+        cola = self._colas[self._niveles.pop(nombre)]
+        if cola[0] == nombre:
+            cola.popleft()
+        else:
+            cola.remove(nombre)
+
+    def bajar_primero(self):
+        """Pasa el primer programa al final de la cola del nivel siguiente"""
+        nombre = self[0]
+        nivel = min(self._niveles[nombre] + 1, len(self._colas) - 1)
+        self.quitar(nombre)
+        self.agregar(nombre, nivel=nivel)
+
+    def rotar(self):
+        pass
+
+    def ordenar(self):
+        pass
+
+    def __contains__(self, nombre):
+        return nombre in self._niveles
+
+    def __len__(self):
+        return len(self._niveles)
+
+    def __iter__(self):
+        for cola in self._colas:
+            yield from cola
+
+    def __getitem__(self, posicion):
+        if posicion == 0:
+            for cola in self._colas:
+                if cola:
+                    return cola[0]
+            raise IndexError("la cola está vacía")
+        return list(self)[posicion]
+
+
+class Llegadas(Compartida):
+    """
+    Programas cargados que aún no han llegado, ordenados por tiempo de llegada.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._monticulo = []
+        self._secuencia = 0
+
+    def _duplicar(self):
+        self._monticulo = list(self._monticulo)
+
+    def agregar(self, nombre, programa):
+        self._propia()
+        entrada = (programa["tiempo_llegada"], self._secuencia, nombre)
+        heapq.heappush(self._monticulo, entrada)
+        self._secuencia += 1
+
+    def proximo(self):
+        """El tiempo de llegada más cercano o None si no hay programas por llegar"""
+        return self._monticulo[0][0] if self._monticulo else None
+
+    def llegados(self, reloj):
+        """Saca y retorna, en orden, los programas que llegaron hasta `reloj`"""
+        while self._monticulo and self._monticulo[0][0] <= reloj:
+            self._propia()
+            yield heapq.heappop(self._monticulo)[2]
+
+    def __len__(self):
+        return len(self._monticulo)
+
+    def __iter__(self):
+        for _, _, nombre in sorted(self._monticulo):
+            yield nombre
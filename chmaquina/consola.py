@@ -0,0 +1,314 @@
+"""
+Ejecución de ch programas desde la consola, sin interfaz gráfica.
+"""
+import argparse
+import sys
+import time
+
+from chmaquina.asignacion import ESTRATEGIAS, PRIMER_AJUSTE
+from chmaquina.entrada import EntradaDeArchivo
+from chmaquina.errores import (
+    ChProgramaInvalido,
+    ErrorDeEjecucion,
+    ErrorDeSegmentacion,
+    InstantaneaInvalida,
+    SinMemoriaSuficiente,
+)
+from chmaquina.latencia import LatenciaAleatoria, LatenciaFija
+from chmaquina.maquina import Maquina
+from chmaquina.metricas import cifra
+from chmaquina.paginacion import REEMPLAZOS, Paginacion
+from chmaquina.planificadores import PLANIFICADORES
+from chmaquina.sintaxis import CacheDeVerificacion
+from chmaquina.traza import EscritorDeTraza
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="chmaquina-run", description="Ejecuta ch programas sin interfaz gráfica."
+    )
+    parser.add_argument("programas", nargs="*", help="archivos .ch a cargar en orden")
+    parser.add_argument("-m", "--memoria", type=int, default=512)
+    parser.add_argument("-k", "--kernel", type=int, default=79)
+    parser.add_argument(
+        "-a", "--algoritmo", choices=sorted(PLANIFICADORES), default="RR"
+    )
+    parser.add_argument(
+        "-q", "--quantum", type=int, default=5, help="0 para no expropiar"
+    )
+    parser.add_argument(
+        "--semilla", type=int, help="semilla para la duración de las operaciones de io"
+    )
+    parser.add_argument(
+        "--latencia-fija",
+        type=int,
+        metavar="TIEMPO",
+        help="todas las operaciones de io toman TIEMPO",
+    )
+    parser.add_argument(
+        "--asignacion",
+        choices=ESTRATEGIAS,
+        default=PRIMER_AJUSTE,
+        help="hueco donde se ubica cada programa",
+    )
+    parser.add_argument(
+        "--liberar",
+        action="store_true",
+        help="libera la memoria de los programas que terminan",
+    )
+    parser.add_argument(
+        "--compactar",
+        action="store_true",
+        help="compacta la memoria cuando un programa no cabe en ningún hueco",
+    )
+    parser.add_argument(
+        "--marcos",
+        type=int,
+        help="usa memoria virtual con MARCOS páginas en memoria física",
+    )
+    parser.add_argument("--reemplazo", choices=sorted(REEMPLAZOS), default="LRU")
+    parser.add_argument(
+        "--almacen",
+        choices=["memoria", "archivo"],
+        default="memoria",
+        help="dónde se guardan las páginas que no están en un marco",
+    )
+    parser.add_argument(
+        "--entrada",
+        metavar="ARCHIVO",
+        help="lee las entradas de lea desde ARCHIVO (- es stdin) sin detener a los "
+        "demás programas mientras llegan",
+    )
+    parser.add_argument(
+        "--traza",
+        metavar="ARCHIVO",
+        help="registra cada instrucción ejecutada en ARCHIVO (ver chmaquina-traza)",
+    )
+    parser.add_argument(
+        "--restaurar",
+        metavar="ARCHIVO",
+        help="continúa la corrida guardada en la instantánea ARCHIVO; los programas "
+        "dados se cargan además",
+    )
+    parser.add_argument(
+        "--instantanea",
+        metavar="ARCHIVO",
+        help="guarda el estado de la máquina en ARCHIVO cada tanto y al terminar",
+    )
+    parser.add_argument(
+        "--cada",
+        type=int,
+        default=100000,
+        metavar="PASOS",
+        help="instrucciones entre instantáneas",
+    )
+    parser.add_argument(
+        "--cache", metavar="ARCHIVO", help="guarda los programas verificados en ARCHIVO"
+    )
+    parser.add_argument(
+        "--impresora", default="-", help="archivo para la impresora (- es stdout)"
+    )
+    parser.add_argument(
+        "--pantalla", default="-", help="archivo para la pantalla (- es stdout)"
+    )
+    parser.add_argument(
+        "--metricas",
+        action="store_true",
+        help="muestra los tiempos de cada programa además de los promedios",
+    )
+    return parser
+
+
+def latencia_para(opciones):
+    if opciones.latencia_fija is not None:
+        return LatenciaFija(opciones.latencia_fija)
+    return LatenciaAleatoria(semilla=opciones.semilla)
+
+
+def paginacion_para(opciones):
+    if opciones.marcos is None:
+        return None
+    return Paginacion(opciones.marcos, opciones.reemplazo, opciones.almacen)
+
+
+def entrada_para(opciones):
+    if opciones.entrada is None:
+        return None
+    if opciones.entrada == "-":
+        return EntradaDeArchivo(sys.stdin)
+    return EntradaDeArchivo(open(opciones.entrada))
+
+
+def abrir_salida(ruta):
+    if ruta == "-":
+        return sys.stdout
+    return open(ruta, "w")
+
+
+def correr(maquina, estado, salidas, instantanea=None, cada=None):
+    """
+    Corre la máquina en sitio escribiendo la impresora y la pantalla a medida que
+    se producen y, si se da `instantanea`, guardando el estado cada `cada` pasos.
+    Retorna el estado final y el número de pasos ejecutados.
+    """
+    escritos = {
+        dispositivo: len(getattr(estado, dispositivo)) for dispositivo in salidas
+    }
+    pasos = 0
+    for estado in maquina.iterar(estado, en_sitio=True):
+        pasos += 1
+        if instantanea is not None and pasos % cada == 0:
+            maquina.guardar(estado, instantanea)
+        for dispositivo, salida in salidas.items():
+            lineas = getattr(estado, dispositivo)
+            for programa, mensaje in lineas[escritos[dispositivo] :]:
+                salida.write(f"[{programa}] {mensaje}\n")
+            escritos[dispositivo] = len(lineas)
+    return estado, pasos
+
+
+def mostrar_metricas(estado, por_programa, salida=sys.stderr):
+    if por_programa:
+        print("programa llegada respuesta retorno espera cpu", file=salida)
+        for nombre, tiempos in sorted(estado.metricas.programas().items()):
+            print(
+                nombre,
+                *("-" if valor is None else valor for valor in tiempos),
+                file=salida,
+            )
+    resumen = estado.metricas.resumen(estado.reloj)
+    print(
+        f"{resumen.terminados} terminados, "
+        f"respuesta promedio {cifra(resumen.respuesta_promedio)}, "
+        f"retorno promedio {cifra(resumen.retorno_promedio)}, "
+        f"espera promedio {cifra(resumen.espera_promedio)}, "
+        f"rendimiento {cifra(resumen.rendimiento)} programas/tiempo, "
+        f"cpu ociosa {resumen.tiempo_ocioso}, "
+        f"utilización {cifra(resumen.utilizacion)}",
+        file=salida,
+    )
+    if por_programa:
+        fragmentacion = estado.libres.fragmentacion()
+        print(
+            f"memoria libre {fragmentacion.libre} en {fragmentacion.huecos} huecos, "
+            f"el mayor de {fragmentacion.mayor_hueco}, "
+            f"fragmentación externa {cifra(fragmentacion.externa)}",
+            file=salida,
+        )
+    paginacion = getattr(estado.memoria, "estadisticas", None)
+    if paginacion is not None:
+        print(
+            f"{paginacion.fallos} fallos de página en {paginacion.accesos} accesos "
+            f"(tasa {paginacion.tasa_de_fallos:.4f}), "
+            f"{paginacion.reemplazos} reemplazos, "
+            f"{paginacion.escrituras} páginas escritas",
+            file=salida,
+        )
+
+
+def cerrar_entrada(entrada):
+    if entrada is not None and entrada.archivo is not sys.stdin:
+        entrada.archivo.close()
+
+
+def ejecutar(opciones, entrada, traza):
+    """Carga los programas y los corre; retorna el código de salida"""
+    maquina = Maquina(
+        tamano_memoria=opciones.memoria,
+        tamano_kernel=opciones.kernel,
+        quantum=opciones.quantum or None,
+        algoritmo=opciones.algoritmo,
+        latencia=latencia_para(opciones),
+        cache=CacheDeVerificacion(ruta=opciones.cache) if opciones.cache else None,
+        asignacion=opciones.asignacion,
+        liberar_al_terminar=opciones.liberar,
+        compactacion=opciones.compactar,
+        paginacion=paginacion_para(opciones),
+        entrada=entrada,
+        traza=traza,
+    )
+    try:
+        if opciones.restaurar:
+            estado = maquina.restaurar(opciones.restaurar)
+        else:
+            estado = maquina.encender()
+    except (OSError, InstantaneaInvalida) as e:
+        print(f"No se pudo restaurar la instantánea: {e}", file=sys.stderr)
+        return 1
+    try:
+        for ruta in opciones.programas:
+            with open(ruta) as programa:
+                if opciones.cache:
+                    estado = maquina.cargar(estado, programa.read())
+                else:
+                    estado = maquina.cargar_flujo(estado, programa)
+    except (
+        OSError,
+        UnicodeDecodeError,
+        ChProgramaInvalido,
+        SinMemoriaSuficiente,
+    ) as e:
+        print(f"No se pudo cargar {ruta}: {e.__cause__ or e}", file=sys.stderr)
+        return 1
+    if opciones.cache:
+        maquina.cache.guardar()
+
+    salidas = {
+        "impresora": abrir_salida(opciones.impresora),
+        "pantalla": abrir_salida(opciones.pantalla),
+    }
+    inicio = time.perf_counter()
+    try:
+        estado, pasos = correr(
+            maquina, estado, salidas, opciones.instantanea, opciones.cada
+        )
+    except (ErrorDeEjecucion, ErrorDeSegmentacion) as e:
+        print(f"Error de ejecución: {e}", file=sys.stderr)
+        return 1
+    except EOFError:
+        print("Error de ejecución: se acabó la entrada del teclado", file=sys.stderr)
+        return 1
+    finally:
+        for salida in salidas.values():
+            if salida is not sys.stdout:
+                salida.close()
+    transcurrido = time.perf_counter() - inicio
+    if opciones.instantanea:
+        maquina.guardar(estado, opciones.instantanea)
+
+    print(
+        f"{pasos} instrucciones en {transcurrido:.3f} s "
+        f"({pasos / transcurrido if transcurrido else 0:.0f} instrucciones/s), "
+        f"reloj {estado.reloj}",
+        file=sys.stderr,
+    )
+    mostrar_metricas(estado, opciones.metricas)
+    return 0
+
+
+def main(argumentos=None):
+    parser = crear_parser()
+    opciones = parser.parse_args(argumentos)
+    if not opciones.programas and not opciones.restaurar:
+        parser.error("se necesita al menos un programa o --restaurar")
+    try:
+        entrada = entrada_para(opciones)
+    except OSError as e:
+        print(f"No se pudo abrir la entrada: {e}", file=sys.stderr)
+        return 1
+    try:
+        traza = EscritorDeTraza(opciones.traza) if opciones.traza else None
+    except OSError as e:
+        print(f"No se pudo crear la traza: {e}", file=sys.stderr)
+        cerrar_entrada(entrada)
+        return 1
+    try:
+        return ejecutar(opciones, entrada, traza)
+    finally:
+        if traza is not None:
+            traza.cerrar()
+        cerrar_entrada(entrada)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Fuentes de entrada para la instrucción lea.
+
+Con una fuente de entrada la máquina no se detiene a esperar el teclado: el programa
+que ejecuta un lea pasa a la cola de bloqueados y los demás siguen corriendo hasta
+que llega un valor. Las fuentes se alimentan con valores fijos, desde un archivo o
+una tubería en otro hilo, o desde un flujo de asyncio.
+"""
+import asyncio
+import collections
+import threading
+
+
+class EntradaEnCola(object):
+    """
+    Valores que esperan ser leídos, en orden.
+
+    `poner` y `cerrar` pueden llamarse desde cualquier hilo; la máquina toma los
+    valores con `tomar`, que nunca bloquea, y sólo llama `esperar` cuando todos los
+    programas están esperando una entrada.
+    """
+
+    def __init__(self, valores=()):
+        self._valores = collections.deque(valores)
+        self._condicion = threading.Condition()
+        # Futuros de las corutinas que esperan un valor, con su ciclo de eventos
+        self._futuros = []
+        self.cerrada = False
+
+    def poner(self, valor):
+        with self._condicion:
+            if self.cerrada:
+                raise ValueError("La entrada está cerrada")
+            self._valores.append(valor)
+            self._avisar()
+
+    def cerrar(self):
+        """Indica que no llegarán más valores"""
+        with self._condicion:
+            self.cerrada = True
+            self._avisar()
+
+    def _avisar(self):
+        self._condicion.notify_all()
+        for ciclo, futuro in self._futuros:
+            ciclo.call_soon_threadsafe(_resolver, futuro)
+        self._futuros = []
+
+    def tomar(self):
+        """El siguiente valor o None si todavía no ha llegado ninguno"""
+        with self._condicion:
+            return self._valores.popleft() if self._valores else None
+
+    def esperar(self, tiempo=None):
+        """
+        Espera hasta que haya un valor. Retorna False si la entrada se cerró sin
+        valores pendientes o si pasaron `tiempo` segundos.
+        """
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._valores or self.cerrada, tiempo)
+            return bool(self._valores)
+
+    async def aesperar(self):
+        """Como `esperar`, pero sin bloquear el ciclo de eventos de asyncio"""
+        with self._condicion:
+            if self._valores or self.cerrada:
+                return bool(self._valores)
+            ciclo = asyncio.get_running_loop()
+            futuro = ciclo.create_future()
+            self._futuros.append((ciclo, futuro))
+        await futuro
+        with self._condicion:
+            return bool(self._valores)
+
+    async def alimentar(self, lector):
+        """
+        Pone cada linea de un `asyncio.StreamReader` y cierra la entrada cuando el
+        flujo termina. Los bytes que no son UTF-8 se reemplazan.
+        """
+        try:
+            async for linea in lector:
+                self.poner(linea.decode(errors="replace").rstrip("\r\n"))
+        finally:
+            self.cerrar()
+
+    def __len__(self):
+        return len(self._valores)
+
+
+def _resolver(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+class EntradaProgramada(EntradaEnCola):
+    """
+    Una lista fija de valores; la entrada se agota cuando se leen todos.
+    """
+
+    def __init__(self, valores):
+        super().__init__(valores)
+        self.cerrada = True
+
+
+class EntradaDeArchivo(EntradaEnCola):
+    """
+    Las lineas de un archivo abierto o una tubería, leídas en otro hilo para que
+    la máquina no se bloquee mientras llegan.
+    """
+
+    def __init__(self, archivo):
+        super().__init__()
+        self.archivo = archivo
+        self._hilo = threading.Thread(target=self._leer, daemon=True)
+        self._hilo.start()
+
+    def _leer(self):
+        try:
+            for linea in self.archivo:
+                self.poner(linea.rstrip("\r\n"))
+        except ValueError:
+            # El archivo se cerró antes de terminar de leerlo
+            pass
+        finally:
+            self.cerrar()
@@ -1,8 +1,14 @@
 class ErrorDeSintaxis(Exception):
     """
     Indica un error de sintaxis en el programa.
+
+    `token` es, si se conoce, la parte de la linea que causó el error.
     """
 
+    def __init__(self, mensaje, token=None):
+        super().__init__(mensaje)
+        self.token = token
+
 
 class ChProgramaInvalido(Exception):
     """
@@ -26,3 +32,15 @@ class SinMemoriaSuficiente(Exception):
     """
     Indica que la memoria de la máquina no es suficiente para ejecutar una acción.
     """
+
+
+class TrazaInvalida(Exception):
+    """
+    Indica que un archivo no es una traza de ejecución de una versión conocida.
+    """
+
+
+class InstantaneaInvalida(Exception):
+    """
+    Indica que un archivo no es una instantánea de una versión conocida.
+    """
@@ -1,15 +1,53 @@
-import copy
+import collections
 
+from chmaquina.asignacion import Huecos
+from chmaquina.colas import ColaFifo, Llegadas
 from chmaquina.errores import ErrorDeSegmentacion
+from chmaquina.memoria import Memoria
+from chmaquina.metricas import Metricas
+from chmaquina.tipos import formatear, vacio
+
+# Lo que cambió entre dos estados: posiciones de memoria, nombres de los programas
+# cuya entrada, variables o etiquetas cambiaron y lineas nuevas de la impresora y la
+# pantalla. `completo` indica que los estados no se pueden comparar por partes.
+Cambios = collections.namedtuple(
+    "Cambios",
+    [
+        "celdas",
+        "programas",
+        "variables",
+        "etiquetas",
+        "impresora",
+        "pantalla",
+        "completo",
+    ],
+)
 
 
 class EstadoMaquina:
-    def __init__(self, memoria, pivote):
+    """
+    Estado de la ch maquina en un instante.
+
+    Las copias comparten la memoria y las tablas por programa; cada una duplica sólo
+    lo que modifica, así que `copiar` no depende del tamaño de la memoria.
+    """
+
+    def __init__(self, memoria, pivote, listos=None, libres=None):
         self.memoria = memoria
+        # Bloques libres de la memoria de usuario
+        self.libres = Huecos(pivote, len(memoria)) if libres is None else libres
         self.variables = {}
         self.etiquetas = {}
+        self.codigo = {}
         self.programas = {}
-        self.listos = []
+        self.listos = ColaFifo() if listos is None else listos
+        self.llegadas = Llegadas()
+        # Programas esperando una entrada: posición de la variable del lea y reloj
+        # en que termina la operación del dispositivo
+        self.bloqueados = {}
+        # Veces que un programa ha dejado la cpu para esperar una entrada
+        self.bloqueos = 0
+        self.metricas = Metricas()
 
         self.pantalla = []
         self.impresora = []
@@ -19,70 +57,227 @@ class EstadoMaquina:
         self.tiempo_llegada = 0
         self.reloj = 0
 
+        # Programas cuya entrada en `programas` pertenece sólo a este estado
+        self._programas_propios = set()
+
     @classmethod
     def para(cls, maquina):
-        memoria = [{}] * maquina.tamano_memoria
+        if maquina.paginacion is None:
+            memoria = Memoria(maquina.tamano_memoria)
+        else:
+            memoria = maquina.paginacion.crear_memoria(maquina.tamano_memoria)
         apuntador = maquina.tamano_kernel + 1
-        return cls(memoria, apuntador)
+        libres = Huecos(apuntador, len(memoria), maquina.asignacion)
+        return cls(memoria, apuntador, maquina.cola_de_listos(), libres)
 
     def copiar(self):
         """crea una copia del estado de la maquina"""
-        estado = self.__class__(copy.deepcopy(self.memoria), self.pivote)
-        estado.variables = copy.deepcopy(self.variables)
-        estado.etiquetas = copy.deepcopy(self.etiquetas)
-        estado.programas = copy.deepcopy(self.programas)
-        estado.listos = copy.deepcopy(self.listos)
+        estado = self.__class__(
+            self.memoria.copiar(),
+            self.pivote,
+            self.listos.copiar(),
+            self.libres.copiar(),
+        )
+        estado.llegadas = self.llegadas.copiar()
+        estado.bloqueados = dict(self.bloqueados)
+        estado.bloqueos = self.bloqueos
+        estado.metricas = self.metricas.copiar()
+        # Las tablas internas de cada programa se comparten, sólo se copia el índice
+        estado.variables = dict(self.variables)
+        estado.etiquetas = dict(self.etiquetas)
+        estado.codigo = dict(self.codigo)
+        estado.programas = dict(self.programas)
 
-        estado.impresora = copy.deepcopy(self.impresora)
-        estado.pantalla = copy.deepcopy(self.pantalla)
-        estado.terminados = copy.deepcopy(self.terminados)
+        estado.impresora = list(self.impresora)
+        estado.pantalla = list(self.pantalla)
+        estado.terminados = dict(self.terminados)
+
+        # Las entradas de los programas ahora son compartidas por ambos estados
+        self._programas_propios = set()
 
         estado.tiempo_llegada = self.tiempo_llegada
         estado.reloj = self.reloj
 
         return estado
 
-    def siguiente_instruccion(self):
-        """De acuerdo al esto actual de la maquina cual es la sig instrucción"""
-        if not self.listos:
-            return None
+    def cambios_desde(self, anterior):
+        """
+        Lo que cambió desde `anterior`, un estado del que este es una copia (por
+        ejemplo el estado antes de `Maquina.paso`). Como las copias comparten lo que
+        no modifican, el costo depende de lo que cambió y no del tamaño del estado.
+        """
+        celdas = self.memoria.diferencias(anterior.memoria)
+        salidas = []
+        for dispositivo in ("impresora", "pantalla"):
+            nuevas, previas = getattr(self, dispositivo), getattr(anterior, dispositivo)
+            if len(nuevas) < len(previas) or (
+                previas and nuevas[len(previas) - 1] != previas[-1]
+            ):
+                celdas = None
+            salidas.append(nuevas[len(previas) :])
+        if celdas is None:
+            return Cambios([], set(), set(), set(), [], [], True)
 
+        def distintos(propios, ajenos):
+            return {
+                nombre
+                for nombre in propios.keys() | ajenos.keys()
+                if propios.get(nombre) is not ajenos.get(nombre)
+            }
+
+        programas = distintos(self.programas, anterior.programas)
+        programas |= distintos(self.terminados, anterior.terminados)
+        return Cambios(
+            celdas,
+            programas,
+            distintos(self.variables, anterior.variables),
+            distintos(self.etiquetas, anterior.etiquetas),
+            *salidas,
+            False,
+        )
+
+    def _celda_actual(self):
+        """La celda de código que el programa en ejecución debe ejecutar"""
         nombre = self.listos[0]
         programa = self.programas[nombre]
         posicion = programa["inicio"] + programa["contador"]
-        dato = self.memoria[posicion]
 
         # Protección de memoria básica
-        if dato.get("tipo") != "CODIGO" or dato.get("programa") != nombre:
+        tipo = self.memoria.tipo(posicion)
+        if tipo != "CODIGO" or self.memoria.programa(posicion) != nombre:
             raise ErrorDeSegmentacion(
                 f"El programa {nombre} intentó ejecutar código fuera de su región de código."
             )
 
-        return nombre, dato.get("valor")
+        return nombre, programa, posicion
+
+    def siguiente_instruccion(self):
+        """De acuerdo al esto actual de la maquina cual es la sig instrucción"""
+        if not self.listos:
+            return None
+
+        nombre, _, posicion = self._celda_actual()
+        return nombre, self.memoria.valor(posicion)
+
+    def instruccion_decodificada(self):
+        """
+        Como `siguiente_instruccion` pero retorna la instrucción decodificada en la
+        carga junto con la posición donde inicia el programa.
+        """
+        if not self.listos:
+            return None
+
+        nombre, programa, _ = self._celda_actual()
+        instruccion = self.codigo[nombre][programa["contador"]]
+        return nombre, programa["inicio"], instruccion
+
+    def _programa(self, programa):
+        """Retorna la entrada de un programa lista para ser modificada"""
+        if programa not in self._programas_propios:
+            self.programas[programa] = dict(self.programas[programa])
+            self._programas_propios.add(programa)
+        return self.programas[programa]
 
     def nada_por_hacer(self):
-        return not self.listos
+        return not self.listos and not self.llegadas and not self.bloqueados
+
+    def leer(self, posicion):
+        return self.memoria.valor(posicion)
+
+    def escribir(self, posicion, valor):
+        self.memoria.asignar_valor(posicion, valor)
+
+    def saltar(self, programa, linea):
+        self._programa(programa)["contador"] = linea
 
     def buscar_variable(self, programa, varialbe):
+        """La celda de una variable con su valor como texto"""
         posicion = self.variables[programa][varialbe]
-        return self.memoria[posicion].copy()
+        dato = self.memoria[posicion].copy()
+        if "valor" in dato:
+            dato["valor"] = formatear(dato["valor"])
+        return dato
 
     def asignar_variable(self, programa, varialbe, dato):
         posicion = self.variables[programa][varialbe]
-        if isinstance(dato, str):
-            self.memoria[posicion]["valor"] = dato
-        else:
+        if isinstance(dato, dict):
             self.memoria[posicion] = dato
+        else:
+            self.escribir(posicion, dato)
 
     def asignar_acumulador(self, programa, dato):
         self.asignar_variable(programa, "acumulador", dato)
 
     def acumulador(self, programa, *, por_defecto=None):
-        valor = self.buscar_variable(programa, "acumulador").get("valor")
-        return valor if valor else por_defecto
+        valor = self.leer(self.variables[programa]["acumulador"])
+        return por_defecto if vacio(valor) else formatear(valor)
 
     def vaya(self, programa, etiqueta):
-        self.programas[programa]["contador"] = self.etiquetas[programa][etiqueta]
+        self.saltar(programa, self.etiquetas[programa][etiqueta])
+
+    def reservar(self, tamano):
+        """
+        Reserva un bloque para un programa y deja el pivote al comienzo del bloque
+        para escribirlo con `agregar_a_memoria`. Retorna False si no hay un hueco
+        suficientemente grande.
+        """
+        posicion = self.libres.reservar(tamano)
+        if posicion is None:
+            return False
+        self.pivote = posicion
+        return True
+
+    def liberar(self, nombre):
+        """
+        Borra de la memoria un programa terminado y devuelve su bloque a los huecos.
+        """
+        programa = self.terminados[nombre]
+        self._borrar(programa["inicio"], programa["final"])
+        self.libres.liberar(programa["inicio"], programa["final"] - programa["inicio"])
+        self.variables.pop(nombre, None)
+        self.etiquetas.pop(nombre, None)
+        self.codigo.pop(nombre, None)
+
+    def _borrar(self, inicio, fin):
+        for posicion in range(inicio, fin):
+            self.memoria[posicion] = {}
+
+    def compactar(self):
+        """
+        Mueve los programas cargados, en orden, al comienzo de la memoria de usuario
+        y deja toda la memoria libre en un solo hueco al final. Retorna cuántos
+        programas se movieron.
+        """
+        ocupado = self.libres.ocupado_hasta()
+        destino = self.libres.inicio
+        movidos = 0
+        en_orden = sorted(self.programas, key=lambda p: self.programas[p]["inicio"])
+        for nombre in en_orden:
+            programa = self.programas[nombre]
+            desplazamiento = destino - programa["inicio"]
+            if desplazamiento:
+                for posicion in range(programa["inicio"], programa["final"]):
+                    self.memoria[posicion + desplazamiento] = self.memoria[posicion]
+                programa = self._programa(nombre)
+                for campo in ("inicio", "datos", "final"):
+                    programa[campo] += desplazamiento
+                self.variables[nombre] = {
+                    variable: posicion + desplazamiento
+                    for variable, posicion in self.variables[nombre].items()
+                }
+                movidos += 1
+            destino = programa["final"]
+
+        # Los programas terminados que no se habían liberado se pierden
+        for nombre in self.terminados:
+            self.variables.pop(nombre, None)
+            self.etiquetas.pop(nombre, None)
+            self.codigo.pop(nombre, None)
+
+        self._borrar(destino, ocupado)
+        self.libres.reiniciar(destino)
+        self.pivote = destino
+        return movidos
 
     def agregar_a_memoria(self, dato):
         posicion = self.pivote
@@ -91,7 +286,7 @@ class EstadoMaquina:
         return posicion
 
     def incrementar_contador(self, programa):
-        self.programas[programa]["contador"] += 1
+        self._programa(programa)["contador"] += 1
         return self
 
     def avanzar_tiempo(self, tiempo):
@@ -100,6 +295,39 @@ class EstadoMaquina:
             self.tiempo_llegada = self.reloj
         return self
 
+    def registrar_llegada(self, nombre):
+        """
+        Pone un programa recién cargado en la cola de listos si ya llegó o en
+        espera de su tiempo de llegada.
+        """
+        programa = self.programas[nombre]
+        if programa["tiempo_llegada"] <= self.reloj:
+            self.listos.agregar(nombre, programa)
+        else:
+            self.llegadas.agregar(nombre, programa)
+
+    def admitir_llegadas(self):
+        """Pasa a la cola de listos los programas que ya llegaron"""
+        for nombre in self.llegadas.llegados(self.reloj):
+            self.listos.agregar(nombre, self.programas[nombre])
+
+    def bloquear(self, nombre, desplazamiento, listo):
+        """
+        Saca un programa de la cola de listos para que espere una entrada que se
+        guarda en la celda a `desplazamiento` del inicio del programa, que sigue
+        siendo la misma si la compactación lo mueve; el dispositivo termina en el
+        reloj `listo`.
+        """
+        self.listos.quitar(nombre)
+        self.bloqueados[nombre] = (desplazamiento, listo)
+        self.bloqueos += 1
+
+    def desbloquear(self, nombre):
+        """Devuelve a la cola de listos, luego del lea, un programa bloqueado"""
+        del self.bloqueados[nombre]
+        self.incrementar_contador(nombre)
+        self.listos.agregar(nombre, self.programas[nombre])
+
     @property
     def programas_disponibles(self):
         ordenados = sorted(self.programas.items(), key=lambda p: p[1]["tiempo_llegada"])
@@ -0,0 +1,486 @@
+"""
+Instantáneas de una máquina en disco.
+
+Una instantánea guarda un `EstadoMaquina` completo (memoria, variables, etiquetas,
+código, programas, colas, salidas, relojes y métricas) junto con el modelo de
+latencia de la máquina, incluido el estado de su generador aleatorio, así que una
+corrida restaurada produce los mismos relojes que la original. Sirve para guardar
+simulaciones largas cada cierto tiempo, retomarlas tras una falla y bifurcarlas.
+
+Formato::
+
+    archivo    = b"CHESTADO" versión:u8 longitud:u64 metadatos página*
+    metadatos  = JSON con los campos del estado sin la memoria, el modelo de
+                 latencia, las tablas de cadenas de la memoria y, por página, dónde
+                 están sus columnas
+    página     = programas:i32* nombres:i32* tipos:u8* valores (JSON)
+
+El JSON sólo tiene datos: los valores que no son números, cadenas, listas, None ni
+lógicos se escriben como un objeto de una llave que indica cómo reconstruirlos
+(tuplas, diccionarios, conjuntos, instrucciones o los objetos de las clases de
+`_CLASES`, con sus atributos). Al cargar se revisa que cada objeto tenga los
+atributos de su clase y que los campos del estado sean del tipo esperado, y cualquier
+otra cosa se rechaza con `InstantaneaInvalida`.
+
+Las páginas que se comparten, como las vacías, se guardan una sola vez. Al cargar,
+el archivo se proyecta en memoria y cada página se lee la primera vez que se usa,
+así que restaurar una imagen grande no cuesta más que las páginas que se tocan.
+El archivo se escribe aparte y luego reemplaza al anterior, por lo que una falla a
+mitad de camino no daña la última instantánea.
+"""
+import array
+import collections
+import json
+import mmap
+import os
+import random
+import struct
+
+from chmaquina.asignacion import Huecos
+from chmaquina.colas import ColaFifo, ColaMultinivel, ColaPrioridad, Llegadas
+from chmaquina.errores import InstantaneaInvalida
+from chmaquina.estado import EstadoMaquina
+from chmaquina.instrucciones import Instruccion, Operacion
+from chmaquina.latencia import (
+    Grabadora,
+    LatenciaAleatoria,
+    LatenciaFija,
+    LatenciaGrabada,
+    LatenciaPorDispositivo,
+    ModeloLatencia,
+)
+from chmaquina.memoria import _SIN_VALOR, Memoria, _Interno, _Pagina
+from chmaquina.metricas import Metricas
+from chmaquina.paginacion import EstadisticasPaginacion
+from chmaquina.tipos import convertir, formatear
+
+MAGIA = b"CHESTADO"
+VERSION = 2
+
+_CABECERA = struct.Struct("<8sBQ")
+
+_PAGINA_DANADA = "Una página de la instantánea está dañada"
+
+# Llaves de los metadatos
+_METADATOS = {
+    "campos",
+    "latencia",
+    "tamano",
+    "tamano_pagina",
+    "cadenas",
+    "paginas",
+    "ubicaciones",
+}
+
+# Atributos del estado que no van en los metadatos
+_APARTE = ("memoria", "_programas_propios")
+
+# Un ejemplar de cada clase que puede aparecer en una instantánea: al restaurar un
+# objeto debe tener exactamente los atributos de su ejemplar
+_CLASES = {
+    ejemplar.__class__.__name__: (ejemplar.__class__, frozenset(vars(ejemplar)))
+    for ejemplar in (
+        Huecos(0, 0),
+        ColaFifo(),
+        ColaPrioridad(None),
+        ColaMultinivel(1),
+        Llegadas(),
+        Metricas(),
+        LatenciaAleatoria(),
+        LatenciaFija(1),
+        LatenciaPorDispositivo({}),
+        LatenciaGrabada([]),
+        Grabadora(LatenciaFija(1)),
+    )
+}
+
+# Campos del estado con el tipo que deben tener al restaurarse
+_CAMPOS = {
+    campo: valor.__class__
+    for campo, valor in vars(EstadoMaquina(Memoria(1), 0)).items()
+    if campo not in _APARTE
+}
+_COLAS_DE_LISTOS = (ColaFifo, ColaPrioridad, ColaMultinivel)
+
+
+def _a_datos(valor):
+    """`valor` como datos que se pueden escribir en JSON"""
+    clase = valor.__class__
+    if valor is None or clase in (bool, int, float, str):
+        return valor
+    if clase is list:
+        return [_a_datos(elemento) for elemento in valor]
+    if clase is dict:
+        return {
+            "dict": [[_a_datos(llave), _a_datos(dato)] for llave, dato in valor.items()]
+        }
+    if valor is _SIN_VALOR:
+        return {"vacio": 0}
+    if isinstance(valor, int):
+        # Enteros que recuerdan el texto con el que se escribieron
+        return {"I": formatear(valor)}
+    if isinstance(valor, float):
+        return {"R": formatear(valor)}
+    if clase is tuple:
+        return {"tupla": [_a_datos(elemento) for elemento in valor]}
+    if clase is set:
+        return {"conjunto": [_a_datos(elemento) for elemento in valor]}
+    if clase is collections.deque:
+        return {"cola": [_a_datos(elemento) for elemento in valor]}
+    if clase is Operacion:
+        return {"operacion": valor.value}
+    if clase is Instruccion:
+        return {"instruccion": [valor.operacion.value, _a_datos(valor.argumentos)]}
+    if clase is random.Random:
+        return {"aleatorio": _a_datos(valor.getstate())}
+    if _CLASES.get(clase.__name__, (None,))[0] is clase:
+        campos = {}
+        for campo, dato in vars(valor).items():
+            if clase is ColaPrioridad and campo == "llave" and callable(dato):
+                # La prioridad la calcula el planificador; al restaurar se toma el
+                # de la máquina
+                dato = None
+            campos[campo] = _a_datos(dato)
+        return {"objeto": [clase.__name__, campos]}
+    raise TypeError(f"Una instantánea no puede guardar {valor!r}")
+
+
+def _objeto(contenido):
+    nombre, campos = contenido
+    clase, atributos = _CLASES[nombre]
+    if campos.keys() != atributos:
+        raise ValueError(f"Atributos de {nombre} inesperados")
+    objeto = clase.__new__(clase)
+    objeto.__dict__.update(
+        {campo: _de_datos(dato) for campo, dato in campos.items()}
+    )
+    return objeto
+
+
+def _aleatorio(contenido):
+    aleatorio = random.Random()
+    aleatorio.setstate(_de_datos(contenido))
+    return aleatorio
+
+
+def _diccionario(contenido):
+    return {_de_datos(llave): _de_datos(dato) for llave, dato in contenido}
+
+
+def _instruccion(contenido):
+    operacion, argumentos = contenido
+    return Instruccion(Operacion(operacion), _de_datos(argumentos))
+
+
+def _vacio(contenido):
+    return _SIN_VALOR
+
+
+_RECONSTRUIR = {
+    "dict": _diccionario,
+    "vacio": _vacio,
+    "I": lambda texto: convertir("I", texto),
+    "R": lambda texto: convertir("R", texto),
+    "tupla": lambda elementos: tuple(_de_datos(e) for e in elementos),
+    "conjunto": lambda elementos: {_de_datos(e) for e in elementos},
+    "cola": lambda elementos: collections.deque(_de_datos(e) for e in elementos),
+    "operacion": Operacion,
+    "instruccion": _instruccion,
+    "aleatorio": _aleatorio,
+    "objeto": _objeto,
+}
+
+
+def _de_datos(datos):
+    """
+    Reconstruye un valor escrito por `_a_datos`. Lanza ValueError, TypeError o
+    KeyError si los datos no son los de un valor.
+    """
+    clase = datos.__class__
+    if datos is None or clase in (bool, int, float, str):
+        return datos
+    if clase is list:
+        return [_de_datos(elemento) for elemento in datos]
+    if clase is not dict or len(datos) != 1:
+        raise ValueError(f"Dato inesperado: {datos!r}")
+    ((etiqueta, contenido),) = datos.items()
+    if etiqueta in ("I", "R") and contenido.__class__ is not str:
+        raise ValueError(f"Número inesperado: {contenido!r}")
+    return _RECONSTRUIR[etiqueta](contenido)
+
+
+def _codificar(datos):
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class _PaginaMapeada(object):
+    """
+    Una página de una instantánea que se lee del archivo la primera vez que se
+    consulta alguna de sus columnas. Nunca se escribe: la memoria la copia antes.
+    """
+
+    def __init__(self, datos, posicion, tamano, longitud_valores, limites):
+        self._datos = datos
+        self._posicion = posicion
+        self._tamano = tamano
+        self._longitud_valores = longitud_valores
+        # Número de cadenas de cada tabla, para revisar los identificadores
+        self._limites = limites
+
+    def __getattr__(self, columna):
+        # Sólo se llama mientras las columnas no se han leído
+        if columna not in _Pagina.__slots__:
+            raise AttributeError(columna)
+        self._leer()
+        return getattr(self, columna)
+
+    def _leer(self):
+        datos, posicion, tamano = self._datos, self._posicion, self._tamano
+        columnas = {}
+        columnas_y_codigos = (("programas", "i"), ("nombres", "i"), ("tipos", "B"))
+        for (columna, codigo), limite in zip(columnas_y_codigos, self._limites):
+            arreglo = array.array(codigo)
+            fin = posicion + tamano * arreglo.itemsize
+            arreglo.frombytes(datos[posicion:fin])
+            if tamano and not 0 <= min(arreglo) <= max(arreglo) < limite:
+                raise InstantaneaInvalida(_PAGINA_DANADA)
+            columnas[columna] = arreglo
+            posicion = fin
+        try:
+            valores = json.loads(datos[posicion : posicion + self._longitud_valores])
+            if valores.__class__ is not list:
+                raise ValueError("Los valores de una página no son una lista")
+            valores = [_de_datos(valor) for valor in valores]
+        except (ValueError, TypeError, KeyError, RecursionError) as e:
+            raise InstantaneaInvalida(_PAGINA_DANADA) from e
+        if len(valores) != tamano:
+            raise InstantaneaInvalida(_PAGINA_DANADA)
+        for columna, arreglo in columnas.items():
+            setattr(self, columna, arreglo)
+        self.valores = valores
+        del self._datos
+
+    copiar = _Pagina.copiar
+    __eq__ = _Pagina.__eq__
+
+
+def guardar(estado, ruta, latencia=None):
+    """
+    Guarda el estado en `ruta`; `latencia` es el modelo de latencia de la máquina
+    que lo ejecuta. Lanza TypeError si el estado o el modelo tienen algo que la
+    instantánea no sabe guardar, como un modelo de latencia propio.
+    """
+    memoria = estado.memoria
+    campos = {
+        llave: _a_datos(valor)
+        for llave, valor in vars(estado).items()
+        if llave not in _APARTE
+    }
+    latencia = _a_datos(latencia)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as archivo:
+        # Las columnas de cada página distinta, en el orden en que aparecen. Las
+        # páginas vistas se conservan para que sus id no se reutilicen
+        indices = {}
+        vistas = []
+        paginas = []
+        columnas = []
+        for numero in range(len(memoria._entradas())):
+            pagina = memoria._consultar(numero)
+            indice = indices.get(id(pagina))
+            if indice is None:
+                indice = indices[id(pagina)] = len(columnas)
+                vistas.append(pagina)
+                valores = _codificar([_a_datos(valor) for valor in pagina.valores])
+                columnas.append(
+                    (
+                        pagina.programas.tobytes()
+                        + pagina.nombres.tobytes()
+                        + pagina.tipos.tobytes(),
+                        valores,
+                    )
+                )
+            paginas.append(indice)
+
+        posicion = 0
+        ubicaciones = []
+        for fijas, valores in columnas:
+            ubicaciones.append((posicion, len(valores)))
+            posicion += len(fijas) + len(valores)
+        metadatos = _codificar(
+            {
+                "campos": campos,
+                "latencia": latencia,
+                "tamano": memoria.tamano,
+                "tamano_pagina": memoria.tamano_pagina,
+                "cadenas": [
+                    memoria._programas.cadenas,
+                    memoria._tipos.cadenas,
+                    memoria._nombres.cadenas,
+                ],
+                "paginas": paginas,
+                "ubicaciones": ubicaciones,
+            }
+        )
+        archivo.write(_CABECERA.pack(MAGIA, VERSION, len(metadatos)))
+        archivo.write(metadatos)
+        for fijas, valores in columnas:
+            archivo.write(fijas)
+            archivo.write(valores)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+def _interno(cadenas):
+    interno = _Interno()
+    interno.cadenas = list(cadenas)
+    interno.ids = {cadena: i for i, cadena in enumerate(cadenas) if i}
+    return interno
+
+
+def cargar(ruta, maquina=None):
+    """
+    Retorna el estado guardado en `ruta`. Con una máquina, ésta recupera el modelo
+    de latencia guardado y, si usa memoria virtual, el estado usa una memoria de su
+    configuración con las estadísticas de paginación en cero. Si la cola de listos
+    ordena con una función del planificador, como `Prioridad`, la cola usa la de la
+    máquina; sin máquina queda sin función de prioridad.
+    """
+    with open(ruta, "rb") as archivo:
+        try:
+            datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise InstantaneaInvalida(f"{ruta} está vacío")
+    if len(datos) < _CABECERA.size:
+        raise InstantaneaInvalida(f"{ruta} no es una instantánea")
+    magia, version, longitud = _CABECERA.unpack_from(datos)
+    if magia != MAGIA or version != VERSION:
+        raise InstantaneaInvalida(
+            f"{ruta} no es una instantánea de la versión {VERSION}"
+        )
+    inicio = _CABECERA.size + longitud
+    try:
+        metadatos = json.loads(datos[_CABECERA.size : inicio])
+        if metadatos.__class__ is not dict or metadatos.keys() != _METADATOS:
+            raise ValueError("Faltan o sobran metadatos")
+        memoria = _memoria(metadatos, datos, inicio)
+        campos = _campos(metadatos["campos"])
+        latencia = _de_datos(metadatos["latencia"])
+        if latencia is not None and not isinstance(latencia, ModeloLatencia):
+            raise ValueError("El modelo de latencia no es un ModeloLatencia")
+    except (
+        ValueError,
+        TypeError,
+        KeyError,
+        IndexError,
+        AttributeError,
+        RecursionError,
+    ) as e:
+        raise InstantaneaInvalida(f"{ruta} está incompleto o dañado") from e
+
+    if maquina is not None:
+        if latencia is not None:
+            maquina.latencia = latencia
+        if maquina.paginacion is not None:
+            memoria = _a_memoria_virtual(memoria, maquina.paginacion)
+        listos = campos["listos"]
+        if listos.__class__ is ColaPrioridad and listos.llave is None:
+            listos.llave = maquina.cola_de_listos().llave
+
+    estado = EstadoMaquina.__new__(EstadoMaquina)
+    estado.__dict__.update(campos)
+    estado.memoria = memoria
+    estado._programas_propios = set()
+    return estado
+
+
+def _entero(valor, minimo=0):
+    if valor.__class__ is not int or valor < minimo:
+        raise ValueError(f"Se esperaba un entero de al menos {minimo}: {valor!r}")
+    return valor
+
+
+def _memoria(metadatos, datos, inicio):
+    """La memoria de la instantánea, con sus páginas sin leer"""
+    tamano = _entero(metadatos["tamano"], 1)
+    tamano_pagina = _entero(metadatos["tamano_pagina"], 1)
+    cadenas = metadatos["cadenas"]
+    if len(cadenas) != 3 or any(
+        tabla[0] is not None or not all(c.__class__ is str for c in tabla[1:])
+        for tabla in cadenas
+    ):
+        raise ValueError("Las tablas de cadenas están dañadas")
+    programas, tipos, nombres = cadenas
+
+    # Cada página ocupa sus columnas fijas más los valores, una tras otra
+    fijas = tamano_pagina * (2 * array.array("i").itemsize + 1)
+    unicas = []
+    posicion = 0
+    for ubicacion, longitud_valores in metadatos["ubicaciones"]:
+        if _entero(ubicacion) != posicion:
+            raise ValueError("Las ubicaciones de las páginas están dañadas")
+        _entero(longitud_valores)
+        unicas.append(
+            _PaginaMapeada(
+                datos,
+                inicio + posicion,
+                tamano_pagina,
+                longitud_valores,
+                (len(programas), len(nombres), len(tipos)),
+            )
+        )
+        posicion += fijas + longitud_valores
+    if inicio + posicion != len(datos):
+        raise ValueError("El archivo está incompleto")
+    paginas = metadatos["paginas"]
+    if len(paginas) != -(-tamano // tamano_pagina):
+        raise ValueError("El número de páginas no corresponde al tamaño")
+
+    memoria = Memoria.__new__(Memoria)
+    memoria.tamano = tamano
+    memoria.tamano_pagina = tamano_pagina
+    memoria._programas = _interno(programas)
+    memoria._tipos = _interno(tipos)
+    memoria._nombres = _interno(nombres)
+    memoria._paginas = [unicas[_entero(indice)] for indice in paginas]
+    memoria._propias = set()
+    return memoria
+
+
+def _campos(guardados):
+    """Los campos del estado, revisando que cada uno tenga el tipo esperado"""
+    if guardados.keys() != _CAMPOS.keys():
+        raise ValueError("Faltan o sobran campos del estado")
+    campos = {campo: _de_datos(dato) for campo, dato in guardados.items()}
+    for campo, valor in campos.items():
+        if campo == "listos":
+            correcto = valor.__class__ in _COLAS_DE_LISTOS
+        else:
+            correcto = valor.__class__ is _CAMPOS[campo]
+        if not correcto:
+            raise ValueError(f"El campo {campo} del estado tiene un tipo inesperado")
+    return campos
+
+
+def _a_memoria_virtual(memoria, paginacion):
+    """Pasa las páginas con datos de una memoria restaurada a una memoria virtual"""
+    virtual = paginacion.crear_memoria(memoria.tamano)
+    if virtual.tamano_pagina != memoria.tamano_pagina:
+        raise InstantaneaInvalida(
+            "La instantánea usa páginas de otro tamaño que la memoria virtual"
+        )
+    virtual._programas = memoria._programas
+    virtual._tipos = memoria._tipos
+    virtual._nombres = memoria._nombres
+    vacia = _Pagina(memoria.tamano_pagina)
+    for numero, pagina in enumerate(memoria._paginas):
+        if pagina == vacia:
+            continue
+        propia = virtual._pagina_propia(numero)
+        propia.programas[:] = pagina.programas
+        propia.nombres[:] = pagina.nombres
+        propia.tipos[:] = pagina.tipos
+        propia.valores[:] = pagina.valores
+    virtual._paginas.estadisticas = EstadisticasPaginacion()
+    return virtual
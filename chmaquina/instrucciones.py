@@ -0,0 +1,133 @@
+import collections
+import enum
+
+from chmaquina.errores import ChProgramaInvalido
+
+
+class Operacion(enum.Enum):
+    """
+    Operaciones que puede ejecutar la ch maquina.
+    """
+
+    NADA = "//"
+    NUEVA = "nueva"
+    ETIQUETA = "etiqueta"
+    CARGUE = "cargue"
+    ALMACENE = "almacene"
+    VAYA = "vaya"
+    VAYASI = "vayasi"
+    LEA = "lea"
+    SUME = "sume"
+    RESTE = "reste"
+    MULTIPLIQUE = "multiplique"
+    DIVIDA = "divida"
+    POTENCIA = "potencia"
+    MODULO = "modulo"
+    CONCATENE = "concatene"
+    ELIMINE = "elimine"
+    EXTRAIGA = "extraiga"
+    Y = "Y"
+    O = "O"
+    NO = "NO"
+    IMPRIMA = "imprima"
+    MUESTRE = "muestre"
+    RETORNE = "retorne"
+
+
+ARITMETICAS = {
+    Operacion.SUME,
+    Operacion.RESTE,
+    Operacion.MULTIPLIQUE,
+    Operacion.DIVIDA,
+    Operacion.POTENCIA,
+    Operacion.MODULO,
+}
+
+CON_CADENAS = {Operacion.CONCATENE, Operacion.ELIMINE, Operacion.EXTRAIGA}
+
+DE_IO = {
+    Operacion.LEA,
+    Operacion.IMPRIMA,
+    Operacion.MUESTRE,
+    Operacion.ALMACENE,
+    Operacion.CARGUE,
+}
+
+DECLARATIVAS = {Operacion.NUEVA, Operacion.ETIQUETA}
+
+# El argumento decodificado con la celda que escribe cada operación
+DESTINOS = {
+    operacion: -1
+    for operacion in ARITMETICAS
+    | CON_CADENAS
+    | {Operacion.CARGUE, Operacion.Y, Operacion.O, Operacion.NO}
+}
+DESTINOS[Operacion.ALMACENE] = 0
+DESTINOS[Operacion.LEA] = 0
+
+
+# Una instrucción decodificada. Los argumentos que son variables se guardan como
+# desplazamientos desde el inicio del programa y las etiquetas como el número de
+# línea (indexado en 0) al que saltan.
+Instruccion = collections.namedtuple("Instruccion", ["operacion", "argumentos"])
+
+
+def decodificar(linea, posiciones, etiquetas):
+    """
+    Decodifica una linea ya verificada.
+
+    `posiciones` asocia cada variable (incluido el acumulador) con su desplazamiento
+    desde el inicio del programa y `etiquetas` cada etiqueta con su línea.
+    """
+    tokens = linea.split()
+    if not tokens or linea.lstrip().startswith("//"):
+        return Instruccion(Operacion.NADA, ())
+    instruccion, *argumentos = tokens
+    operacion = Operacion(instruccion)
+    acumulador = posiciones["acumulador"]
+
+    if operacion in DECLARATIVAS or operacion is Operacion.RETORNE:
+        argumentos = ()
+    elif operacion in ARITMETICAS or operacion in (
+        Operacion.CARGUE,
+        Operacion.ALMACENE,
+    ):
+        variable, = argumentos
+        argumentos = (posiciones[variable], acumulador)
+    elif operacion in (Operacion.LEA, Operacion.IMPRIMA, Operacion.MUESTRE):
+        variable, = argumentos
+        argumentos = (posiciones[variable],)
+    elif operacion is Operacion.VAYA:
+        etiqueta, = argumentos
+        argumentos = (etiquetas[etiqueta],)
+    elif operacion is Operacion.VAYASI:
+        positivo, negativo = argumentos
+        argumentos = (etiquetas[positivo], etiquetas[negativo], acumulador)
+    elif operacion in CON_CADENAS:
+        operando, = argumentos
+        if operacion is Operacion.EXTRAIGA:
+            operando = int(operando)
+        argumentos = (operando, acumulador)
+    elif operacion in (Operacion.Y, Operacion.O, Operacion.NO):
+        argumentos = tuple(posiciones[variable] for variable in argumentos)
+    return Instruccion(operacion, argumentos)
+
+
+def decodificar_programa(codigo, variables, etiquetas):
+    """
+    Decodifica todas las lineas de un programa verificado. Lanza
+    `ChProgramaInvalido` si alguna no es una instrucción válida.
+
+    Las variables se ubican después del código, en orden, seguidas del acumulador.
+    """
+    posiciones = {
+        nombre: len(codigo) + numero for numero, nombre in enumerate(variables)
+    }
+    posiciones["acumulador"] = len(codigo) + len(variables)
+    decodificado = []
+    for linea in codigo:
+        try:
+            decodificado.append(decodificar(linea, posiciones, etiquetas))
+        except (ValueError, KeyError) as e:
+            raise ChProgramaInvalido(f"No se puede decodificar '{linea}'") from e
+    return tuple(decodificado)
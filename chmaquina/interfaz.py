@@ -1,9 +1,20 @@
+import bisect
+import time
+
 import gi
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
+from gi.repository import GLib, GObject, Gtk
 
 from chmaquina.maquina import Maquina
+from chmaquina.metricas import cifra
+from chmaquina.tipos import formatear
+
+# Veces por segundo que se redibuja la ventana durante la corrida continua
+CUADROS_POR_SEGUNDO = 20
+# Segundos que la corrida continua ejecuta instrucciones antes de devolver el
+# control a la interfaz
+REBANADA = 0.01
 
 
 class TecladoGtk(object):
@@ -34,6 +45,237 @@ class TecladoGtk(object):
             return text
 
 
+class TablaPorLlave(object):
+    """
+    Las filas de un `Gtk.TreeView` identificadas por una llave ordenable, para
+    cambiarlas una por una en lugar de reconstruir el modelo en cada paso.
+    """
+
+    def __init__(self, tabla, columnas):
+        self.tabla = tabla
+        self.columnas = columnas
+        self.modelo = None
+        self._filas = {}
+        self._llaves = []
+
+    def reconstruir(self, filas):
+        """Reemplaza el modelo con las filas dadas como pares (llave, fila)"""
+        self.modelo = Gtk.ListStore(*[str] * self.columnas)
+        self._filas = {}
+        self._llaves = []
+        for llave, fila in sorted(filas, key=lambda f: f[0]):
+            self._filas[llave] = self.modelo.append(fila)
+            self._llaves.append(llave)
+        self.tabla.set_model(self.modelo)
+
+    def vaciar(self):
+        self.modelo = None
+        self._filas = {}
+        self._llaves = []
+        self.tabla.set_model(None)
+
+    def poner(self, llave, fila):
+        """Cambia la fila de la llave o la inserta en su lugar"""
+        iterador = self._filas.get(llave)
+        if iterador is not None:
+            self.modelo.set_row(iterador, fila)
+            return
+        posicion = bisect.bisect(self._llaves, llave)
+        if posicion == len(self._llaves):
+            iterador = self.modelo.append(fila)
+        else:
+            siguiente = self._filas[self._llaves[posicion]]
+            iterador = self.modelo.insert_before(siguiente, fila)
+        self._llaves.insert(posicion, llave)
+        self._filas[llave] = iterador
+
+    def quitar(self, llave):
+        iterador = self._filas.pop(llave, None)
+        if iterador is not None:
+            self.modelo.remove(iterador)
+            del self._llaves[bisect.bisect_left(self._llaves, llave)]
+
+    def quitar_grupo(self, grupo):
+        """Quita las filas cuya llave es una tupla que empieza con `grupo`"""
+        inicio = bisect.bisect_left(self._llaves, (grupo,))
+        fin = inicio
+        while fin < len(self._llaves) and self._llaves[fin][0] == grupo:
+            self.modelo.remove(self._filas.pop(self._llaves[fin]))
+            fin += 1
+        del self._llaves[inicio:fin]
+
+
+def fila_de_memoria(posicion, item):
+    return [
+        f"{posicion:06d}",
+        item.get("programa", ""),
+        item.get("tipo", ""),
+        item.get("nombre", ""),
+        formatear(item.get("valor")),
+    ]
+
+
+class ModeloMemoria(GObject.Object, Gtk.TreeModel):
+    """
+    Un `Gtk.TreeModel` perezoso con una fila por posición de memoria entre `inicio`
+    y `fin`. Las filas se leen de la memoria sólo cuando la tabla las dibuja, así que
+    crear el modelo o cambiar de estado no depende del tamaño de la memoria.
+
+    Los iteradores guardan el número de fila más uno en `user_data`.
+    """
+
+    COLUMNAS = 5
+
+    def __init__(self, memoria, inicio, fin):
+        super().__init__()
+        self.memoria = memoria
+        self.inicio = inicio
+        self.fin = fin
+        # La última fila leída, porque la tabla pide cada columna por separado
+        self._fila = (None, None)
+
+    def cambiar_memoria(self, memoria, posiciones):
+        """Usa la memoria de otro estado y avisa las filas que cambiaron"""
+        self.memoria = memoria
+        self._fila = (None, None)
+        for posicion in posiciones:
+            if self.inicio <= posicion < self.fin:
+                numero = posicion - self.inicio
+                self.row_changed(Gtk.TreePath(numero), self._iterador(numero))
+
+    def posicion(self, numero):
+        return self.inicio + numero
+
+    def _iterador(self, numero):
+        iterador = Gtk.TreeIter()
+        iterador.user_data = numero + 1
+        return iterador
+
+    def _numero(self, iterador):
+        return iterador.user_data - 1
+
+    def do_get_flags(self):
+        return Gtk.TreeModelFlags.LIST_ONLY | Gtk.TreeModelFlags.ITERS_PERSIST
+
+    def do_get_n_columns(self):
+        return self.COLUMNAS
+
+    def do_get_column_type(self, columna):
+        return str
+
+    def do_get_iter(self, camino):
+        numero = camino.get_indices()[0]
+        if 0 <= numero < self.fin - self.inicio:
+            return True, self._iterador(numero)
+        return False, None
+
+    def do_get_path(self, iterador):
+        return Gtk.TreePath(self._numero(iterador))
+
+    def do_get_value(self, iterador, columna):
+        posicion = self.posicion(self._numero(iterador))
+        anterior, fila = self._fila
+        if anterior != posicion:
+            fila = fila_de_memoria(posicion, self.memoria[posicion])
+            self._fila = (posicion, fila)
+        return fila[columna]
+
+    def do_iter_next(self, iterador):
+        numero = self._numero(iterador) + 1
+        if numero < self.fin - self.inicio:
+            iterador.user_data = numero + 1
+            return True
+        return False
+
+    def do_iter_previous(self, iterador):
+        numero = self._numero(iterador) - 1
+        if numero >= 0:
+            iterador.user_data = numero + 1
+            return True
+        return False
+
+    def do_iter_children(self, padre):
+        if padre is None and self.fin > self.inicio:
+            return True, self._iterador(0)
+        return False, None
+
+    def do_iter_has_child(self, iterador):
+        return False
+
+    def do_iter_n_children(self, iterador):
+        return self.fin - self.inicio if iterador is None else 0
+
+    def do_iter_nth_child(self, padre, numero):
+        if padre is None and 0 <= numero < self.fin - self.inicio:
+            return True, self._iterador(numero)
+        return False, None
+
+    def do_iter_parent(self, hijo):
+        return False, None
+
+
+class TablaDeMemoria(object):
+    """
+    La tabla de memoria sobre un `ModeloMemoria`, con toda la memoria o sólo la
+    región de un programa.
+    """
+
+    def __init__(self, tabla):
+        self.tabla = tabla
+        # Con filas de alto fijo la tabla no mide cada fila de la memoria
+        for columna in tabla.get_columns():
+            columna.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+            columna.set_fixed_width(110)
+        tabla.set_fixed_height_mode(True)
+        self.modelo = None
+        # Programa cuya región se muestra o None para toda la memoria
+        self.programa = None
+
+    def rango(self, estado):
+        if self.programa is not None:
+            datos = estado.programas.get(self.programa)
+            datos = datos or estado.terminados.get(self.programa)
+            if datos is not None and self.programa in estado.variables:
+                return datos["inicio"], datos["final"]
+            # La región del programa ya se liberó
+            self.programa = None
+        return 0, len(estado.memoria)
+
+    def mostrar(self, estado, celdas=None):
+        """
+        Muestra la memoria de `estado`; con las `celdas` que cambiaron desde el
+        estado anterior sólo se redibujan esas filas.
+        """
+        inicio, fin = self.rango(estado)
+        modelo = self.modelo
+        mismo_rango = modelo is not None and (modelo.inicio, modelo.fin) == (
+            inicio,
+            fin,
+        )
+        if celdas is None or not mismo_rango:
+            self.modelo = ModeloMemoria(estado.memoria, inicio, fin)
+            self.tabla.set_model(self.modelo)
+        else:
+            modelo.cambiar_memoria(estado.memoria, celdas)
+
+    def vaciar(self):
+        self.modelo = None
+        self.programa = None
+        self.tabla.set_model(None)
+
+    def ir_a(self, posicion):
+        """Selecciona y centra la fila de una posición; False si no se muestra"""
+        if self.modelo is None:
+            return False
+        numero = posicion - self.modelo.inicio
+        if not 0 <= numero < self.modelo.fin - self.modelo.inicio:
+            return False
+        camino = Gtk.TreePath(numero)
+        self.tabla.scroll_to_cell(camino, None, True, 0.5, 0)
+        self.tabla.set_cursor(camino, None, False)
+        return True
+
+
 class InterfazChMaquina:
     """
     Controlador de la interfaz gráfica del ch maquina.
@@ -44,19 +286,40 @@ class InterfazChMaquina:
         self.maquina = None
         self.estado = None
         self.iterador = None
+        # Estado de trabajo de la corrida continua, modificado en sitio
+        self.trabajo = None
+        # Fuentes de GLib de la corrida continua: la ejecución y el redibujo
+        self.corrida = None
+        self.refresco = None
+        self.ejecutando = False
         self.ventana = constructor.get_object("chmaquina")
-        self.tabla_memoria = constructor.get_object("tabla-memoria")
-        self.tabla_variables = constructor.get_object("tabla-variables")
-        self.tabla_etiquetas = constructor.get_object("tabla-etiquetas")
-        self.tabla_programas = constructor.get_object("tabla-programas")
-        self.preparar_tabla(
-            self.tabla_memoria, ["Posición", "Programa", "Tipo", "Nombre", "Valor"]
+        self.tabla_memoria = TablaDeMemoria(
+            self.preparar_tabla(
+                "tabla-memoria", ["Posición", "Programa", "Tipo", "Nombre", "Valor"]
+            )
         )
-        self.preparar_tabla(self.tabla_variables, ["Programa", "Nombre", "Posición"])
-        self.preparar_tabla(self.tabla_etiquetas, ["Programa", "Nombre", "Posición"])
-        self.preparar_tabla(
-            self.tabla_programas,
-            ["Programa", "Llegada", "Inicio", "Datos", "Fin", "Contador"],
+        # Programas que ofrece el filtro de la tabla de memoria
+        self.programas_filtro = None
+        self.llenando_filtro = False
+        self.tabla_variables = self.preparar_tabla_por_llave(
+            "tabla-variables", ["Programa", "Nombre", "Posición"]
+        )
+        self.tabla_etiquetas = self.preparar_tabla_por_llave(
+            "tabla-etiquetas", ["Programa", "Nombre", "Posición"]
+        )
+        self.tabla_programas = self.preparar_tabla_por_llave(
+            "tabla-programas",
+            [
+                "Programa",
+                "Llegada",
+                "Inicio",
+                "Datos",
+                "Fin",
+                "Contador",
+                "Respuesta",
+                "Retorno",
+                "Espera",
+            ],
         )
         self.preferencias = {
             "tamano_memoria": 512,
@@ -66,12 +329,48 @@ class InterfazChMaquina:
         }
         self.redibujar()
 
-    @staticmethod
-    def preparar_tabla(tabla, titulos):
+    def preparar_tabla(self, nombre, titulos):
+        tabla = self.constructor.get_object(nombre)
         for pos, titulo in enumerate(titulos):
             tabla.append_column(
                 Gtk.TreeViewColumn(titulo, Gtk.CellRendererText(), text=pos)
             )
+        return tabla
+
+    def preparar_tabla_por_llave(self, nombre, titulos):
+        return TablaPorLlave(self.preparar_tabla(nombre, titulos), len(titulos))
+
+    def on_filtro_programa_changed(self, combo):
+        if self.llenando_filtro:
+            return
+        self.tabla_memoria.programa = combo.get_active_id() or None
+        if self.estado is not None and self.maquina is not None:
+            self.tabla_memoria.mostrar(self.estado)
+
+    def on_ir_a_posicion_activate(self, entrada):
+        try:
+            posicion = int(entrada.get_text())
+        except ValueError:
+            return
+        if not self.tabla_memoria.ir_a(posicion) and self.tabla_memoria.programa:
+            # La posición está fuera del programa filtrado: mostrar toda la memoria
+            self.constructor.get_object("filtro-programa").set_active_id("")
+            self.tabla_memoria.ir_a(posicion)
+
+    def actualizar_filtro(self):
+        """Ofrece en el filtro de memoria los programas que tienen región"""
+        nombres = sorted(self.estado.variables) if self.estado else []
+        if nombres == self.programas_filtro:
+            return
+        self.programas_filtro = nombres
+        combo = self.constructor.get_object("filtro-programa")
+        self.llenando_filtro = True
+        combo.remove_all()
+        combo.append("", "Toda la memoria")
+        for nombre in nombres:
+            combo.append(nombre, f"Programa {nombre}")
+        combo.set_active_id(self.tabla_memoria.programa or "")
+        self.llenando_filtro = False
 
     def on_chmaquina_destroy(self, *args):
         Gtk.main_quit()
@@ -91,21 +390,116 @@ class InterfazChMaquina:
         )
         self.actualizar_estado(self.maquina.encender())
 
-    def on_siguiente_clicked(self, widget):
+    def preparar_iterador(self):
+        # La ejecución modifica un solo estado de trabajo; la interfaz muestra copias
         if self.iterador is None:
-            self.iterador = self.maquina.iterar(self.estado)
+            self.iterador = self.maquina.iterar(self.estado, en_sitio=True)
+
+    def on_siguiente_clicked(self, widget):
+        self.preparar_iterador()
         try:
-            self.actualizar_estado(next(self.iterador))
+            self.actualizar_estado(next(self.iterador).copiar())
         except StopIteration:
             self.iterador = None
 
     def on_continuo_clicked(self, widget):
-        if self.iterador is None:
-            self.iterador = self.maquina.iterar(self.estado)
-        for estado in self.iterador:
-            self.actualizar_estado(estado)
+        """
+        Corre la máquina en rebanadas cortas desde el ciclo de eventos de GTK, así
+        la ventana sigue respondiendo, y redibuja sólo el último estado unas pocas
+        veces por segundo.
+        """
+        if self.corrida is not None:
+            return
+        self.preparar_iterador()
+        self.trabajo = self.estado
+        self.reiniciar_velocidad()
+        self.programar_rebanada()
+        self.refresco = GLib.timeout_add(1000 // CUADROS_POR_SEGUNDO, self.refrescar)
+        self.redibujar(self.estado)
+
+    def on_pausa_clicked(self, widget):
+        """Detiene la corrida continua; Continuo o Siguiente la retoman"""
+        self.parar_corrida()
+
+    def on_detener_clicked(self, widget):
+        """Termina la corrida continua en el estado al que llegó"""
+        self.parar_corrida()
+        self.iterador = None
+
+    def on_velocidad_value_changed(self, ajuste):
+        self.reiniciar_velocidad()
+
+    def velocidad(self):
+        """Instrucciones por segundo de la corrida continua o None si no hay límite"""
+        ajuste = self.constructor.get_object("ajuste-velocidad")
+        if ajuste.get_value() >= ajuste.get_upper():
+            return None
+        return 10 ** ajuste.get_value()
+
+    def reiniciar_velocidad(self):
+        self.inicio_corrida = time.perf_counter()
+        self.pasos_corrida = 0
+
+    def programar_rebanada(self):
+        velocidad = self.velocidad()
+        if velocidad is None:
+            self.corrida = GLib.idle_add(self.correr_rebanada)
+        else:
+            espera = min(1000 / velocidad, 1000 / CUADROS_POR_SEGUNDO)
+            self.corrida = GLib.timeout_add(max(1, int(espera)), self.correr_rebanada)
+
+    def correr_rebanada(self):
+        """Ejecuta instrucciones durante una rebanada, al ritmo de la velocidad"""
+        fin = time.perf_counter() + REBANADA
+        velocidad = self.velocidad()
+        self.ejecutando = True
+        try:
+            while True:
+                ahora = time.perf_counter()
+                if ahora >= fin:
+                    break
+                if velocidad is not None:
+                    permitidos = (ahora - self.inicio_corrida) * velocidad
+                    if self.pasos_corrida >= permitidos:
+                        break
+                self.trabajo = next(self.iterador)
+                self.pasos_corrida += 1
+        except StopIteration:
+            self.corrida = None
+            self.iterador = None
+            self.parar_corrida()
+            return False
+        except Exception:
+            self.corrida = None
+            self.parar_corrida()
+            raise
+        finally:
+            self.ejecutando = False
+        self.programar_rebanada()
+        return False
+
+    def refrescar(self):
+        # Durante una rebanada el estado de trabajo puede estar a medio paso, por
+        # ejemplo mientras un lea espera el teclado
+        if not self.ejecutando and self.trabajo is not self.estado:
+            self.actualizar_estado(self.trabajo.copiar())
+        return True
+
+    def parar_corrida(self):
+        """Quita las fuentes de la corrida continua y muestra el último estado"""
+        for fuente in (self.corrida, self.refresco):
+            if fuente is not None:
+                GLib.source_remove(fuente)
+        self.corrida = None
+        self.refresco = None
+        if self.trabajo is not None and self.trabajo is not self.estado:
+            self.actualizar_estado(self.trabajo.copiar())
+        else:
+            self.redibujar(self.estado)
+        self.trabajo = None
 
     def on_apagar_clicked(self, widget):
+        self.parar_corrida()
         self.iterador = None
         self.maquina = None
         self.actualizar_estado(None)
@@ -180,8 +574,9 @@ class InterfazChMaquina:
         self.constructor.get_object("spinner-quantum").set_sensitive(estado)
 
     def actualizar_estado(self, estado):
+        anterior = self.estado
         self.estado = estado
-        self.redibujar()
+        self.redibujar(anterior)
 
     def habilitar_botones(self, activos):
         todos = [
@@ -191,23 +586,33 @@ class InterfazChMaquina:
             "cargar",
             "siguiente",
             "continuo",
+            "pausa",
+            "detener",
         ]
         for boton in todos:
             widget = self.constructor.get_object(boton)
             widget.set_sensitive(activos.get(boton, False))
 
-    def redibujar(self):
+    def redibujar(self, anterior=None):
+        """
+        Muestra el estado actual. Si se da el estado `anterior` sólo se cambian las
+        filas y lineas que cambiaron desde ese estado.
+        """
         apagada = self.estado is None or self.maquina is None
         nada_por_hacer = self.estado and self.estado.nada_por_hacer()
+        corriendo = self.corrida is not None
+        detenida = not apagada and not nada_por_hacer and not corriendo
 
         self.habilitar_botones(
             {
                 "encender": apagada,
                 "preferencias": apagada,
                 "apagar": not apagada,
-                "cargar": not apagada,
-                "siguiente": not apagada and not nada_por_hacer,
-                "continuo": not apagada and not nada_por_hacer,
+                "cargar": not apagada and not corriendo,
+                "siguiente": detenida,
+                "continuo": detenida,
+                "pausa": corriendo,
+                "detener": corriendo or (detenida and self.iterador is not None),
             }
         )
 
@@ -229,10 +634,14 @@ class InterfazChMaquina:
 
         if apagada:
             # maquina apagada
-            self.tabla_memoria.set_model(None)
-            self.tabla_etiquetas.set_model(None)
-            self.tabla_variables.set_model(None)
-            self.tabla_programas.set_model(None)
+            for tabla in (
+                self.tabla_memoria,
+                self.tabla_etiquetas,
+                self.tabla_variables,
+                self.tabla_programas,
+            ):
+                tabla.vaciar()
+            self.actualizar_filtro()
             self.constructor.get_object("area-impresora").set_buffer(Gtk.TextBuffer())
             self.constructor.get_object("area-pantalla").set_buffer(Gtk.TextBuffer())
             for label in (
@@ -244,6 +653,9 @@ class InterfazChMaquina:
                 "acumulador",
             ):
                 self.constructor.get_object(f"label-{label}").set_text("")
+            self.ventana.get_titlebar().set_subtitle(
+                "Herramienta para ejecutar ch programas"
+            )
             return
 
         instruccion = self.estado.siguiente_instruccion()
@@ -262,47 +674,62 @@ class InterfazChMaquina:
                 self.estado.buscar_variable(programa, "acumulador").get("valor", "")
             )
 
-        store = Gtk.ListStore(str, str, str, str, str)
-        for pos, item in enumerate(self.estado.memoria):
-            if item:
-                store.append(
-                    [
-                        f"{pos:06d}",
-                        item.get("programa", ""),
-                        item.get("tipo", ""),
-                        item.get("nombre", ""),
-                        item.get("valor", ""),
-                    ]
-                )
-        self.tabla_memoria.set_model(store)
-
-        store = Gtk.ListStore(str, str, str)
-        for programa, etiquetas in self.estado.etiquetas.items():
-            for nombre, pos in etiquetas.items():
-                store.append([programa, nombre, f"{pos:06d}"])
-        self.tabla_etiquetas.set_model(store)
-
-        store = Gtk.ListStore(str, str, str)
-        for programa, variables in self.estado.variables.items():
-            for nombre, pos in variables.items():
-                store.append([programa, nombre, f"{pos:06d}"])
-        self.tabla_variables.set_model(store)
-
-        # ["Programa", "Llegada", "Inicio", "Datos", "Fin", "Contador"],
-        store = Gtk.ListStore(str, str, str, str, str, str)
-        for nombre, datos in self.estado.programas.items():
-            store.append(
-                [
-                    nombre,
-                    str(datos["tiempo_llegada"]),
-                    f"{datos['inicio']:06d}",
-                    f"{datos['datos']:06d}",
-                    f"{datos['final']:06d}",
-                    str(datos["contador"]),
-                ]
-            )
-        self.tabla_programas.set_model(store)
+        self.actualizar_filtro()
+        cambios = None if anterior is None else self.estado.cambios_desde(anterior)
+        if cambios is None or cambios.completo:
+            self.reconstruir_tablas()
+        else:
+            self.aplicar_cambios(cambios)
+
+        resumen = self.estado.metricas.resumen(self.estado.reloj)
+        self.ventana.get_titlebar().set_subtitle(
+            f"Terminados: {resumen.terminados}  "
+            f"Retorno promedio: {cifra(resumen.retorno_promedio)}  "
+            f"Espera promedio: {cifra(resumen.espera_promedio)}  "
+            f"Respuesta promedio: {cifra(resumen.respuesta_promedio)}  "
+            f"Cpu ociosa: {resumen.tiempo_ocioso}  "
+            f"Utilización: {cifra(resumen.utilizacion)}"
+        )
+
+    def filas_de_posiciones(self, tablas):
+        """Filas de las variables o las etiquetas, con llave (programa, posición)"""
+        for programa, posiciones in tablas.items():
+            for nombre, pos in posiciones.items():
+                yield (programa, pos, nombre), [programa, nombre, f"{pos:06d}"]
+
+    def fila_programa(self, nombre):
+        """La fila de un programa en ejecución o terminado, o None si ya no está"""
+        if nombre in self.estado.programas:
+            datos = self.estado.programas[nombre]
+            contador = str(datos["contador"])
+        elif nombre in self.estado.terminados:
+            datos = self.estado.terminados[nombre]
+            contador = "terminado"
+        else:
+            return None
+        tiempos = self.estado.metricas.programa(nombre)
+        return [
+            nombre,
+            str(datos["tiempo_llegada"]),
+            f"{datos['inicio']:06d}",
+            f"{datos['datos']:06d}",
+            f"{datos['final']:06d}",
+            contador,
+            *("" if tiempo is None else str(tiempo) for tiempo in tiempos[1:4]),
+        ]
 
+    def reconstruir_tablas(self):
+        self.tabla_memoria.mostrar(self.estado)
+        self.tabla_etiquetas.reconstruir(
+            self.filas_de_posiciones(self.estado.etiquetas)
+        )
+        self.tabla_variables.reconstruir(
+            self.filas_de_posiciones(self.estado.variables)
+        )
+        nombres = list(self.estado.programas) + list(self.estado.terminados)
+        self.tabla_programas.reconstruir(
+            (nombre, self.fila_programa(nombre)) for nombre in nombres
+        )
         for salida in ("impresora", "pantalla"):
             buffer = Gtk.TextBuffer()
             buffer.set_text(
@@ -313,6 +740,37 @@ class InterfazChMaquina:
             )
             self.constructor.get_object(f"area-{salida}").set_buffer(buffer)
 
+    def aplicar_cambios(self, cambios):
+        self.tabla_memoria.mostrar(self.estado, cambios.celdas)
+
+        for programa in cambios.etiquetas:
+            self.tabla_etiquetas.quitar_grupo(programa)
+            etiquetas = {programa: self.estado.etiquetas.get(programa, {})}
+            for llave, fila in self.filas_de_posiciones(etiquetas):
+                self.tabla_etiquetas.poner(llave, fila)
+        for programa in cambios.variables:
+            self.tabla_variables.quitar_grupo(programa)
+            variables = {programa: self.estado.variables.get(programa, {})}
+            for llave, fila in self.filas_de_posiciones(variables):
+                self.tabla_variables.poner(llave, fila)
+
+        for nombre in cambios.programas:
+            fila = self.fila_programa(nombre)
+            if fila is None:
+                self.tabla_programas.quitar(nombre)
+            else:
+                self.tabla_programas.poner(nombre, fila)
+
+        for salida in ("impresora", "pantalla"):
+            lineas = getattr(cambios, salida)
+            if not lineas:
+                continue
+            buffer = self.constructor.get_object(f"area-{salida}").get_buffer()
+            texto = "\n".join(f"[{programa}] {mensaje}" for programa, mensaje in lineas)
+            if buffer.get_char_count():
+                texto = "\n" + texto
+            buffer.insert(buffer.get_end_iter(), texto)
+
 
 def main():
     constructor = Gtk.Builder()
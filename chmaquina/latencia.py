@@ -0,0 +1,122 @@
+"""
+Modelos de latencia para las operaciones de entrada y salida de la ch maquina.
+
+Cada modelo tiene su propio generador de números aleatorios, así dos máquinas con la
+misma semilla producen los mismos relojes sin depender del módulo `random` global.
+"""
+import random
+
+from chmaquina.instrucciones import Operacion
+
+
+class ModeloLatencia(object):
+    """
+    Interfaz de los modelos de latencia.
+    """
+
+    def duracion(self, operacion):
+        """Unidades de tiempo que toma una operación de entrada y salida"""
+        raise NotImplementedError
+
+    def reiniciar(self):
+        """Vuelve al estado inicial para repetir la misma secuencia de duraciones"""
+
+
+class LatenciaAleatoria(ModeloLatencia):
+    """
+    Duración uniforme entre `minimo` y `maximo` (incluidos).
+    """
+
+    def __init__(self, minimo=1, maximo=9, semilla=None):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.semilla = semilla
+        self.aleatorio = random.Random(semilla)
+
+    def duracion(self, operacion):
+        return self.aleatorio.randint(self.minimo, self.maximo)
+
+    def reiniciar(self):
+        self.aleatorio.seed(self.semilla)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({self.minimo}, {self.maximo}, "
+            f"semilla={self.semilla})"
+        )
+
+
+class LatenciaFija(ModeloLatencia):
+    """
+    Todas las operaciones toman el mismo tiempo.
+    """
+
+    def __init__(self, costo):
+        self.costo = costo
+
+    def duracion(self, operacion):
+        return self.costo
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.costo})"
+
+
+class LatenciaPorDispositivo(ModeloLatencia):
+    """
+    Un modelo distinto para cada operación, por ejemplo
+    `{"lea": LatenciaAleatoria(5, 20), "imprima": LatenciaFija(3)}`.
+    """
+
+    def __init__(self, modelos, por_defecto=None):
+        self.modelos = {
+            Operacion(operacion): modelo for operacion, modelo in modelos.items()
+        }
+        self.por_defecto = por_defecto or LatenciaAleatoria()
+
+    def duracion(self, operacion):
+        return self.modelos.get(operacion, self.por_defecto).duracion(operacion)
+
+    def reiniciar(self):
+        for modelo in self.modelos.values():
+            modelo.reiniciar()
+        self.por_defecto.reiniciar()
+
+
+class LatenciaGrabada(ModeloLatencia):
+    """
+    Repite una secuencia de duraciones, por ejemplo la registrada con
+    `Grabadora` en otra corrida.
+    """
+
+    def __init__(self, duraciones):
+        self.duraciones = list(duraciones)
+        self.siguiente = 0
+
+    def duracion(self, operacion):
+        if self.siguiente >= len(self.duraciones):
+            raise IndexError("Se agotaron las duraciones grabadas")
+        duracion = self.duraciones[self.siguiente]
+        self.siguiente += 1
+        return duracion
+
+    def reiniciar(self):
+        self.siguiente = 0
+
+
+class Grabadora(ModeloLatencia):
+    """
+    Usa otro modelo y guarda en `duraciones` cada duración que produce.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.duraciones = []
+
+    def duracion(self, operacion):
+        duracion = self.modelo.duracion(operacion)
+        self.duraciones.append(duracion)
+        return duracion
+
+    def reiniciar(self):
+        self.modelo.reiniciar()
+        self.duraciones = []
@@ -1,11 +1,46 @@
-import copy
+import asyncio
+import concurrent.futures
+import itertools
 import math
-import random
+import operator
 import sys
 
-from chmaquina.sintaxis import ErrorDeSintaxis, verificar, estimar
+from chmaquina.sintaxis import (
+    CACHE,
+    Analisis,
+    ErrorDeSintaxis,
+    ProgramaVerificado,
+    VerificadorCh,
+    estimar,
+    verificar,
+)
+from chmaquina import instantanea
+from chmaquina.asignacion import PRIMER_AJUSTE
 from chmaquina.estado import EstadoMaquina
 from chmaquina.errores import ErrorDeEjecucion, ChProgramaInvalido, SinMemoriaSuficiente
+from chmaquina.instrucciones import (
+    DE_IO,
+    DECLARATIVAS,
+    DESTINOS,
+    Operacion,
+    decodificar_programa,
+)
+from chmaquina.latencia import LatenciaAleatoria
+from chmaquina.planificadores import planificador_para
+from chmaquina.tipos import convertir, formatear, logico, numero, vacio
+
+
+def _verificar_o_error(programa):
+    """Verifica un programa en otro proceso retornando el error en vez de lanzarlo"""
+    try:
+        return verificar(programa)
+    except ErrorDeSintaxis as e:
+        return e
+
+
+_SIN_MEMORIA = (
+    "La máquina no cuenta con la memoria suficiente para almacenar el programa"
+)
 
 
 class TecladoEnConsola(object):
@@ -23,13 +58,41 @@ class Maquina(object):
     """
 
     def __init__(
-        self, tamano_memoria, tamano_kernel, teclado=None, quantum=None, algoritmo=None
+        self,
+        tamano_memoria,
+        tamano_kernel,
+        teclado=None,
+        quantum=None,
+        algoritmo=None,
+        latencia=None,
+        cache=None,
+        asignacion=None,
+        liberar_al_terminar=False,
+        compactacion=False,
+        paginacion=None,
+        entrada=None,
+        traza=None,
     ):
         self.tamano_memoria = tamano_memoria
         self.tamano_kernel = tamano_kernel
         self.teclado = teclado or TecladoEnConsola()
+        self.latencia = latencia or LatenciaAleatoria()
+        self.cache = CACHE if cache is None else cache
+        # Estrategia para ubicar los programas en los huecos de la memoria
+        self.asignacion = asignacion or PRIMER_AJUSTE
+        self.liberar_al_terminar = liberar_al_terminar
+        # Compactar la memoria cuando un programa no cabe en ningún hueco
+        self.compactacion = compactacion
+        # Configuración de la memoria virtual o None para una memoria plana
+        self.paginacion = paginacion
+        # Fuente de entrada sin bloqueo para lea (ver `chmaquina.entrada`); sin ella
+        # lea espera al teclado deteniendo la máquina
+        self.entrada = entrada
+        # `chmaquina.traza.EscritorDeTraza` donde se registra cada instrucción
+        self.traza = traza
         self.quantum = quantum or sys.maxsize
-        self.algoritmo = algoritmo or "FCFS"
+        self.planificador = planificador_para(algoritmo or "FCFS")
+        self.algoritmo = self.planificador.nombre
 
     def encender(self):
         """
@@ -41,238 +104,600 @@ class Maquina(object):
         """
         Toma un estado y ejecuta un paso.
         """
-        instruccion = estado.siguiente_instruccion()
-        if instruccion == None:
+        return self._ejecutar(estado.copiar())
+
+    def _ejecutar(self, estado):
+        """
+        Ejecuta un paso modificando el estado dado.
+        """
+        if estado.bloqueados:
+            self._despertar(estado)
+        instruccion = estado.instruccion_decodificada()
+        if instruccion is None:
+            # La cpu está ociosa
+            estado.metricas.ocio(1)
             return estado.avanzar_tiempo(1)
-        programa, linea = instruccion
-        linea = linea.strip()
-        nuevo_estado = estado.copiar()
-        operacion, *argumentos = linea.split()
-        if operacion == "cargue":
-            variable, = argumentos
-            dato = nuevo_estado.buscar_variable(programa, variable)
-            nuevo_estado.asignar_acumulador(programa, dato.get("valor"))
-        elif operacion == "almacene":
-            variable, = argumentos
-            dato = nuevo_estado.acumulador(programa)
-            nuevo_estado.asignar_variable(programa, variable, dato)
-        elif operacion == "vaya":
-            etiqueta, = argumentos
-            nuevo_estado.vaya(programa, etiqueta)
-            return nuevo_estado.avanzar_tiempo(1)
-        elif operacion == "vayasi":
-            positivo, negativo = argumentos
-            bandera = float(nuevo_estado.acumulador(programa, por_defecto="0"))
-            if bandera > 0:
-                nuevo_estado.vaya(programa, positivo)
-            elif bandera < 0:
-                nuevo_estado.vaya(programa, negativo)
-            else:
-                nuevo_estado.incrementar_contador(programa)
-            return nuevo_estado.avanzar_tiempo(1)
-        elif operacion == "lea":
-            variable, = argumentos
-            valor = self.teclado.lea()
-            nuevo_estado.asignar_variable(programa, variable, valor)
-        elif operacion in (
-            "sume",
-            "reste",
-            "multiplique",
-            "divida",
-            "potencia",
-            "modulo",
-        ):
-            variable, = argumentos
-            acumulador = float(nuevo_estado.acumulador(programa, por_defecto="0"))
-            variable = float(nuevo_estado.buscar_variable(programa, variable)["valor"])
-            if operacion == "sume":
-                resultado = acumulador + variable
-            if operacion == "reste":
-                resultado = acumulador - variable
-            if operacion == "multiplique":
-                resultado = acumulador * variable
+        programa, base, instruccion = instruccion
+        if self.traza is not None:
+            return self._trazar(estado, programa, base, instruccion)
+        return self._ejecutar_instruccion(estado, programa, base, *instruccion)
+
+    def _ejecutar_instruccion(self, estado, programa, base, operacion, argumentos):
+        reloj = estado.reloj
+        ejecutar = self._OPERACIONES.get(operacion)
+        salto = ejecutar and ejecutar(self, estado, programa, base, *argumentos)
+        if operacion is Operacion.RETORNE:
+            estado.metricas.ejecucion(programa, reloj, 0)
+            estado.metricas.fin(programa, reloj)
+            return estado
+        if operacion is Operacion.LEA and self.entrada is not None:
+            # El programa espera la entrada fuera de la cpu
+            estado.metricas.ejecucion(programa, reloj, 0)
+            return estado
+        if not salto:
+            estado.incrementar_contador(programa)
+        duracion = self.duracion(operacion)
+        estado.metricas.ejecucion(programa, reloj, duracion)
+        return estado.avanzar_tiempo(duracion)
+
+    def _trazar(self, estado, programa, base, instruccion):
+        """Ejecuta una instrucción registrándola en la traza"""
+        operacion, argumentos = instruccion
+        reloj = estado.reloj
+        contador = estado.programas[programa]["contador"]
+        self._ejecutar_instruccion(estado, programa, base, operacion, argumentos)
+
+        escrituras = eventos = ()
+        if operacion in DESTINOS and programa not in estado.bloqueados:
+            posicion = base + argumentos[DESTINOS[operacion]]
+            escrituras = ((posicion, estado.leer(posicion)),)
+            if operacion is Operacion.LEA:
+                eventos = (("entrada", formatear(estado.leer(posicion))),)
+        elif operacion is Operacion.IMPRIMA:
+            eventos = (("impresora", estado.impresora[-1][1]),)
+        elif operacion is Operacion.MUESTRE:
+            eventos = (("pantalla", estado.pantalla[-1][1]),)
+        self.traza.instruccion(
+            reloj,
+            programa,
+            contador,
+            operacion,
+            estado.reloj - reloj,
+            escrituras,
+            eventos,
+        )
+        if operacion is Operacion.RETORNE and self.liberar_al_terminar:
+            liberado = estado.terminados[programa]
+            self._trazar_celdas(
+                estado, programa, range(liberado["inicio"], liberado["final"])
+            )
+        return estado
+
+    def _trazar_celdas(self, estado, programa, posiciones):
+        """Registra celdas completas que cambiaron fuera de una instrucción"""
+        memoria = estado.memoria
+        self.traza.celdas(estado.reloj, programa, ((p, memoria[p]) for p in posiciones))
+
+    def _trazar_cambios(self, anterior, estado, programa=None):
+        """Registra las celdas que una carga o compactación cambió en la memoria"""
+        if self.traza is not None:
+            cambios = estado.memoria.diferencias(anterior.memoria)
+            if cambios is None:
+                cambios = range(len(estado.memoria))
+            self._trazar_celdas(estado, programa, cambios)
+        return estado
+
+    def duracion(self, operacion):
+        """
+        Unidades de tiempo que toma una operación.
+        """
+        if operacion in DE_IO:
+            return self.latencia.duracion(operacion)
+        if operacion in DECLARATIVAS:
+            return 0
+        return 1
+
+    def _cargue(self, estado, programa, base, variable, acumulador):
+        estado.escribir(base + acumulador, estado.leer(base + variable))
+
+    def _almacene(self, estado, programa, base, variable, acumulador):
+        estado.escribir(base + variable, estado.leer(base + acumulador))
+
+    def _vaya(self, estado, programa, base, linea):
+        estado.saltar(programa, linea)
+        return True
+
+    def _vayasi(self, estado, programa, base, positivo, negativo, acumulador):
+        bandera = numero(estado.leer(base + acumulador))
+        if bandera > 0:
+            estado.saltar(programa, positivo)
+        elif bandera < 0:
+            estado.saltar(programa, negativo)
+        else:
+            estado.incrementar_contador(programa)
+        return True
+
+    def _lea(self, estado, programa, base, variable):
+        if self.entrada is not None:
+            listo = estado.reloj + self.duracion(Operacion.LEA)
+            estado.bloquear(programa, variable, listo)
+            return True
+        self._guardar_entrada(estado, base + variable, self.teclado.lea())
+
+    @staticmethod
+    def _guardar_entrada(estado, posicion, valor):
+        try:
+            valor = convertir(estado.memoria[posicion]["tipo"], valor)
+        except (AttributeError, TypeError, ValueError):
+            # Como antes, una entrada que no es del tipo se guarda tal cual
+            pass
+        estado.escribir(posicion, valor)
+
+    def _despertar(self, estado):
+        """
+        Entrega las entradas que llegaron a los programas bloqueados cuyo dispositivo
+        ya terminó, en el orden en que ejecutaron el lea. Si ningún otro programa
+        puede avanzar espera a que llegue una entrada.
+        """
+        entrada = self.entrada
+        ociosa = not estado.listos
+        for nombre, (desplazamiento, listo) in list(estado.bloqueados.items()):
+            if listo > estado.reloj:
+                continue
+            valor = entrada.tomar()
+            if valor is None:
+                break
+            posicion = estado.programas[nombre]["inicio"] + desplazamiento
+            self._guardar_entrada(estado, posicion, valor)
+            if self.traza is not None:
+                self.traza.entrada(
+                    estado.reloj,
+                    nombre,
+                    estado.programas[nombre]["contador"],
+                    posicion,
+                    estado.leer(posicion),
+                    valor,
+                )
+            estado.desbloquear(nombre)
+
+        if estado.listos:
+            if ociosa:
+                self.planificador.despachar(estado)
+        elif self._esperando_entrada(estado):
+            if not entrada.esperar():
+                raise EOFError("Se acabó la entrada con programas esperando un lea")
+            self._despertar(estado)
+
+    @staticmethod
+    def _esperando_entrada(estado):
+        """Si ningún programa puede avanzar hasta que llegue una entrada"""
+        return (
+            estado.bloqueados
+            and not estado.listos
+            and not estado.llegadas
+            and all(listo <= estado.reloj for _, listo in estado.bloqueados.values())
+        )
+
+    def _aritmetica(operacion):
+        def ejecutar(self, estado, programa, base, variable, acumulador):
+            a = numero(estado.leer(base + acumulador))
+            b = numero(estado.leer(base + variable))
             try:
-                if operacion == "divida":
-                    resultado = acumulador / variable
-                if operacion == "potencia":
-                    resultado = acumulador ** variable
-                if operacion == "modulo":
-                    resultado = acumulador % variable
+                resultado = operacion(a, b)
             except ZeroDivisionError:
                 raise ErrorDeEjecucion("Se encontró una division por cero.")
-            nuevo_estado.asignar_acumulador(programa, str(resultado))
-        elif operacion in ("concatene", "elimine", "extraiga"):
-            operando, = argumentos
-            acumulador = nuevo_estado.acumulador(programa, por_defecto=" ")
-            if operacion == "concatene":
-                resultado = acumulador + operando
-            if operacion == "elimine":
-                resultado = acumulador.replace(operando, "")
-            if operacion == "extraiga":
-                resultado = acumulador[: int(operando)]
-            nuevo_estado.asignar_acumulador(programa, resultado)
-        elif operacion in ("Y", "O"):
-            a, b, salida, = argumentos
-            a = estado.buscar_variable(programa, a)["valor"] == "1"
-            b = estado.buscar_variable(programa, b)["valor"] == "1"
-            if operacion == "O":
-                resultado = "1" if a or b else "0"
-            if operacion == "Y":
-                resultado = "1" if a and b else "0"
-            nuevo_estado.asignar_variable(programa, salida, resultado)
-        elif operacion == "NO":
-            operando, salida, = argumentos
-            operando = estado.buscar_variable(programa, operando)["valor"] == "1"
-            resultado = "1" if not operando else "0"
-            nuevo_estado.asignar_variable(programa, salida, resultado)
-        elif operacion == "imprima":
-            variable, = argumentos
-            mensaje = estado.buscar_variable(programa, variable)["valor"]
-            nuevo_estado.impresora.append((programa, mensaje))
-        elif operacion == "muestre":
-            variable, = argumentos
-            mensaje = estado.buscar_variable(programa, variable)["valor"]
-            nuevo_estado.pantalla.append((programa, mensaje))
-        elif operacion == "retorne":
-            nuevo_estado.terminados[programa] = nuevo_estado.programas[programa]
-            del nuevo_estado.programas[programa]
-            nuevo_estado.listos.remove(programa)
-            return nuevo_estado
-        duracion = 1
-        if operacion in ("lea", "imprima", "muestre", "almacene", "cargue"):
-            duracion = random.randint(1, 9)
-        elif operacion in ("nueva", "etiqueta"):
-            duracion = 0
-        return nuevo_estado.incrementar_contador(programa).avanzar_tiempo(duracion)
-
-    def correr(self, estado, pasos=None):
+            estado.escribir(base + acumulador, resultado)
+
+        return ejecutar
+
+    def _cadena(operacion):
+        def ejecutar(self, estado, programa, base, operando, acumulador):
+            cadena = estado.leer(base + acumulador)
+            cadena = " " if vacio(cadena) else formatear(cadena)
+            estado.escribir(base + acumulador, operacion(cadena, operando))
+
+        return ejecutar
+
+    def _logica(operacion):
+        def ejecutar(self, estado, programa, base, *variables):
+            *operandos, salida = variables
+            valores = [logico(estado.leer(base + operando)) for operando in operandos]
+            estado.escribir(base + salida, bool(operacion(*valores)))
+
+        return ejecutar
+
+    def _imprima(self, estado, programa, base, variable):
+        estado.impresora.append((programa, formatear(estado.leer(base + variable))))
+
+    def _muestre(self, estado, programa, base, variable):
+        estado.pantalla.append((programa, formatear(estado.leer(base + variable))))
+
+    def _retorne(self, estado, programa, base):
+        estado.terminados[programa] = estado.programas[programa]
+        del estado.programas[programa]
+        estado.listos.quitar(programa)
+        if self.liberar_al_terminar:
+            estado.liberar(programa)
+
+    _OPERACIONES = {
+        Operacion.CARGUE: _cargue,
+        Operacion.ALMACENE: _almacene,
+        Operacion.VAYA: _vaya,
+        Operacion.VAYASI: _vayasi,
+        Operacion.LEA: _lea,
+        Operacion.SUME: _aritmetica(operator.add),
+        Operacion.RESTE: _aritmetica(operator.sub),
+        Operacion.MULTIPLIQUE: _aritmetica(operator.mul),
+        Operacion.DIVIDA: _aritmetica(operator.truediv),
+        Operacion.POTENCIA: _aritmetica(operator.pow),
+        Operacion.MODULO: _aritmetica(operator.mod),
+        Operacion.CONCATENE: _cadena(operator.add),
+        Operacion.ELIMINE: _cadena(lambda cadena, texto: cadena.replace(texto, "")),
+        Operacion.EXTRAIGA: _cadena(lambda cadena, cantidad: cadena[:cantidad]),
+        Operacion.Y: _logica(lambda a, b: a and b),
+        Operacion.O: _logica(lambda a, b: a or b),
+        Operacion.NO: _logica(lambda a: not a),
+        Operacion.IMPRIMA: _imprima,
+        Operacion.MUESTRE: _muestre,
+        Operacion.RETORNE: _retorne,
+    }
+
+    del _aritmetica, _cadena, _logica
+
+    def correr(self, estado, pasos=None, *, en_sitio=False):
+        """
+        Ejecuta la ch maquina hasta que no haya nada por hacer o hasta dar `pasos`.
+
+        Con `en_sitio` todos los pasos modifican un único estado de trabajo en lugar
+        de crear un estado nuevo por instrucción; el estado final es el mismo.
+        """
         nuevo_estado = estado.copiar()
-        if pasos is not None:
-            for _, nuevo_estado in zip(range(pasos), self.iterar(estado)):
-                pass
-            return nuevo_estado
-        for nuevo_estado in self.iterar(estado):
+        contador = range(pasos) if pasos is not None else itertools.count()
+        for _, nuevo_estado in zip(contador, self._ejecucion(nuevo_estado, en_sitio)):
             pass
         return nuevo_estado
 
-    def iterar(self, estado):
+    def iterar(self, estado, *, en_sitio=False):
         """
         Ejecuta la ch maquina retornando cada estado hasta que no haya nada por hacer.
+
+        Con `en_sitio` se retorna siempre el mismo estado de trabajo, modificado luego
+        de cada paso; sirve para observar la ejecución sin pagar por estados nuevos.
         """
-        inicial = estado.copiar()
-        nuevo_estado = estado.copiar()
-        while not nuevo_estado.nada_por_hacer():
-            temporal = self.paso(nuevo_estado)
-            tiempo_transcurrido = temporal.reloj - inicial.reloj
-            quantum_agotado = tiempo_transcurrido >= self.quantum
-            programa_terminado = len(inicial.terminados) < len(temporal.terminados)
-            if quantum_agotado or programa_terminado:
-                temporal = self.planear(temporal)
-                inicial = temporal.copiar()
-            if temporal.nada_por_hacer():
-                temporal = self.planear(temporal)
-            nuevo_estado = temporal
-            yield nuevo_estado
+        return self._ejecucion(estado.copiar(), en_sitio)
+
+    async def aiterar(self, estado, *, en_sitio=False, cada=100):
+        """
+        Como `iterar`, para usar con `async for`: cede el control al ciclo de eventos
+        cada `cada` pasos y, cuando todos los programas esperan un lea, espera la
+        entrada sin bloquear el ciclo. Así un solo proceso puede correr muchas
+        máquinas a la vez.
+
+        Las entradas deben llegar por la fuente `entrada` de la máquina; sin ella lea
+        usa el teclado y bloquea el ciclo de eventos.
+        """
+        trabajo = estado.copiar()
+        ejecucion = self._ejecucion(trabajo, en_sitio)
+        for pasos in itertools.count(1):
+            if self.entrada is not None and self._esperando_entrada(trabajo):
+                await self.entrada.aesperar()
+            try:
+                trabajo = next(ejecucion)
+            except StopIteration:
+                return
+            yield trabajo
+            if pasos % cada == 0:
+                await asyncio.sleep(0)
+
+    def instantaneas(self, estado, cada):
+        """
+        Ejecuta la ch maquina en sitio retornando una copia del estado cada `cada`
+        pasos y al terminar.
+        """
+        trabajo = estado.copiar()
+        pasos = 0
+        for pasos, trabajo in enumerate(self._ejecucion(trabajo, True), start=1):
+            if pasos % cada == 0:
+                yield trabajo.copiar()
+        if pasos % cada != 0 or pasos == 0:
+            yield trabajo.copiar()
+
+    def _ejecucion(self, estado, en_sitio):
+        """
+        Ejecuta la ch maquina desde `estado` retornando el estado luego de cada paso.
+
+        Si `en_sitio` es verdadero `estado` se modifica y se retorna siempre el mismo
+        objeto, de lo contrario cada paso produce un estado nuevo.
+        """
+        ejecutar = self._ejecutar if en_sitio else self.paso
+        planear = self._planear if en_sitio else self.planear
+        planificador = self.planificador
+        if estado.listos and estado.listos.despacho is None:
+            planificador.despachar(estado)
+        quantum = planificador.quantum(estado, self.quantum)
+        inicio_quantum = estado.reloj
+        # Los programas dejan la cpu al terminar o al bloquearse en un lea
+        salidas = len(estado.terminados) + estado.bloqueos
+        while not estado.nada_por_hacer():
+            estado = ejecutar(estado)
+            quantum_agotado = estado.reloj - inicio_quantum >= quantum
+            programa_salio = salidas < len(estado.terminados) + estado.bloqueos
+            llegada = estado.llegadas.proximo()
+            expropiar = (
+                planificador.expropiativo
+                and llegada is not None
+                and llegada <= estado.reloj
+            )
+            if quantum_agotado or programa_salio or expropiar:
+                estado = planear(estado)
+                quantum = planificador.quantum(estado, self.quantum)
+                inicio_quantum = estado.reloj
+                salidas = len(estado.terminados) + estado.bloqueos
+            if not estado.listos:
+                estado = planear(estado)
+            yield estado
 
     def cargar(self, estado, programa):
         """
         Carga un chprograma en la máquina.
+
+        El programa puede ser el texto, que se verifica a través de `self.cache`, o
+        el resultado de `verificar`, para cargar muchas veces el mismo programa sin
+        verificarlo de nuevo.
         """
+        if isinstance(programa, ProgramaVerificado):
+            codigo, variables, etiquetas = programa
+            rafaga = estimar(codigo)
+        else:
+            try:
+                (codigo, variables, etiquetas), rafaga = self.cache.analizar(programa)
+            except ErrorDeSintaxis as e:
+                raise ChProgramaInvalido from e
+
+        programa = self._nombre_para(estado)
+        # espacio necesario para el código, las variables y el acumulador
+        memoria_requerida = len(codigo) + len(variables) + 1
+
+        if not self._cabe(estado, memoria_requerida):
+            raise SinMemoriaSuficiente(_SIN_MEMORIA)
+
+        nuevo_estado = estado.copiar()
+        self._reservar(nuevo_estado, memoria_requerida)
+        inicio = nuevo_estado.pivote
+        self._escribir_codigo(nuevo_estado, programa, codigo)
+        self._instalar(
+            nuevo_estado, programa, inicio, codigo, variables, etiquetas, rafaga
+        )
+        return self._trazar_cambios(estado, nuevo_estado, programa)
+
+    def cargar_flujo(self, estado, lineas):
+        """
+        Carga un chprograma desde un archivo abierto o un iterador de lineas.
+
+        Cada linea se escribe en memoria apenas se verifica, sin guardar el texto del
+        programa; si hay errores de sintaxis se reportan todos al final. Como el
+        tamaño no se conoce de antemano, el programa se escribe en el hueco libre más
+        grande.
+        """
+        programa = self._nombre_para(estado)
+        nuevo_estado = estado.copiar()
+        if self.compactacion and len(nuevo_estado.libres) > 1:
+            nuevo_estado.compactar()
+        hueco = nuevo_estado.libres.mayor()
+        if hueco is None:
+            raise SinMemoriaSuficiente(_SIN_MEMORIA)
+        inicio, disponible = hueco
+        nuevo_estado.pivote = inicio
+        verificador = VerificadorCh(lineas)
+        lineas_verificadas = verificador.verificar_flujo()
         try:
-            codigo, variables, etiquetas = verificar(programa)
+            self._escribir_codigo(
+                nuevo_estado, programa, lineas_verificadas, inicio + disponible
+            )
         except ErrorDeSintaxis as e:
             raise ChProgramaInvalido from e
 
-        programa = f"{len(estado.programas) + len(estado.terminados):03d}"
-        posicion_inicial = estado.pivote
-        memoria_disponible = len(estado.memoria) - posicion_inicial
-        # espacio necesario para el código, las variables y el contador
-        memoria_requerida = len(codigo) + len(variables)
+        memoria = nuevo_estado.memoria
+        fin = nuevo_estado.pivote
+        codigo = [memoria.valor(posicion) for posicion in range(inicio, fin)]
+        variables = verificador.contexto.variables
+        if disponible < len(codigo) + len(variables) + 1:
+            raise SinMemoriaSuficiente(_SIN_MEMORIA)
+        nuevo_estado.libres.ocupar(inicio, len(codigo) + len(variables) + 1)
 
-        if memoria_disponible < memoria_requerida:
-            raise SinMemoriaSuficiente(
-                "La máquina no cuenta con la memoria suficiente para almacenar el programa"
-            )
+        self._instalar(
+            nuevo_estado,
+            programa,
+            inicio,
+            codigo,
+            variables,
+            verificador.contexto.etiquetas,
+            estimar(codigo),
+        )
+        return self._trazar_cambios(estado, nuevo_estado, programa)
+
+    def cargar_lote(self, estado, programas, procesos=None):
+        """
+        Carga varios chprogramas con una sola copia del estado.
+
+        Los nombres, posiciones y tiempos de llegada son los mismos que al cargarlos
+        uno por uno, pero si alguno es inválido o no cabe en memoria no se carga
+        ninguno. Con `procesos` mayor que 1 los textos se verifican en paralelo (sin
+        pasar por la cache).
+        """
+        analisis = self._analizar_lote(programas, procesos)
+
+        tamanos = [
+            len(codigo) + len(variables) + 1 for (codigo, variables, _), _ in analisis
+        ]
+        if sum(tamanos) > estado.libres.libre:
+            raise SinMemoriaSuficiente(_SIN_MEMORIA)
 
         nuevo_estado = estado.copiar()
-        nuevo_estado.variables[programa] = {}
-        nuevo_estado.etiquetas[programa] = {}
+        for tamano, ((codigo, variables, etiquetas), rafaga) in zip(tamanos, analisis):
+            programa = self._nombre_para(nuevo_estado)
+            self._reservar(nuevo_estado, tamano)
+            inicio = nuevo_estado.pivote
+            self._escribir_codigo(nuevo_estado, programa, codigo)
+            self._instalar(
+                nuevo_estado, programa, inicio, codigo, variables, etiquetas, rafaga
+            )
+        return self._trazar_cambios(estado, nuevo_estado)
+
+    def _analizar_lote(self, programas, procesos):
+        """Verifica los programas de un lote y estima sus ráfagas"""
+        verificados = None
+        textos = [p for p in programas if not isinstance(p, ProgramaVerificado)]
+        if procesos and procesos > 1 and len(textos) > 1:
+            with concurrent.futures.ProcessPoolExecutor(procesos) as ejecutor:
+                verificados = iter(list(ejecutor.map(_verificar_o_error, textos)))
+
+        analisis = []
+        for indice, programa in enumerate(programas):
+            try:
+                if isinstance(programa, ProgramaVerificado):
+                    analisis.append(Analisis(programa, estimar(programa.codigo)))
+                elif verificados is not None:
+                    verificado = next(verificados)
+                    if isinstance(verificado, ErrorDeSintaxis):
+                        raise verificado
+                    analisis.append(Analisis(verificado, estimar(verificado.codigo)))
+                else:
+                    analisis.append(self.cache.analizar(programa))
+            except ErrorDeSintaxis as e:
+                raise ChProgramaInvalido(f"El programa {indice} del lote") from e
+        return analisis
+
+    def compactar(self, estado):
+        """
+        Retorna un estado con los programas cargados juntos al comienzo de la memoria
+        de usuario y toda la memoria libre en un solo hueco.
+        """
+        compactado = estado.copiar()
+        compactado.compactar()
+        return self._trazar_cambios(estado, compactado)
 
-        # Escribir el código en memoria
-        for numero, linea in enumerate(codigo, start=1):
-            nuevo_estado.agregar_a_memoria(
+    def _cabe(self, estado, tamano):
+        if estado.libres.cabe(tamano):
+            return True
+        return self.compactacion and estado.libres.libre >= tamano
+
+    def _reservar(self, estado, tamano):
+        """
+        Reserva un bloque en el estado dado y deja el pivote al comienzo; si ningún
+        hueco alcanza pero la memoria libre sí, compacta cuando está habilitado.
+        """
+        if estado.reservar(tamano):
+            return
+        if self.compactacion and estado.libres.libre >= tamano:
+            estado.compactar()
+            if estado.reservar(tamano):
+                return
+        raise SinMemoriaSuficiente(_SIN_MEMORIA)
+
+    @staticmethod
+    def _nombre_para(estado):
+        return f"{len(estado.programas) + len(estado.terminados):03d}"
+
+    @staticmethod
+    def _escribir_codigo(estado, programa, codigo, limite=None):
+        """Escribe las lineas de código en memoria desde el pivote hasta `limite`"""
+        limite = len(estado.memoria) if limite is None else limite
+        for renglon, linea in enumerate(codigo, start=1):
+            if estado.pivote >= limite:
+                raise SinMemoriaSuficiente(_SIN_MEMORIA)
+            estado.agregar_a_memoria(
                 {
-                    "nombre": f"L{numero:03d}",
+                    "nombre": f"L{renglon:03d}",
                     "programa": programa,
                     "tipo": "CODIGO",
                     "valor": linea,
                 }
             )
 
+    @staticmethod
+    def _instalar(estado, programa, inicio, codigo, variables, etiquetas, rafaga):
+        """
+        Completa la carga de un programa cuyo código ya está en memoria desde
+        `inicio`: variables, acumulador, etiquetas, código decodificado y llegada.
+        """
+        estado.variables[programa] = {}
+        estado.etiquetas[programa] = {}
+
         # Escribir las variables en memoria
         for nombre, datos in variables.items():
-            posicion = nuevo_estado.agregar_a_memoria(
-                {"nombre": nombre, "programa": programa, **datos}
+            posicion = estado.agregar_a_memoria(
+                {
+                    "nombre": nombre,
+                    "programa": programa,
+                    "tipo": datos["tipo"],
+                    "valor": convertir(datos["tipo"], datos["valor"]),
+                }
             )
-            nuevo_estado.variables[programa][nombre] = posicion
+            estado.variables[programa][nombre] = posicion
 
         # Agregar la variable reservada acumulador
-        posicion = nuevo_estado.agregar_a_memoria(
+        posicion = estado.agregar_a_memoria(
             {
                 "nombre": "acumulador",
                 "programa": programa,
                 "tipo": "MULTIPLE",
-                "valor": "",
+                "valor": None,
             }
         )
-        nuevo_estado.variables[programa]["acumulador"] = posicion
+        estado.variables[programa]["acumulador"] = posicion
 
         # Tener en cuenta las etiquetas
         for nombre, linea in etiquetas.items():
-            nuevo_estado.etiquetas[programa][nombre] = linea
+            estado.etiquetas[programa][nombre] = linea
+
+        # Decodificar el código para no tener que interpretar el texto en cada paso
+        estado.codigo[programa] = decodificar_programa(codigo, variables, etiquetas)
 
-        nuevo_estado.programas[programa] = {
-            "inicio": posicion_inicial,
+        llegada = estado.tiempo_llegada
+        estado.programas[programa] = {
+            "inicio": inicio,
             "contador": 0,
-            "datos": posicion_inicial + len(codigo),
-            "final": posicion_inicial + len(codigo) + len(variables) + 1,
-            "tiempo_llegada": estado.tiempo_llegada,
-            "tiempo_rafaga": estimar(codigo),
+            "datos": inicio + len(codigo),
+            "final": inicio + len(codigo) + len(variables) + 1,
+            "tiempo_llegada": llegada,
+            "tiempo_rafaga": rafaga,
         }
 
-        nuevo_estado.tiempo_llegada += math.ceil(len(codigo) / 4)
+        estado.tiempo_llegada += math.ceil(len(codigo) / 4)
 
-        if nuevo_estado.programas[programa]["tiempo_llegada"] <= nuevo_estado.reloj:
-            nuevo_estado.listos.append(programa)
-
-        return nuevo_estado
+        estado.metricas.llegada(programa, llegada)
+        estado.registrar_llegada(programa)
 
     def planear(self, estado):
         """
         Planea la ejecución de acuerdo al algoritmo a cualquier momento.
         """
-        planeado = estado.copiar()
-
-        for nombre, _ in estado.programas_disponibles:
-            if nombre not in planeado.listos:
-                planeado.listos.append(nombre)
+        return self._planear(estado.copiar())
 
-        if self.algoritmo == "RR":
-            planeado.listos = planeado.listos[-1:] + planeado.listos[:-1]
+    def _planear(self, planeado):
+        """
+        Planea la ejecución modificando el estado dado.
+        """
+        self.planificador.planear(planeado)
+        return planeado
 
-        if self.algoritmo == "SJF":
-            planeado.listos = list(
-                sorted(
-                    planeado.listos, key=lambda n: estado.programas[n]["tiempo_rafaga"]
-                )
-            )
+    def guardar(self, estado, ruta):
+        """
+        Guarda el estado en una instantánea junto con el modelo de latencia de la
+        máquina (ver `chmaquina.instantanea`).
+        """
+        instantanea.guardar(estado, ruta, self.latencia)
 
-        if self.algoritmo == "FCFS":
-            planeado.listos = list(
-                sorted(
-                    planeado.listos,
-                    key=lambda programa: estado.programas[programa]["tiempo_llegada"],
-                )
-            )
+    def restaurar(self, ruta):
+        """
+        Retorna el estado de una instantánea y vuelve a usar el modelo de latencia
+        guardado con él, así la corrida sigue como la original.
+        """
+        return instantanea.cargar(ruta, self)
 
-        return planeado
+    def cola_de_listos(self):
+        """
+        Una cola de listos vacía adecuada para el algoritmo de la máquina.
+        """
+        return self.planificador.nueva_cola()
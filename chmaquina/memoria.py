@@ -0,0 +1,259 @@
+import array
+import math
+
+TAMANO_PAGINA = 256
+
+
+class _SinValor(object):
+    """
+    Marca las celdas que no tienen la llave "valor". Al serializarse se guarda como
+    una referencia, así las páginas leídas de disco siguen usando la misma marca.
+    """
+
+    def __reduce__(self):
+        return "_SIN_VALOR"
+
+    def __repr__(self):
+        return "_SIN_VALOR"
+
+
+_SIN_VALOR = _SinValor()
+
+
+class _Interno(object):
+    """
+    Tabla que asocia cadenas repetidas (nombres, programas, tipos) con un entero.
+
+    El identificador 0 está reservado para indicar que la llave no está en la celda.
+    Las tablas sólo crecen, por lo que se comparten entre todas las copias.
+    """
+
+    def __init__(self):
+        self.cadenas = [None]
+        self.ids = {}
+
+    def id(self, cadena):
+        identificador = self.ids.get(cadena)
+        if identificador is None:
+            identificador = len(self.cadenas)
+            self.cadenas.append(cadena)
+            self.ids[cadena] = identificador
+        return identificador
+
+
+class _Pagina(object):
+    """
+    Un bloque de celdas guardado por columnas.
+    """
+
+    __slots__ = ("programas", "tipos", "nombres", "valores")
+
+    def __init__(self, tamano):
+        self.programas = array.array("i", [0]) * tamano
+        self.tipos = array.array("B", [0]) * tamano
+        self.nombres = array.array("i", [0]) * tamano
+        self.valores = [_SIN_VALOR] * tamano
+
+    def copiar(self):
+        pagina = _Pagina.__new__(_Pagina)
+        pagina.programas = array.array("i", self.programas)
+        pagina.tipos = array.array("B", self.tipos)
+        pagina.nombres = array.array("i", self.nombres)
+        pagina.valores = list(self.valores)
+        return pagina
+
+    def __eq__(self, otra):
+        return (
+            self.programas == otra.programas
+            and self.tipos == otra.tipos
+            and self.nombres == otra.nombres
+            and self.valores == otra.valores
+        )
+
+
+class Memoria(object):
+    """
+    Memoria de la ch maquina dividida en páginas compartidas entre copias.
+
+    Copiar la memoria sólo copia la lista de páginas; una página se duplica la
+    primera vez que se escribe en ella (copy-on-write), así que el costo de un paso
+    depende de las celdas que toca y no del tamaño de la memoria.
+
+    Cada página guarda las celdas por columnas: el programa, el tipo y el nombre
+    como enteros en arreglos compactos y los valores en una lista. Leer una posición
+    construye el diccionario de la celda (`nombre`, `programa`, `tipo`, `valor`),
+    pero `valor`, `tipo` y `programa` permiten consultar una sola columna.
+    """
+
+    def __init__(self, tamano, tamano_pagina=TAMANO_PAGINA):
+        self.tamano = tamano
+        self.tamano_pagina = tamano_pagina
+        self._programas = _Interno()
+        self._tipos = _Interno()
+        self._nombres = _Interno()
+        vacia = _Pagina(tamano_pagina)
+        self._paginas = [vacia] * math.ceil(tamano / tamano_pagina)
+        # Páginas que sólo esta memoria referencia y que puede escribir directamente
+        self._propias = set()
+
+    def copiar(self):
+        """crea una copia de la memoria que comparte todas sus páginas"""
+        copia = self.__class__.__new__(self.__class__)
+        copia.tamano = self.tamano
+        copia.tamano_pagina = self.tamano_pagina
+        copia._programas = self._programas
+        copia._tipos = self._tipos
+        copia._nombres = self._nombres
+        copia._paginas = list(self._paginas)
+        copia._propias = set()
+        # A partir de ahora las páginas son compartidas también para el original
+        self._propias = set()
+        return copia
+
+    def _posicion(self, posicion):
+        if posicion < 0:
+            posicion += self.tamano
+        if not 0 <= posicion < self.tamano:
+            raise IndexError("posición de memoria fuera de rango")
+        return divmod(posicion, self.tamano_pagina)
+
+    def _pagina_propia(self, pagina):
+        if pagina not in self._propias:
+            self._paginas[pagina] = self._paginas[pagina].copiar()
+            self._propias.add(pagina)
+        return self._paginas[pagina]
+
+    def __len__(self):
+        return self.tamano
+
+    def _celda(self, pagina, desplazamiento):
+        dato = {}
+        nombre = pagina.nombres[desplazamiento]
+        if nombre:
+            dato["nombre"] = self._nombres.cadenas[nombre]
+        programa = pagina.programas[desplazamiento]
+        if programa:
+            dato["programa"] = self._programas.cadenas[programa]
+        tipo = pagina.tipos[desplazamiento]
+        if tipo:
+            dato["tipo"] = self._tipos.cadenas[tipo]
+        valor = pagina.valores[desplazamiento]
+        if valor is not _SIN_VALOR:
+            dato["valor"] = valor
+        return dato
+
+    def __getitem__(self, posicion):
+        pagina, desplazamiento = self._posicion(posicion)
+        return self._celda(self._paginas[pagina], desplazamiento)
+
+    def __setitem__(self, posicion, dato):
+        pagina, desplazamiento = self._posicion(posicion)
+        pagina = self._pagina_propia(pagina)
+        nombre = dato.get("nombre")
+        programa = dato.get("programa")
+        tipo = dato.get("tipo")
+        pagina.nombres[desplazamiento] = self._nombres.id(nombre) if nombre else 0
+        pagina.programas[desplazamiento] = (
+            self._programas.id(programa) if programa else 0
+        )
+        pagina.tipos[desplazamiento] = self._tipos.id(tipo) if tipo else 0
+        pagina.valores[desplazamiento] = dato.get("valor", _SIN_VALOR)
+
+    def valor(self, posicion):
+        """el valor guardado en una celda"""
+        pagina, desplazamiento = self._posicion(posicion)
+        valor = self._paginas[pagina].valores[desplazamiento]
+        return None if valor is _SIN_VALOR else valor
+
+    def asignar_valor(self, posicion, valor):
+        """cambia el valor de una celda conservando el resto de sus datos"""
+        pagina, desplazamiento = self._posicion(posicion)
+        self._pagina_propia(pagina).valores[desplazamiento] = valor
+
+    def tipo(self, posicion):
+        """el tipo de una celda"""
+        pagina, desplazamiento = self._posicion(posicion)
+        return self._tipos.cadenas[self._paginas[pagina].tipos[desplazamiento]]
+
+    def programa(self, posicion):
+        """el programa dueño de una celda"""
+        pagina, desplazamiento = self._posicion(posicion)
+        programa = self._paginas[pagina].programas[desplazamiento]
+        return self._programas.cadenas[programa]
+
+    def diferencias(self, otra):
+        """
+        Las posiciones, en orden, cuyas celdas cambiaron respecto a `otra`, una copia
+        anterior de esta memoria, o None si no son copias de la misma memoria.
+
+        Sólo se comparan celda por celda las páginas que ya no se comparten; un valor
+        se considera cambiado si se volvió a escribir aunque sea igual.
+        """
+        if (
+            not isinstance(otra, Memoria)
+            or self.tamano != otra.tamano
+            or self.tamano_pagina != otra.tamano_pagina
+            or self._nombres is not otra._nombres
+        ):
+            return None
+        posiciones = []
+        for numero, (propia, ajena) in enumerate(
+            zip(self._entradas(), otra._entradas())
+        ):
+            if propia is ajena:
+                continue
+            propia = self._consultar(numero)
+            ajena = otra._consultar(numero)
+            base = numero * self.tamano_pagina
+            columnas = zip(
+                propia.valores,
+                ajena.valores,
+                propia.nombres,
+                ajena.nombres,
+                propia.programas,
+                ajena.programas,
+                propia.tipos,
+                ajena.tipos,
+            )
+            for desplazamiento, (v, w, n, m, p, q, t, u) in enumerate(columnas):
+                if v is not w or n != m or p != q or t != u:
+                    posiciones.append(base + desplazamiento)
+        return [posicion for posicion in posiciones if posicion < self.tamano]
+
+    def _entradas(self):
+        """Lo que identifica a cada página: dos memorias comparten las iguales"""
+        return self._paginas
+
+    def _consultar(self, numero):
+        """Una página para leerla sin efectos"""
+        return self._paginas[numero]
+
+    def __iter__(self):
+        restantes = self.tamano
+        for pagina in self._paginas:
+            for desplazamiento in range(min(restantes, self.tamano_pagina)):
+                yield self._celda(pagina, desplazamiento)
+            restantes -= self.tamano_pagina
+
+    def __eq__(self, otra):
+        if isinstance(otra, Memoria):
+            if len(self) != len(otra):
+                return False
+            if self.tamano_pagina == otra.tamano_pagina and (
+                self._nombres is otra._nombres
+                and self._programas is otra._programas
+                and self._tipos is otra._tipos
+            ):
+                return all(
+                    propia is ajena or propia == ajena
+                    for propia, ajena in zip(self._paginas, otra._paginas)
+                )
+        try:
+            return len(self) == len(otra) and all(
+                a == b for a, b in zip(self, otra)
+            )
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(tamano={self.tamano})"
@@ -0,0 +1,113 @@
+"""
+Métricas de planeación de la ch maquina.
+"""
+import collections
+
+# Tiempos de un programa: llegada, primera ejecución, fin y tiempo en cpu
+_LLEGADA, _PRIMERA, _FIN, _CPU = range(4)
+
+ResumenPrograma = collections.namedtuple(
+    "ResumenPrograma", ["llegada", "respuesta", "retorno", "espera", "tiempo_cpu"]
+)
+
+Resumen = collections.namedtuple(
+    "Resumen",
+    [
+        "terminados",
+        "respuesta_promedio",
+        "retorno_promedio",
+        "espera_promedio",
+        "rendimiento",
+        "tiempo_ocioso",
+        "utilizacion",
+    ],
+)
+
+
+class Metricas(object):
+    """
+    Tiempos de cada programa y de la cpu registrados durante la ejecución.
+
+    Registrar un paso cuesta O(1); los promedios se calculan sólo al consultarlos.
+    Como el resto del estado, las copias comparten los registros y sólo duplican el
+    del programa que modifican.
+    """
+
+    def __init__(self):
+        self._programas = {}
+        self._propios = set()
+        self.tiempo_ocioso = 0
+        self.tiempo_cpu = 0
+
+    def copiar(self):
+        copia = self.__class__()
+        copia._programas = dict(self._programas)
+        copia.tiempo_ocioso = self.tiempo_ocioso
+        copia.tiempo_cpu = self.tiempo_cpu
+        self._propios = set()
+        return copia
+
+    def _registro(self, nombre):
+        if nombre not in self._propios:
+            self._programas[nombre] = list(self._programas[nombre])
+            self._propios.add(nombre)
+        return self._programas[nombre]
+
+    def llegada(self, nombre, tiempo):
+        self._programas[nombre] = [tiempo, None, None, 0]
+        self._propios.add(nombre)
+
+    def ejecucion(self, nombre, reloj, duracion):
+        """El programa ejecutó una instrucción en `reloj` que tomó `duracion`"""
+        registro = self._registro(nombre)
+        if registro[_PRIMERA] is None:
+            registro[_PRIMERA] = reloj
+        registro[_CPU] += duracion
+        self.tiempo_cpu += duracion
+
+    def fin(self, nombre, reloj):
+        self._registro(nombre)[_FIN] = reloj
+
+    def ocio(self, duracion):
+        self.tiempo_ocioso += duracion
+
+    def programa(self, nombre):
+        """
+        Los tiempos de un programa; respuesta, retorno y espera son None hasta que
+        el programa empieza o termina.
+        """
+        llegada, primera, fin, cpu = self._programas[nombre]
+        respuesta = None if primera is None else primera - llegada
+        retorno = None if fin is None else fin - llegada
+        espera = None if retorno is None else retorno - cpu
+        return ResumenPrograma(llegada, respuesta, retorno, espera, cpu)
+
+    def programas(self):
+        return {nombre: self.programa(nombre) for nombre in self._programas}
+
+    def resumen(self, reloj):
+        """Los promedios de los programas terminados y el uso de la cpu hasta `reloj`"""
+        terminados = [
+            resumen
+            for resumen in self.programas().values()
+            if resumen.retorno is not None
+        ]
+
+        def promedio(campo):
+            valores = [getattr(resumen, campo) for resumen in terminados]
+            return sum(valores) / len(valores) if valores else None
+
+        return Resumen(
+            terminados=len(terminados),
+            respuesta_promedio=promedio("respuesta"),
+            retorno_promedio=promedio("retorno"),
+            espera_promedio=promedio("espera"),
+            rendimiento=len(terminados) / reloj if reloj else None,
+            tiempo_ocioso=self.tiempo_ocioso,
+            utilizacion=self.tiempo_cpu / reloj if reloj else None,
+        )
+
+
+def cifra(valor):
+    """Una métrica con dos decimales, o - si no se conoce"""
+    return "-" if valor is None else f"{valor:.2f}"
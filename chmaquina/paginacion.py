@@ -0,0 +1,459 @@
+"""
+Memoria virtual paginada para la ch maquina.
+
+La memoria de la máquina se divide en páginas; sólo `marcos` de ellas pueden estar
+en la memoria física al tiempo y las demás se guardan serializadas en un almacén
+(en memoria o en un archivo leído con mmap). Cuando se necesita una página que no
+está cargada ocurre un fallo de página y, si no hay marcos libres, la política de
+reemplazo escoge cuál página sacar.
+"""
+import collections
+import mmap
+import pickle
+import tempfile
+
+from chmaquina.memoria import TAMANO_PAGINA, Memoria, _Pagina
+
+
+class EstadisticasPaginacion(object):
+    """
+    Contadores de accesos a páginas, fallos, reemplazos y páginas escritas al
+    almacén.
+    """
+
+    def __init__(self):
+        self.accesos = 0
+        self.fallos = 0
+        self.reemplazos = 0
+        self.escrituras = 0
+
+    def copiar(self):
+        copia = self.__class__()
+        copia.__dict__.update(self.__dict__)
+        return copia
+
+    @property
+    def tasa_de_fallos(self):
+        return self.fallos / self.accesos if self.accesos else 0.0
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(accesos={self.accesos}, fallos={self.fallos}, "
+            f"reemplazos={self.reemplazos}, escrituras={self.escrituras})"
+        )
+
+
+class ReemplazoFifo(object):
+    """
+    Saca la página que lleva más tiempo cargada.
+    """
+
+    nombre = "FIFO"
+
+    def __init__(self):
+        self._cargadas = collections.deque()
+
+    def copiar(self):
+        copia = self.__class__()
+        copia._cargadas = collections.deque(self._cargadas)
+        return copia
+
+    def cargada(self, pagina):
+        self._cargadas.append(pagina)
+
+    def usada(self, pagina):
+        pass
+
+    def victima(self):
+        return self._cargadas.popleft()
+
+    def __len__(self):
+        return len(self._cargadas)
+
+
+class ReemplazoLru(object):
+    """
+    Saca la página usada hace más tiempo.
+    """
+
+    nombre = "LRU"
+
+    def __init__(self):
+        self._cargadas = collections.OrderedDict()
+
+    def copiar(self):
+        copia = self.__class__()
+        copia._cargadas = collections.OrderedDict(self._cargadas)
+        return copia
+
+    def cargada(self, pagina):
+        self._cargadas[pagina] = None
+
+    def usada(self, pagina):
+        self._cargadas.move_to_end(pagina)
+
+    def victima(self):
+        return self._cargadas.popitem(last=False)[0]
+
+    def __len__(self):
+        return len(self._cargadas)
+
+
+class ReemplazoReloj(object):
+    """
+    Segunda oportunidad: recorre los marcos en círculo y saca la primera página que
+    no se ha usado desde la última vuelta.
+    """
+
+    nombre = "RELOJ"
+
+    def __init__(self):
+        self._marcos = []
+        self._usadas = set()
+        self._manecilla = 0
+
+    def copiar(self):
+        copia = self.__class__()
+        copia._marcos = list(self._marcos)
+        copia._usadas = set(self._usadas)
+        copia._manecilla = self._manecilla
+        return copia
+
+    def cargada(self, pagina):
+        libre = self._manecilla < len(self._marcos)
+        if libre and self._marcos[self._manecilla] is None:
+            # Ocupa el marco que dejó la última víctima
+            self._marcos[self._manecilla] = pagina
+            self._manecilla = (self._manecilla + 1) % len(self._marcos)
+        else:
+            self._marcos.append(pagina)
+        self._usadas.add(pagina)
+
+    def usada(self, pagina):
+        self._usadas.add(pagina)
+
+    def victima(self):
+        while True:
+            pagina = self._marcos[self._manecilla]
+            if pagina in self._usadas:
+                self._usadas.discard(pagina)
+                self._manecilla = (self._manecilla + 1) % len(self._marcos)
+            else:
+                self._marcos[self._manecilla] = None
+                return pagina
+
+    def __len__(self):
+        return sum(1 for pagina in self._marcos if pagina is not None)
+
+
+REEMPLAZOS = {
+    politica.nombre: politica
+    for politica in (ReemplazoFifo, ReemplazoLru, ReemplazoReloj)
+}
+
+
+class AlmacenEnMemoria(object):
+    """
+    Guarda las páginas serializadas en una lista. Los bloques liberados se
+    reutilizan en las siguientes escrituras.
+    """
+
+    def __init__(self):
+        self._bloques = []
+        self._libres = []
+
+    def guardar(self, pagina):
+        datos = pickle.dumps(pagina, pickle.HIGHEST_PROTOCOL)
+        if self._libres:
+            llave = self._libres.pop()
+            self._bloques[llave] = datos
+            return llave
+        self._bloques.append(datos)
+        return len(self._bloques) - 1
+
+    def leer(self, llave):
+        return pickle.loads(self._bloques[llave])
+
+    def liberar(self, llave):
+        """Deja el bloque de `llave` para otra página; nadie debe leerlo después"""
+        self._bloques[llave] = None
+        self._libres.append(llave)
+
+    def cerrar(self):
+        self._bloques = []
+        self._libres = []
+
+
+class AlmacenEnArchivo(object):
+    """
+    Guarda las páginas serializadas en un archivo (uno temporal si no se da la
+    ruta) y las lee a través de un mapa de memoria del archivo.
+
+    Una página nueva ocupa el primer espacio liberado donde quepa o, si no hay
+    ninguno, va al final del archivo. Sólo la tabla que escribió un bloque lo
+    libera, y únicamente si no se ha copiado desde entonces, así que las copias del
+    estado pueden compartir el almacén.
+    """
+
+    def __init__(self, ruta=None):
+        if ruta is None:
+            self._archivo = tempfile.TemporaryFile()
+        else:
+            self._archivo = open(ruta, "w+b")
+        self._tamano = 0
+        self._mapa = None
+        # Espacios liberados, como (posición, tamaño)
+        self._libres = []
+        self._pendiente = False
+
+    def guardar(self, pagina):
+        datos = pickle.dumps(pagina, pickle.HIGHEST_PROTOCOL)
+        posicion = self._tamano
+        for i, (libre, tamano) in enumerate(self._libres):
+            if tamano >= len(datos):
+                posicion = libre
+                if tamano > len(datos):
+                    self._libres[i] = (libre + len(datos), tamano - len(datos))
+                else:
+                    del self._libres[i]
+                break
+        else:
+            self._tamano += len(datos)
+        self._archivo.seek(posicion)
+        self._archivo.write(datos)
+        self._pendiente = True
+        return (posicion, len(datos))
+
+    def leer(self, llave):
+        posicion, tamano = llave
+        if self._pendiente:
+            # El mapa no ve lo que sigue en el búfer del archivo
+            self._archivo.flush()
+            self._pendiente = False
+        if self._mapa is None or len(self._mapa) < posicion + tamano:
+            if self._mapa is not None:
+                self._mapa.close()
+            self._mapa = mmap.mmap(
+                self._archivo.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        return pickle.loads(self._mapa[posicion : posicion + tamano])
+
+    def liberar(self, llave):
+        """Deja el bloque de `llave` para otra página; nadie debe leerlo después"""
+        self._libres.append(llave)
+
+    def cerrar(self):
+        self._libres = []
+        if self._mapa is not None:
+            self._mapa.close()
+            self._mapa = None
+        self._archivo.close()
+
+
+class TablaDePaginas(object):
+    """
+    La tabla de páginas de una memoria virtual. Se usa como la lista de páginas de
+    `Memoria`: pedir una página que no está cargada produce un fallo de página.
+
+    Cada entrada es la página si está en un marco, None si nunca se ha escrito
+    (se lee como una página vacía sin ocupar marco) o la llave de la página en el
+    almacén.
+    """
+
+    def __init__(self, paginas, tamano_pagina, marcos, reemplazo, almacen):
+        self._entradas = [None] * paginas
+        self._vacia = _Pagina(tamano_pagina)
+        self.tamano_pagina = tamano_pagina
+        self.marcos = marcos
+        self.reemplazo = reemplazo
+        self.almacen = almacen
+        self.estadisticas = EstadisticasPaginacion()
+        # Llave en el almacén de las páginas cargadas que tienen una copia guardada
+        self._llaves = {}
+        # Páginas cargadas que cambiaron desde que se guardaron
+        self._sucias = set()
+        # Páginas que sólo esta tabla referencia
+        self._propias = set()
+        # Bloques del almacén que sólo esta tabla referencia
+        self._bloques_propios = set()
+
+    def copiar(self):
+        copia = self.__class__.__new__(self.__class__)
+        copia.__dict__.update(self.__dict__)
+        copia._entradas = list(self._entradas)
+        copia.reemplazo = self.reemplazo.copiar()
+        copia.estadisticas = self.estadisticas.copiar()
+        copia._llaves = dict(self._llaves)
+        copia._sucias = set(self._sucias)
+        copia._propias = set()
+        self._propias = set()
+        copia._bloques_propios = set()
+        self._bloques_propios = set()
+        return copia
+
+    def __getitem__(self, numero):
+        entrada = self._entradas[numero]
+        self.estadisticas.accesos += 1
+        if entrada.__class__ is _Pagina:
+            self.reemplazo.usada(numero)
+            return entrada
+        if entrada is None:
+            return self._vacia
+        return self._traer(numero, entrada)
+
+    def propia(self, numero):
+        """La página lista para escribirse, cargándola o creándola si hace falta"""
+        pagina = self[numero]
+        if numero not in self._propias:
+            if pagina is self._vacia:
+                # Primera escritura: la página ocupa un marco desde ahora
+                self.estadisticas.fallos += 1
+                self._ocupar_marco(numero)
+                pagina = _Pagina(self.tamano_pagina)
+            else:
+                pagina = pagina.copiar()
+            self._entradas[numero] = pagina
+            self._propias.add(numero)
+        self._sucias.add(numero)
+        return pagina
+
+    def consultar(self, numero):
+        """Una página sin cargarla en un marco ni contar el acceso"""
+        entrada = self._entradas[numero]
+        if entrada.__class__ is _Pagina:
+            return entrada
+        if entrada is None:
+            return self._vacia
+        return self.almacen.leer(entrada)
+
+    def _traer(self, numero, llave):
+        self.estadisticas.fallos += 1
+        self._ocupar_marco(numero)
+        pagina = self.almacen.leer(llave)
+        self._entradas[numero] = pagina
+        self._llaves[numero] = llave
+        self._propias.add(numero)
+        return pagina
+
+    def _ocupar_marco(self, numero):
+        if len(self.reemplazo) >= self.marcos:
+            self._desalojar(self.reemplazo.victima())
+        self.reemplazo.cargada(numero)
+
+    def _desalojar(self, numero):
+        pagina = self._entradas[numero]
+        llave = self._llaves.pop(numero, None)
+        if llave is None or numero in self._sucias:
+            if llave in self._bloques_propios:
+                # Ninguna copia lee la versión anterior: su bloque queda libre
+                self._bloques_propios.discard(llave)
+                self.almacen.liberar(llave)
+            llave = self.almacen.guardar(pagina)
+            self._bloques_propios.add(llave)
+            self.estadisticas.escrituras += 1
+        self._entradas[numero] = llave
+        self._sucias.discard(numero)
+        self._propias.discard(numero)
+        self.estadisticas.reemplazos += 1
+
+    @property
+    def cargadas(self):
+        return len(self.reemplazo)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __iter__(self):
+        for numero in range(len(self._entradas)):
+            yield self[numero]
+
+
+class MemoriaVirtual(Memoria):
+    """
+    Una `Memoria` paginada: las mismas operaciones, pero sólo `marcos` páginas
+    están cargadas al tiempo. Las estadísticas están en `estadisticas`.
+    """
+
+    def __init__(
+        self,
+        tamano,
+        marcos,
+        reemplazo="LRU",
+        almacen=None,
+        tamano_pagina=TAMANO_PAGINA,
+    ):
+        super().__init__(tamano, tamano_pagina)
+        if marcos < 1:
+            raise ValueError("La memoria virtual necesita al menos un marco")
+        politica = REEMPLAZOS.get(reemplazo.upper())
+        if politica is None:
+            raise ValueError(
+                f"Reemplazo desconocido: {reemplazo}. "
+                f"Los disponibles son {', '.join(REEMPLAZOS)}"
+            )
+        self._paginas = TablaDePaginas(
+            len(self._paginas),
+            tamano_pagina,
+            marcos,
+            politica(),
+            AlmacenEnMemoria() if almacen is None else almacen,
+        )
+
+    def copiar(self):
+        copia = self.__class__.__new__(self.__class__)
+        copia.__dict__.update(self.__dict__)
+        copia._paginas = self._paginas.copiar()
+        return copia
+
+    def _pagina_propia(self, pagina):
+        return self._paginas.propia(pagina)
+
+    def _entradas(self):
+        return self._paginas._entradas
+
+    def _consultar(self, numero):
+        return self._paginas.consultar(numero)
+
+    @property
+    def estadisticas(self):
+        return self._paginas.estadisticas
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(tamano={self.tamano}, "
+            f"marcos={self._paginas.marcos}, "
+            f"reemplazo={self._paginas.reemplazo.nombre})"
+        )
+
+
+class Paginacion(object):
+    """
+    Configuración de la memoria virtual de una máquina.
+
+    `almacen` es "memoria", "archivo" o una función que crea el almacén, que
+    debe tener `guardar`, `leer`, `liberar` y `cerrar` como `AlmacenEnMemoria`.
+    """
+
+    def __init__(
+        self, marcos, reemplazo="LRU", almacen="memoria", tamano_pagina=TAMANO_PAGINA
+    ):
+        self.marcos = marcos
+        self.reemplazo = reemplazo
+        self.almacen = almacen
+        self.tamano_pagina = tamano_pagina
+
+    def crear_almacen(self):
+        if self.almacen == "memoria":
+            return AlmacenEnMemoria()
+        if self.almacen == "archivo":
+            return AlmacenEnArchivo()
+        return self.almacen()
+
+    def crear_memoria(self, tamano):
+        return MemoriaVirtual(
+            tamano,
+            self.marcos,
+            self.reemplazo,
+            self.crear_almacen(),
+            self.tamano_pagina,
+        )
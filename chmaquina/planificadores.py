@@ -0,0 +1,209 @@
+"""
+Algoritmos de planeación de la ch maquina.
+
+Un planificador decide qué cola de listos usa la máquina y cómo se reordena en cada
+planeación. La máquina planea cuando se agota el quantum, cuando termina un programa
+y, si el planificador es expropiativo, cuando llega un programa nuevo.
+"""
+from chmaquina.colas import ColaFifo, ColaMultinivel, ColaPrioridad
+
+
+class Planificador(object):
+    """
+    Interfaz de los planificadores.
+    """
+
+    nombre = None
+    # Si es verdadero se planea apenas llega un programa
+    expropiativo = False
+
+    def nueva_cola(self):
+        """Una cola de listos vacía para este algoritmo"""
+        raise NotImplementedError
+
+    def planear(self, estado):
+        """Admite los programas que llegaron y reordena la cola, en sitio"""
+        estado.admitir_llegadas()
+        estado.listos.ordenar()
+
+    def quantum(self, estado, quantum):
+        """El quantum del programa que va a ejecutarse, por defecto el de la máquina"""
+        return quantum
+
+    @staticmethod
+    def tiempo_en_cpu(estado):
+        """
+        Cuánto ha corrido el primer programa desde la última planeación o None si
+        no es el mismo que se despachó.
+        """
+        listos = estado.listos
+        if listos.despacho is None or not listos:
+            return None
+        nombre, reloj = listos.despacho
+        return estado.reloj - reloj if listos[0] == nombre else None
+
+    @staticmethod
+    def despachar(estado):
+        listos = estado.listos
+        listos.despacho = (listos[0], estado.reloj) if listos else None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class FCFS(Planificador):
+    """
+    Primero en llegar, primero en ser atendido.
+    """
+
+    nombre = "FCFS"
+
+    def nueva_cola(self):
+        return ColaPrioridad("tiempo_llegada")
+
+
+class SJF(Planificador):
+    """
+    El trabajo más corto (según `sintaxis.estimar`) primero.
+    """
+
+    nombre = "SJF"
+
+    def nueva_cola(self):
+        return ColaPrioridad("tiempo_rafaga")
+
+
+class RoundRobin(Planificador):
+    """
+    Turno rotatorio: en cada planeación el último de la cola pasa a ser el primero.
+    """
+
+    nombre = "RR"
+
+    def nueva_cola(self):
+        return ColaFifo()
+
+    def planear(self, estado):
+        estado.admitir_llegadas()
+        estado.listos.rotar()
+
+
+class SRTF(Planificador):
+    """
+    El menor tiempo restante primero, expropiativo.
+
+    El tiempo restante es la ráfaga estimada menos el tiempo que el programa ha
+    estado en la cpu.
+    """
+
+    nombre = "SRTF"
+    expropiativo = True
+
+    def nueva_cola(self):
+        return ColaPrioridad("tiempo_rafaga")
+
+    def planear(self, estado):
+        transcurrido = self.tiempo_en_cpu(estado)
+        if transcurrido:
+            restante = max(estado.listos.clave_del_primero() - transcurrido, 0)
+            estado.listos.cambiar_clave_del_primero(restante)
+        super().planear(estado)
+        self.despachar(estado)
+
+
+class Prioridad(Planificador):
+    """
+    Planeación por prioridad, menor número primero.
+
+    `prioridades` asocia el nombre de un programa ("000", "001", ...) con su
+    prioridad; los demás reciben `por_defecto`. Los empates se atienden en orden
+    de llegada.
+    """
+
+    nombre = "PRIORIDAD"
+
+    def __init__(self, prioridades=None, por_defecto=0, expropiativo=False):
+        self.prioridades = dict(prioridades or {})
+        self.por_defecto = por_defecto
+        self.expropiativo = expropiativo
+
+    def prioridad(self, nombre, programa):
+        return self.prioridades.get(nombre, self.por_defecto)
+
+    def nueva_cola(self):
+        return ColaPrioridad(self.prioridad)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({self.prioridades}, "
+            f"por_defecto={self.por_defecto}, expropiativo={self.expropiativo})"
+        )
+
+
+class MultinivelRetroalimentado(Planificador):
+    """
+    Colas multinivel con retroalimentación.
+
+    Los programas llegan al primer nivel; si agotan el quantum de su nivel bajan al
+    siguiente, donde el quantum es mayor. El último nivel funciona como turno
+    rotatorio.
+    """
+
+    nombre = "MLFQ"
+
+    def __init__(self, quantums=(4, 8, 16)):
+        self.quantums = tuple(quantums)
+
+    def nueva_cola(self):
+        return ColaMultinivel(len(self.quantums))
+
+    def planear(self, estado):
+        transcurrido = self.tiempo_en_cpu(estado)
+        if transcurrido is not None:
+            nivel = estado.listos.nivel(estado.listos[0])
+            if transcurrido >= self.quantums[nivel]:
+                estado.listos.bajar_primero()
+        estado.admitir_llegadas()
+        self.despachar(estado)
+
+    def quantum(self, estado, quantum):
+        if not estado.listos:
+            return quantum
+        return self.quantums[estado.listos.nivel(estado.listos[0])]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.quantums})"
+
+
+PLANIFICADORES = {
+    planificador.nombre: planificador
+    for planificador in (
+        FCFS,
+        SJF,
+        RoundRobin,
+        SRTF,
+        Prioridad,
+        MultinivelRetroalimentado,
+    )
+}
+
+
+def registrar(planificador):
+    """
+    Registra una clase de planificador para usarla por su nombre.
+    """
+    PLANIFICADORES[planificador.nombre] = planificador
+    return planificador
+
+
+def planificador_para(algoritmo):
+    """
+    Retorna el planificador de un algoritmo dado por nombre o el mismo planificador
+    si ya es uno.
+    """
+    if isinstance(algoritmo, Planificador):
+        return algoritmo
+    try:
+        return PLANIFICADORES[algoritmo]()
+    except KeyError:
+        raise ValueError(f"Algoritmo de planeación desconocido: {algoritmo}")
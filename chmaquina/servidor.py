@@ -0,0 +1,171 @@
+"""
+Servidor TCP de prueba para sesiones interactivas: cada conexión tiene su propia ch
+maquina y todas corren en un solo proceso sobre asyncio.
+
+El protocolo es por lineas. El cliente envía un ch programa seguido de una linea con
+sólo un punto; desde ahí cada linea que envía es una entrada para lea. El servidor
+responde cada salida de la impresora y la pantalla como `[programa] valor` y, al
+terminar, `fin <reloj>` o `error <mensaje>`.
+"""
+import argparse
+import asyncio
+import sys
+
+from chmaquina.entrada import EntradaEnCola
+from chmaquina.errores import ChProgramaInvalido, SinMemoriaSuficiente
+from chmaquina.latencia import LatenciaAleatoria
+from chmaquina.maquina import Maquina
+from chmaquina.planificadores import PLANIFICADORES
+
+FIN_DEL_PROGRAMA = "."
+
+
+def error(excepcion):
+    """La respuesta para un error, en una sola linea"""
+    mensaje = " ".join(str(excepcion).split())
+    return f"error {mensaje}\n".encode()
+
+
+class Servidor(object):
+    """
+    Atiende sesiones con máquinas de la configuración dada; `cada` es el número de
+    instrucciones que corre una sesión antes de ceder el turno a las demás.
+    """
+
+    def __init__(
+        self, tamano_memoria=512, tamano_kernel=79, algoritmo="RR", quantum=5, cada=100
+    ):
+        self.tamano_memoria = tamano_memoria
+        self.tamano_kernel = tamano_kernel
+        self.algoritmo = algoritmo
+        self.quantum = quantum
+        self.cada = cada
+        self.sesiones = 0
+
+    def crear_maquina(self, entrada):
+        return Maquina(
+            tamano_memoria=self.tamano_memoria,
+            tamano_kernel=self.tamano_kernel,
+            quantum=self.quantum or None,
+            algoritmo=self.algoritmo,
+            latencia=LatenciaAleatoria(semilla=self.sesiones),
+            entrada=entrada,
+        )
+
+    async def iniciar(self, host="127.0.0.1", puerto=0):
+        """Retorna el `asyncio.Server` ya escuchando"""
+        # Una cola de conexiones amplia para aceptar muchas sesiones a la vez
+        return await asyncio.start_server(self.atender, host, puerto, backlog=4096)
+
+    async def atender(self, lector, escritor):
+        """Corre la sesión de una conexión"""
+        self.sesiones += 1
+        alimentador = None
+        try:
+            lineas = []
+            try:
+                async for linea in lector:
+                    linea = linea.decode().rstrip("\r\n")
+                    if linea == FIN_DEL_PROGRAMA:
+                        break
+                    lineas.append(linea)
+            except UnicodeDecodeError:
+                escritor.write(error("El programa no es texto UTF-8"))
+                return
+
+            entrada = EntradaEnCola()
+            maquina = self.crear_maquina(entrada)
+            try:
+                estado = maquina.cargar(maquina.encender(), "\n".join(lineas))
+            except (ChProgramaInvalido, SinMemoriaSuficiente) as e:
+                escritor.write(error(e.__cause__ or e))
+                return
+            except Exception as e:
+                # Cualquier otra falla también termina la sesión con un error
+                escritor.write(error(e))
+                return
+
+            alimentador = asyncio.ensure_future(entrada.alimentar(lector))
+            try:
+                estado = await self.correr(maquina, estado, escritor)
+            except Exception as e:
+                escritor.write(error(e))
+            else:
+                escritor.write(f"fin {estado.reloj}\n".encode())
+        finally:
+            if alimentador is not None:
+                alimentador.cancel()
+            try:
+                await escritor.drain()
+            except ConnectionError:
+                pass
+            escritor.close()
+
+    async def correr(self, maquina, estado, escritor):
+        """Corre la máquina enviando cada salida apenas se produce"""
+        escritos = {
+            dispositivo: len(getattr(estado, dispositivo))
+            for dispositivo in ("impresora", "pantalla")
+        }
+        async for estado in maquina.aiterar(estado, en_sitio=True, cada=self.cada):
+            for dispositivo, escrito in escritos.items():
+                lineas = getattr(estado, dispositivo)
+                if len(lineas) > escrito:
+                    for programa, mensaje in lineas[escrito:]:
+                        escritor.write(f"[{programa}] {mensaje}\n".encode())
+                    escritos[dispositivo] = len(lineas)
+                    await escritor.drain()
+        return estado
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="chmaquina-servidor",
+        description="Servidor TCP de prueba: cada conexión corre un ch programa con "
+        "su propia máquina.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--puerto", type=int, default=8765)
+    parser.add_argument("-m", "--memoria", type=int, default=512)
+    parser.add_argument("-k", "--kernel", type=int, default=79)
+    parser.add_argument(
+        "-a", "--algoritmo", choices=sorted(PLANIFICADORES), default="RR"
+    )
+    parser.add_argument(
+        "-q", "--quantum", type=int, default=5, help="0 para no expropiar"
+    )
+    parser.add_argument(
+        "--cada",
+        type=int,
+        default=100,
+        help="instrucciones que corre una sesión antes de ceder el turno",
+    )
+    return parser
+
+
+async def servir(servidor, host, puerto):
+    escuchando = await servidor.iniciar(host, puerto)
+    for socket in escuchando.sockets:
+        print(f"Escuchando en {socket.getsockname()}", file=sys.stderr)
+    async with escuchando:
+        await escuchando.serve_forever()
+
+
+def main(argumentos=None):
+    opciones = crear_parser().parse_args(argumentos)
+    servidor = Servidor(
+        opciones.memoria,
+        opciones.kernel,
+        opciones.algoritmo,
+        opciones.quantum,
+        opciones.cada,
+    )
+    try:
+        asyncio.run(servir(servidor, opciones.host, opciones.puerto))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,36 @@
 import collections
+import hashlib
+import json
+import os
 import re
 
 from chmaquina.errores import ErrorDeSintaxis
 
+# Resultado de verificar un programa; `Maquina.cargar` lo acepta en lugar del texto
+ProgramaVerificado = collections.namedtuple(
+    "ProgramaVerificado", ["codigo", "variables", "etiquetas"]
+)
+
+# Un error encontrado al verificar: linea y columna empiezan en 1, `instruccion` es
+# el texto de la linea; los errores que no son de una linea tienen linea None
+Diagnostico = collections.namedtuple(
+    "Diagnostico", ["linea", "columna", "instruccion", "mensaje"]
+)
+
+# Un programa verificado y su ráfaga estimada, como se guardan en la cache
+Analisis = collections.namedtuple("Analisis", ["verificado", "rafaga"])
+
+_ENTERO = re.compile(r"^-?\d+ *$")
+_REAL = re.compile(r"^-?\d+\.?\d* *$")
+
 
 class Contexto(object):
     def __init__(self):
         self.variables = collections.OrderedDict()
         self.etiquetas = collections.OrderedDict()
         self.etiquetas_requeridas = set()
+        # Numero y texto de la primera linea que usa cada etiqueta
+        self.usos_de_etiquetas = {}
 
     def definir_variable(self, variable, tipo, valor):
         self.variables[variable] = {"tipo": tipo, "valor": valor}
@@ -16,7 +38,8 @@ class Contexto(object):
     def variable_definida(self, variable):
         return variable in self.variables
 
-    def requerir_etiqueta(self, etiqueta):
+    def requerir_etiqueta(self, etiqueta, uso=None):
+        self.usos_de_etiquetas.setdefault(etiqueta, uso)
         return self.etiquetas_requeridas.add(etiqueta)
 
     def definir_etiqueta(self, etiqueta, linea):
@@ -43,6 +66,9 @@ class VerificadorCh(object):
     def __init__(self, programa):
         self.programa = programa
         self.contexto = Contexto()
+        self.diagnosticos = []
+        # Numero y texto de la linea que se está verificando
+        self.uso = None
 
     @staticmethod
     def numero_de_argumentos(argumentos, _min, _max=None):
@@ -59,7 +85,7 @@ class VerificadorCh(object):
         """
         tipos_validos = ["C", "I", "R", "L"]
         if cadena.upper() not in tipos_validos:
-            raise ErrorDeSintaxis(f"{cadena} no es un tipo válido")
+            raise ErrorDeSintaxis(f"{cadena} no es un tipo válido", cadena)
 
     @staticmethod
     def valor_por_defecto(tipo):
@@ -76,16 +102,16 @@ class VerificadorCh(object):
             # Nada que hacer todo valor puede ser tipo cadena
             pass
         elif tipo == "I":
-            if not re.match(r"^-?\d+ *$", valor):
-                raise ErrorDeSintaxis(f"El valor '{valor}' no es de tipo {tipo}")
+            if not _ENTERO.match(valor):
+                raise ErrorDeSintaxis(f"El valor '{valor}' no es de tipo {tipo}", valor)
         elif tipo == "R":
-            if not re.match(r"^-?\d+\.?\d* *$", valor):
-                raise ErrorDeSintaxis(f"El valor '{valor}' no es de tipo {tipo}")
+            if not _REAL.match(valor):
+                raise ErrorDeSintaxis(f"El valor '{valor}' no es de tipo {tipo}", valor)
         elif tipo == "L":
             if valor not in ["0", "1"]:
-                raise ErrorDeSintaxis(f"El valor '{valor}' no es de tipo {tipo}")
+                raise ErrorDeSintaxis(f"El valor '{valor}' no es de tipo {tipo}", valor)
         else:
-            raise ErrorDeSintaxis(f"{tipo} no es un tipo válido")
+            raise ErrorDeSintaxis(f"{tipo} no es un tipo válido", tipo)
 
     def ya_definida(self, variable):
         """
@@ -93,7 +119,7 @@ class VerificadorCh(object):
         """
         if not self.contexto.variable_definida(variable):
             raise ErrorDeSintaxis(
-                f"La variable '{variable}' no está definida antes de usarla"
+                f"La variable '{variable}' no está definida antes de usarla", variable
             )
 
     def etiquetas_completas(self):
@@ -127,7 +153,7 @@ class VerificadorCh(object):
             self.numero_de_argumentos(argumentos, 2, 3)
             variable, tipo, *_ = argumentos
             if variable == "acumulador":
-                raise ErrorDeSintaxis("acumulador es una palabra reservada.")
+                raise ErrorDeSintaxis("acumulador es una palabra reservada.", variable)
             self.es_tipo(tipo)
             if len(argumentos) == 3:
                 valor = argumentos[2]
@@ -139,13 +165,13 @@ class VerificadorCh(object):
             # vaya <etiqueta>
             self.numero_de_argumentos(argumentos, 1)
             etiqueta, = argumentos
-            self.contexto.requerir_etiqueta(etiqueta)
+            self.contexto.requerir_etiqueta(etiqueta, self.uso)
         elif instruccion == "vayasi":
             # vayasi <etiqueta> <etiqueta>
             self.numero_de_argumentos(argumentos, 2)
             rama1, rama2 = argumentos
-            self.contexto.requerir_etiqueta(rama1)
-            self.contexto.requerir_etiqueta(rama2)
+            self.contexto.requerir_etiqueta(rama1, self.uso)
+            self.contexto.requerir_etiqueta(rama2, self.uso)
         elif instruccion == "etiqueta":
             # vayasi <etiqueta> <linea>
             self.numero_de_argumentos(argumentos, 2)
@@ -189,26 +215,109 @@ class VerificadorCh(object):
             variable, = argumentos
             if variable != "acumulador":
                 self.ya_definida(variable)
-        elif instruccion in "retorne":
+        elif instruccion == "retorne":
             self.numero_de_argumentos(argumentos, 0, 1)
             if argumentos:
                 valor, = argumentos
                 self.es_de_tipo("I", valor)
         else:
-            raise ErrorDeSintaxis(f"Instrucción desconocida: '{linea}'")
+            raise ErrorDeSintaxis(f"Instrucción desconocida: '{linea}'", instruccion)
         return " ".join([instruccion] + argumentos)
 
-    def verificar(self):
+    def verificar_flujo(self, lineas=None):
+        """
+        Verifica el programa linea por linea y produce cada linea verificada.
+
+        `lineas` es el texto del programa, un archivo abierto o cualquier iterador de
+        lineas (por defecto `self.programa`). No se detiene en el primer error: al
+        terminar lanza ErrorDeSintaxis con todos los errores y sus números de linea,
+        que también quedan en `self.diagnosticos`. Las variables y las etiquetas
+        quedan en `self.contexto`.
+        """
         self.contexto = Contexto()
-        lineas = self.programa.lstrip().split("\n")
-        lineas_verificadas = []
-        for numero, linea in enumerate(lineas, start=1):
+        self.diagnosticos = []
+        # Las lineas vacías al comienzo del programa no se cuentan como código
+        al_comienzo = True
+        fuente = self.programa if lineas is None else lineas
+        for numero, linea in enumerate(_lineas(fuente), start=1):
+            if al_comienzo and not linea.strip():
+                continue
+            al_comienzo = False
+            self.uso = (numero, linea)
             try:
-                lineas_verificadas.append(self.verificar_linea(linea))
+                verificada = self.verificar_linea(linea)
             except ErrorDeSintaxis as e:
-                raise ErrorDeSintaxis(f"{e}\nEn la linea {numero}: {linea}")
-        self.etiquetas_completas()
-        return lineas_verificadas, self.contexto.variables, self.contexto.etiquetas
+                self.diagnosticos.append(_diagnostico(numero, linea, e.token, str(e)))
+                continue
+            yield verificada
+        self.uso = None
+        if al_comienzo:
+            yield ""
+        for etiqueta in sorted(self.contexto.etiquetas_faltantes):
+            numero, linea = self.contexto.usos_de_etiquetas[etiqueta] or (None, None)
+            mensaje = f"No se ha definido la etiqueta '{etiqueta}'"
+            self.diagnosticos.append(_diagnostico(numero, linea, etiqueta, mensaje))
+        if self.diagnosticos:
+            raise ErrorDeSintaxis("\n".join(map(_describir, self.diagnosticos)))
+
+    def diagnosticar(self, lineas=None):
+        """
+        Verifica todo el programa y retorna la lista de errores (`Diagnostico`),
+        vacía si el programa es válido.
+        """
+        try:
+            for _ in self.verificar_flujo(lineas):
+                pass
+        except ErrorDeSintaxis:
+            pass
+        return self.diagnosticos
+
+    def verificar(self):
+        lineas_verificadas = list(self.verificar_flujo())
+        return ProgramaVerificado(
+            lineas_verificadas, self.contexto.variables, self.contexto.etiquetas
+        )
+
+
+def _lineas(fuente):
+    """
+    Las lineas de un programa dado como texto o como iterador de lineas, sin el
+    salto de linea. Igual que `str.split`, un programa que termina en salto de linea
+    tiene una linea vacía al final.
+    """
+    if isinstance(fuente, str):
+        yield from fuente.split("\n")
+        return
+    termina_en_salto = True
+    for linea in fuente:
+        termina_en_salto = linea.endswith("\n")
+        yield linea[:-1] if termina_en_salto else linea
+    if termina_en_salto:
+        yield ""
+
+
+def _diagnostico(numero, linea, token, mensaje):
+    """Un diagnóstico con la columna del token en la linea, o la de la instrucción"""
+    if linea is None:
+        return Diagnostico(None, None, None, mensaje)
+    columna = None
+    if token is not None:
+        for palabra in re.finditer(r"\S+", linea):
+            if palabra.group() == token.strip():
+                columna = palabra.start() + 1
+                break
+    if columna is None:
+        columna = len(linea) - len(linea.lstrip()) + 1
+    return Diagnostico(numero, columna, linea.strip(), mensaje)
+
+
+def _describir(diagnostico):
+    if diagnostico.linea is None:
+        return diagnostico.mensaje
+    return (
+        f"{diagnostico.mensaje}\n"
+        f"En la linea {diagnostico.linea}: {diagnostico.instruccion}"
+    )
 
 
 def verificar(programa):
@@ -219,6 +328,14 @@ def verificar(programa):
     return verificador.verificar()
 
 
+def diagnosticar(programa):
+    """
+    Todos los errores de un ch programa dado como texto, archivo o iterador de
+    lineas, en una sola pasada.
+    """
+    return VerificadorCh(programa).diagnosticar()
+
+
 def estimar(lineas):
     """
     Estima la duración de un ch programa.
@@ -247,3 +364,125 @@ def estimar(lineas):
     # 1 rafaga de io toma aleatoriameente entre 1 y 9 unidades de tiempo
     return rafagas_cpu + 5 * rafagas_io
 
+
+def _entrada_de_cache(entrada):
+    """
+    Una entrada leída del JSON de la cache como (llave, `Analisis`); lanza
+    ValueError si no tiene la forma esperada.
+    """
+    llave, codigo, variables, etiquetas, rafaga = entrada
+    variables = collections.OrderedDict(variables)
+    etiquetas = collections.OrderedDict(etiquetas)
+    if not (
+        isinstance(llave, str)
+        and isinstance(rafaga, int)
+        and isinstance(codigo, list)
+        and all(isinstance(linea, str) for linea in codigo)
+        and all(isinstance(dato, dict) for dato in variables.values())
+        and all(isinstance(linea, int) for linea in etiquetas.values())
+    ):
+        raise ValueError("entrada de cache inválida")
+    return llave, Analisis(ProgramaVerificado(codigo, variables, etiquetas), rafaga)
+
+
+class CacheDeVerificacion(object):
+    """
+    Cache LRU de programas verificados, indexada por el hash del texto del programa.
+
+    Guarda hasta `capacidad` programas (0 desactiva la cache). Si se da `ruta`, la
+    cache se carga de ese archivo al crearse y `guardar` la escribe allí. Los
+    errores de sintaxis no se guardan.
+
+    Los resultados se comparten entre quienes los piden; no se deben modificar.
+    """
+
+    VERSION = 2
+
+    def __init__(self, capacidad=256, ruta=None):
+        self.capacidad = capacidad
+        self.ruta = ruta
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = collections.OrderedDict()
+        if ruta is not None and os.path.exists(ruta):
+            self.cargar(ruta)
+
+    @staticmethod
+    def llave(programa):
+        return hashlib.sha256(programa.encode()).hexdigest()
+
+    def analizar(self, programa):
+        """Verifica el programa y estima su ráfaga, o los toma de la cache"""
+        llave = self.llave(programa)
+        analisis = self._entradas.get(llave)
+        if analisis is not None:
+            self.aciertos += 1
+            self._entradas.move_to_end(llave)
+            return analisis
+        self.fallos += 1
+        verificado = verificar(programa)
+        analisis = Analisis(verificado, estimar(verificado.codigo))
+        self._agregar(llave, analisis)
+        return analisis
+
+    def verificar(self, programa):
+        return self.analizar(programa).verificado
+
+    def _agregar(self, llave, analisis):
+        if self.capacidad <= 0:
+            return
+        self._entradas[llave] = analisis
+        self._entradas.move_to_end(llave)
+        while len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        self._entradas.clear()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def guardar(self, ruta=None):
+        """
+        Escribe las entradas en `ruta` (o en la ruta de la cache) como JSON, que sólo
+        contiene datos y se puede leer sin confiar en el archivo.
+        """
+        ruta = ruta or self.ruta
+        entradas = []
+        for llave, (verificado, rafaga) in self._entradas.items():
+            codigo, variables, etiquetas = verificado
+            variables = list(variables.items())
+            etiquetas = list(etiquetas.items())
+            entradas.append([llave, codigo, variables, etiquetas, rafaga])
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w") as archivo:
+            json.dump({"version": self.VERSION, "entradas": entradas}, archivo)
+        os.replace(temporal, ruta)
+
+    def cargar(self, ruta):
+        """
+        Agrega las entradas guardadas en `ruta`. Un archivo de otra versión o dañado
+        se ignora.
+        """
+        try:
+            with open(ruta) as archivo:
+                datos = json.load(archivo)
+            if datos["version"] != self.VERSION:
+                return
+            leidas = [_entrada_de_cache(entrada) for entrada in datos["entradas"]]
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return
+        for llave, analisis in leidas:
+            self._agregar(llave, analisis)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({len(self)}/{self.capacidad}, "
+            f"aciertos={self.aciertos}, fallos={self.fallos})"
+        )
+
+
+# Cache compartida por las máquinas que no reciben una propia
+CACHE = CacheDeVerificacion()
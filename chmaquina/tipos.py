@@ -0,0 +1,94 @@
+"""
+Representación en memoria de los valores de los tipos del lenguaje CH.
+
+Las celdas guardan valores nativos (int para I, float para R, bool para L y str para
+C); sólo se convierten a texto al mostrarlos. Un número escrito de otra forma que
+la de Python, como "007" o el real "3", recuerda su texto para mostrarse igual.
+"""
+
+
+class _Entero(int):
+    """Un entero que se muestra con el texto con el que se escribió"""
+
+    def __new__(cls, texto):
+        valor = super().__new__(cls, texto)
+        valor.texto = texto
+        return valor
+
+    def __reduce__(self):
+        return (self.__class__, (self.texto,))
+
+
+class _Real(float):
+    """Un real que se muestra con el texto con el que se escribió"""
+
+    def __new__(cls, texto):
+        valor = super().__new__(cls, texto)
+        valor.texto = texto
+        return valor
+
+    def __reduce__(self):
+        return (self.__class__, (self.texto,))
+
+
+def _con_texto(clase, valor, texto):
+    """El valor, o uno de `clase` que recuerda el texto si se mostraría distinto"""
+    if str(valor) == texto:
+        return valor
+    return clase(texto)
+
+
+def convertir(tipo, texto):
+    """
+    Convierte el texto de un valor al valor nativo de su tipo.
+
+    Lanza ValueError si el texto no corresponde al tipo.
+    """
+    tipo = tipo.upper()
+    if tipo == "I":
+        return _con_texto(_Entero, int(texto), texto)
+    if tipo == "R":
+        return _con_texto(_Real, float(texto), texto)
+    if tipo == "L":
+        if texto.strip() not in ("0", "1"):
+            raise ValueError(f"'{texto}' no es un valor lógico")
+        return texto.strip() == "1"
+    return texto
+
+
+def formatear(valor):
+    """
+    Convierte un valor nativo en el texto con el que se muestra.
+    """
+    if valor is None:
+        return ""
+    if valor is True or valor is False:
+        return "1" if valor else "0"
+    if valor.__class__ is _Entero or valor.__class__ is _Real:
+        return valor.texto
+    return str(valor)
+
+
+def numero(valor):
+    """
+    Interpreta un valor como número para las operaciones aritméticas.
+    """
+    if valor is None or valor == "":
+        return 0.0
+    return float(valor)
+
+
+def logico(valor):
+    """
+    Interpreta un valor como lógico, sólo 1 es verdadero.
+    """
+    if valor is True or valor is False:
+        return valor
+    return formatear(valor) == "1"
+
+
+def vacio(valor):
+    """
+    Indica si una celda no tiene valor asignado.
+    """
+    return valor is None or valor == ""
@@ -0,0 +1,506 @@
+"""
+Trazas binarias de ejecución.
+
+Una máquina con traza registra cada instrucción ejecutada (reloj, programa,
+contador, operación, duración, las celdas que escribe, incluido el acumulador, y lo
+que envía a la impresora o la pantalla) en un archivo al que sólo se agregan datos.
+Las celdas que cambian fuera de una instrucción, al cargar, liberar o compactar
+programas, se registran completas, así que la memoria se puede reproducir aunque los
+programas se muevan.
+Los registros se acumulan en bloques que se escriben de una vez; cada bloque empieza
+con una cabecera con su número de registros, el número del primero y su reloj, así
+que el lector puede saltar a cualquier instrucción o instante leyendo sólo las
+cabeceras y un bloque, sin volver a correr la máquina.
+
+Formato (todo en little endian)::
+
+    archivo   = b"CHTRAZA" versión:u8 bloque*
+    bloque    = longitud:u32 registros:u32 primer_numero:u64 primer_reloj:u64
+                registro*
+    registro  = tipo:u8 reloj:u64 programa:u16 contador:u32 operacion:u8
+                duracion:u32 escrituras:u8 eventos:u8
+                (posicion:u32 valor)* (dispositivo:u8 texto)*
+    valor     = etiqueta:u8 [i64 | f64 | texto | celda]
+    celda     = campos:u8 (campo:u8 valor)*
+    texto     = longitud:u32 utf-8
+
+Los números que recuerdan el texto con el que se escribieron, y los enteros que no
+caben en 64 bits, se guardan como ese texto. Las celdas completas de los registros
+de memoria guardan cada uno de sus campos como un valor.
+"""
+import argparse
+import bisect
+import collections
+import mmap
+import os
+import struct
+import sys
+
+from chmaquina.errores import TrazaInvalida
+from chmaquina.instrucciones import Operacion
+from chmaquina.tipos import convertir, formatear
+
+MAGIA = b"CHTRAZA"
+VERSION = 2
+
+# Tipos de registro: una instrucción ejecutada, una entrada entregada a un programa
+# que esperaba en un lea o celdas completas (nombre, programa, tipo y valor) que
+# cambiaron fuera de una instrucción
+INSTRUCCION = 0
+ENTRADA = 1
+MEMORIA = 2
+
+# Número de programa para los registros que no son de ningún programa
+_SIN_PROGRAMA = 0xFFFF
+# Escrituras como máximo en un registro
+_MAXIMO_ESCRITURAS = 0xFF
+
+DISPOSITIVOS = ("impresora", "pantalla", "entrada")
+_NUMERO_DISPOSITIVO = {dispositivo: i for i, dispositivo in enumerate(DISPOSITIVOS)}
+
+OPERACIONES = tuple(Operacion)
+_CODIGO_OPERACION = {operacion: i for i, operacion in enumerate(OPERACIONES)}
+
+_CABECERA = struct.Struct("<7sB")
+_BLOQUE = struct.Struct("<IIQQ")
+_REGISTRO = struct.Struct("<BQHIBIBB")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+# Etiquetas de los valores de las celdas
+(
+    _NINGUNO,
+    _FALSO,
+    _VERDADERO,
+    _ENTERO,
+    _REAL,
+    _CADENA,
+    _ENTERO_ESCRITO,
+    _REAL_ESCRITO,
+    _CELDA,
+) = range(9)
+_CONSTANTES = {_NINGUNO: None, _FALSO: False, _VERDADERO: True}
+_TIPO_ESCRITO = {_ENTERO_ESCRITO: "I", _REAL_ESCRITO: "R"}
+
+# Campos de las celdas completas
+_CAMPOS = ("nombre", "programa", "tipo", "valor")
+_NUMERO_CAMPO = {campo: i for i, campo in enumerate(_CAMPOS)}
+
+Registro = collections.namedtuple(
+    "Registro",
+    "numero tipo reloj programa contador operacion duracion escrituras eventos",
+)
+
+
+def _empacar_texto(datos, texto):
+    codificado = texto.encode()
+    datos += _U32.pack(len(codificado))
+    datos += codificado
+
+
+def _empacar_valor(datos, valor):
+    if valor is None:
+        datos.append(_NINGUNO)
+    elif valor is True or valor is False:
+        datos.append(_VERDADERO if valor else _FALSO)
+    elif type(valor) is int and -(2 ** 63) <= valor < 2 ** 63:
+        datos.append(_ENTERO)
+        datos += _I64.pack(valor)
+    elif type(valor) is float:
+        datos.append(_REAL)
+        datos += _F64.pack(valor)
+    elif type(valor) is str:
+        datos.append(_CADENA)
+        _empacar_texto(datos, valor)
+    elif isinstance(valor, int):
+        datos.append(_ENTERO_ESCRITO)
+        _empacar_texto(datos, formatear(valor))
+    elif isinstance(valor, float):
+        datos.append(_REAL_ESCRITO)
+        _empacar_texto(datos, formatear(valor))
+    elif type(valor) is dict:
+        datos.append(_CELDA)
+        datos.append(len(valor))
+        for campo, dato in valor.items():
+            if campo not in _NUMERO_CAMPO or type(dato) is dict:
+                raise TypeError(f"La traza no puede guardar la celda {valor!r}")
+            datos.append(_NUMERO_CAMPO[campo])
+            _empacar_valor(datos, dato)
+    else:
+        raise TypeError(f"La traza no puede guardar el valor {valor!r}")
+
+
+def _desempacar_texto(datos, posicion):
+    (longitud,) = _U32.unpack_from(datos, posicion)
+    posicion += _U32.size
+    return str(datos[posicion : posicion + longitud], "utf-8"), posicion + longitud
+
+
+def _desempacar_valor(datos, posicion):
+    etiqueta = datos[posicion]
+    posicion += 1
+    if etiqueta in _CONSTANTES:
+        return _CONSTANTES[etiqueta], posicion
+    if etiqueta == _ENTERO:
+        return _I64.unpack_from(datos, posicion)[0], posicion + _I64.size
+    if etiqueta == _REAL:
+        return _F64.unpack_from(datos, posicion)[0], posicion + _F64.size
+    if etiqueta == _CADENA:
+        return _desempacar_texto(datos, posicion)
+    if etiqueta in _TIPO_ESCRITO:
+        texto, posicion = _desempacar_texto(datos, posicion)
+        try:
+            return convertir(_TIPO_ESCRITO[etiqueta], texto), posicion
+        except ValueError:
+            raise TrazaInvalida(f"Número dañado en la traza: {texto!r}")
+    if etiqueta == _CELDA:
+        campos = datos[posicion]
+        posicion += 1
+        celda = {}
+        for _ in range(campos):
+            campo = datos[posicion]
+            if campo >= len(_CAMPOS):
+                raise TrazaInvalida(f"Campo de celda desconocido: {campo}")
+            dato, posicion = _desempacar_valor(datos, posicion + 1)
+            if type(dato) is dict:
+                raise TrazaInvalida("Una celda de la traza contiene otra celda")
+            celda[_CAMPOS[campo]] = dato
+        return celda, posicion
+    raise TrazaInvalida(f"Etiqueta de valor desconocida: {etiqueta}")
+
+
+class EscritorDeTraza(object):
+    """
+    Agrega registros a una traza. Los registros se guardan en memoria hasta llenar
+    un bloque de `tamano_bloque` bytes; `cerrar` escribe el último bloque.
+    """
+
+    def __init__(self, archivo, tamano_bloque=1 << 16):
+        if isinstance(archivo, (str, os.PathLike)):
+            archivo = open(archivo, "wb")
+            self._propio = True
+        else:
+            self._propio = False
+        self.archivo = archivo
+        self.tamano_bloque = tamano_bloque
+        self.registros = 0
+        self._bloque = bytearray()
+        self._registros_bloque = 0
+        self._primer_reloj = 0
+        archivo.write(_CABECERA.pack(MAGIA, VERSION))
+
+    def instruccion(
+        self, reloj, programa, contador, operacion, duracion, escrituras=(), eventos=()
+    ):
+        """
+        Registra una instrucción; `escrituras` son pares (posición, valor) y
+        `eventos` pares (dispositivo, texto).
+        """
+        self._registrar(
+            INSTRUCCION,
+            reloj,
+            programa,
+            contador,
+            operacion,
+            duracion,
+            escrituras,
+            eventos,
+        )
+
+    def entrada(self, reloj, programa, contador, posicion, valor, texto):
+        """Registra la entrada que recibe un programa bloqueado en un lea"""
+        self._registrar(
+            ENTRADA,
+            reloj,
+            programa,
+            contador,
+            Operacion.LEA,
+            0,
+            ((posicion, valor),),
+            (("entrada", texto),),
+        )
+
+    def celdas(self, reloj, programa, celdas):
+        """
+        Registra celdas completas, pares (posición, celda), que cambiaron fuera de
+        una instrucción; `programa` puede ser None.
+        """
+        celdas = list(celdas)
+        for inicio in range(0, len(celdas), _MAXIMO_ESCRITURAS):
+            self._registrar(
+                MEMORIA,
+                reloj,
+                programa,
+                0,
+                Operacion.NADA,
+                0,
+                celdas[inicio : inicio + _MAXIMO_ESCRITURAS],
+                (),
+            )
+
+    def _registrar(
+        self, tipo, reloj, programa, contador, operacion, duracion, escrituras, eventos
+    ):
+        if not self._registros_bloque:
+            self._primer_reloj = reloj
+        bloque = self._bloque
+        bloque += _REGISTRO.pack(
+            tipo,
+            reloj,
+            _SIN_PROGRAMA if programa is None else int(programa),
+            contador,
+            _CODIGO_OPERACION[operacion],
+            duracion,
+            len(escrituras),
+            len(eventos),
+        )
+        for posicion, valor in escrituras:
+            bloque += _U32.pack(posicion)
+            _empacar_valor(bloque, valor)
+        for dispositivo, texto in eventos:
+            bloque.append(_NUMERO_DISPOSITIVO[dispositivo])
+            _empacar_texto(bloque, texto)
+        self._registros_bloque += 1
+        if len(bloque) >= self.tamano_bloque:
+            self.vaciar()
+
+    def vaciar(self):
+        """Escribe en el archivo los registros pendientes"""
+        if not self._registros_bloque:
+            return
+        primero = self.registros
+        self.registros += self._registros_bloque
+        self.archivo.write(
+            _BLOQUE.pack(
+                len(self._bloque), self._registros_bloque, primero, self._primer_reloj
+            )
+        )
+        self.archivo.write(self._bloque)
+        self.archivo.flush()
+        self._bloque = bytearray()
+        self._registros_bloque = 0
+
+    def cerrar(self):
+        self.vaciar()
+        if self._propio:
+            self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+class LectorDeTraza(object):
+    """
+    Lee una traza proyectando el archivo en memoria. Al abrirla sólo se recorren
+    las cabeceras de los bloques; un bloque incompleto al final, de una corrida que
+    se interrumpió, se ignora.
+    """
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "rb")
+        try:
+            self._datos = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._archivo.close()
+            raise TrazaInvalida(f"{ruta} está vacío")
+        if len(self._datos) < _CABECERA.size:
+            self.cerrar()
+            raise TrazaInvalida(f"{ruta} no es una traza")
+        magia, version = _CABECERA.unpack_from(self._datos)
+        if magia != MAGIA or version != VERSION:
+            self.cerrar()
+            raise TrazaInvalida(f"{ruta} no es una traza de la versión {VERSION}")
+
+        # Por bloque: posición de sus registros, cuántos tiene, número y reloj del
+        # primero
+        self._bloques = []
+        self._primeros = []
+        self._relojes = []
+        posicion = _CABECERA.size
+        while posicion + _BLOQUE.size <= len(self._datos):
+            longitud, registros, primero, reloj = _BLOQUE.unpack_from(
+                self._datos, posicion
+            )
+            inicio = posicion + _BLOQUE.size
+            if inicio + longitud > len(self._datos):
+                break
+            self._bloques.append((inicio, registros))
+            self._primeros.append(primero)
+            self._relojes.append(reloj)
+            posicion = inicio + longitud
+        self._total = self._primeros[-1] + self._bloques[-1][1] if self._bloques else 0
+
+    def __len__(self):
+        return self._total
+
+    @property
+    def bloques(self):
+        return len(self._bloques)
+
+    def _leer_bloque(self, indice, desde=0):
+        datos = self._datos
+        posicion, registros = self._bloques[indice]
+        numero = self._primeros[indice]
+        for _ in range(registros):
+            (
+                tipo,
+                reloj,
+                programa,
+                contador,
+                operacion,
+                duracion,
+                n_escrituras,
+                n_eventos,
+            ) = _REGISTRO.unpack_from(datos, posicion)
+            posicion += _REGISTRO.size
+            escrituras = []
+            for _ in range(n_escrituras):
+                (celda,) = _U32.unpack_from(datos, posicion)
+                valor, posicion = _desempacar_valor(datos, posicion + _U32.size)
+                escrituras.append((celda, valor))
+            eventos = []
+            for _ in range(n_eventos):
+                dispositivo = DISPOSITIVOS[datos[posicion]]
+                texto, posicion = _desempacar_texto(datos, posicion + 1)
+                eventos.append((dispositivo, texto))
+            if numero >= desde:
+                yield Registro(
+                    numero,
+                    tipo,
+                    reloj,
+                    None if programa == _SIN_PROGRAMA else f"{programa:03d}",
+                    contador,
+                    OPERACIONES[operacion],
+                    duracion,
+                    tuple(escrituras),
+                    tuple(eventos),
+                )
+            numero += 1
+
+    def registros(self, desde=0, hasta=None):
+        """Los registros con número en [desde, hasta), en orden"""
+        hasta = self._total if hasta is None else min(hasta, self._total)
+        if desde >= hasta:
+            return
+        indice = max(bisect.bisect_right(self._primeros, desde) - 1, 0)
+        for indice in range(indice, len(self._bloques)):
+            for registro in self._leer_bloque(indice, desde):
+                if registro.numero >= hasta:
+                    return
+                yield registro
+
+    def __iter__(self):
+        return self.registros()
+
+    def __getitem__(self, numero):
+        if numero < 0:
+            numero += self._total
+        if not 0 <= numero < self._total:
+            raise IndexError(numero)
+        return next(self.registros(numero))
+
+    def buscar_reloj(self, reloj):
+        """
+        El número del primer registro ejecutado en o después de `reloj`, o el
+        número de registros si no hay ninguno.
+        """
+        indice = max(bisect.bisect_left(self._relojes, reloj) - 1, 0)
+        for indice in range(indice, len(self._bloques)):
+            for registro in self._leer_bloque(indice):
+                if registro.reloj >= reloj:
+                    return registro.numero
+        return self._total
+
+    def reproducir(self, estado, hasta=None):
+        """
+        Aplica a una copia del estado con el que empezó la traza las escrituras,
+        las salidas y el reloj de los registros anteriores a `hasta`. La memoria
+        queda como en la corrida, incluidos los programas cargados, liberados o
+        movidos; la cola de listos y las tablas de los programas no se reproducen.
+        """
+        estado = estado.copiar()
+        for registro in self.registros(hasta=hasta):
+            if registro.tipo == MEMORIA:
+                for posicion, celda in registro.escrituras:
+                    estado.memoria[posicion] = celda
+                continue
+            for posicion, valor in registro.escrituras:
+                estado.escribir(posicion, valor)
+            for dispositivo, texto in registro.eventos:
+                if dispositivo != "entrada":
+                    getattr(estado, dispositivo).append((registro.programa, texto))
+            estado.reloj = registro.reloj + registro.duracion
+        return estado
+
+    def cerrar(self):
+        self._datos.close()
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+_ETIQUETAS = {ENTRADA: "<entrada>", MEMORIA: "<memoria>"}
+
+
+def describir(registro):
+    """Una linea de texto para un registro"""
+    partes = [
+        f"{registro.numero}",
+        f"t={registro.reloj}",
+        f"[{registro.programa}]",
+        f"{registro.contador:04d}",
+        _ETIQUETAS.get(registro.tipo) or registro.operacion.value,
+    ]
+    if registro.duracion != 1:
+        partes.append(f"+{registro.duracion}")
+    partes.extend(f"@{posicion}={valor!r}" for posicion, valor in registro.escrituras)
+    partes.extend(f"{dispositivo}:{texto!r}" for dispositivo, texto in registro.eventos)
+    return " ".join(partes)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="chmaquina-traza",
+        description="Muestra los registros de una traza de ejecución.",
+    )
+    parser.add_argument("traza")
+    ubicacion = parser.add_mutually_exclusive_group()
+    ubicacion.add_argument(
+        "--desde", type=int, default=0, help="número del primer registro a mostrar"
+    )
+    ubicacion.add_argument(
+        "--reloj", type=int, help="muestra desde la instrucción en este instante"
+    )
+    parser.add_argument(
+        "-n", "--cuantos", type=int, default=20, help="registros a mostrar"
+    )
+    return parser
+
+
+def main(argumentos=None):
+    opciones = crear_parser().parse_args(argumentos)
+    try:
+        lector = LectorDeTraza(opciones.traza)
+    except (OSError, TrazaInvalida) as e:
+        print(f"No se pudo abrir la traza: {e}", file=sys.stderr)
+        return 1
+    with lector:
+        desde = opciones.desde
+        if opciones.reloj is not None:
+            desde = lector.buscar_reloj(opciones.reloj)
+        print(f"{len(lector)} registros en {lector.bloques} bloques", file=sys.stderr)
+        for registro in lector.registros(desde, desde + opciones.cuantos):
+            print(describir(registro))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
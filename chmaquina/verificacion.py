@@ -0,0 +1,73 @@
+"""
+Verificación de ch programas desde la consola: reporta todos los errores de cada
+archivo en una sola pasada, como texto o como JSON.
+"""
+import argparse
+import json
+import sys
+
+from chmaquina.sintaxis import Diagnostico, diagnosticar
+
+
+def diagnosticar_archivo(ruta):
+    """Los diagnósticos de un archivo; uno sin linea si no se puede leer"""
+    try:
+        with open(ruta) as programa:
+            return diagnosticar(programa)
+    except (OSError, UnicodeDecodeError) as e:
+        return [Diagnostico(None, None, None, f"No se pudo leer el archivo: {e}")]
+
+
+def como_json(resultados):
+    return json.dumps(
+        [
+            {
+                "archivo": ruta,
+                "valido": not diagnosticos,
+                "diagnosticos": [d._asdict() for d in diagnosticos],
+            }
+            for ruta, diagnosticos in resultados.items()
+        ],
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+def como_texto(resultados):
+    lineas = []
+    for ruta, diagnosticos in resultados.items():
+        for diagnostico in diagnosticos:
+            if diagnostico.linea is None:
+                lineas.append(f"{ruta}: {diagnostico.mensaje}")
+            else:
+                lineas.append(
+                    f"{ruta}:{diagnostico.linea}:{diagnostico.columna}: "
+                    f"{diagnostico.mensaje} ({diagnostico.instruccion})"
+                )
+    return "\n".join(lineas)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="chmaquina-verificar",
+        description="Reporta todos los errores de sintaxis de ch programas.",
+    )
+    parser.add_argument("programas", nargs="+", help="archivos .ch a verificar")
+    parser.add_argument(
+        "--json", action="store_true", help="escribe los diagnósticos como JSON"
+    )
+    return parser
+
+
+def main(argumentos=None):
+    """Retorna 0 si todos los programas son válidos y 1 si alguno tiene errores"""
+    opciones = crear_parser().parse_args(argumentos)
+    resultados = {ruta: diagnosticar_archivo(ruta) for ruta in opciones.programas}
+    salida = como_json(resultados) if opciones.json else como_texto(resultados)
+    if salida:
+        print(salida)
+    return 1 if any(resultados.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,14 +26,23 @@ setup(
         "Programming Language :: Python :: 3.7",
     ],
     description="Una máquina virtual para el lenguaje CH.",
-    entry_points={"console_scripts": ["chmaquina=chmaquina.interfaz:main"]},
+    entry_points={
+        "console_scripts": [
+            "chmaquina=chmaquina.interfaz:main",
+            "chmaquina-run=chmaquina.consola:main",
+            "chmaquina-barrido=chmaquina.barrido:main",
+            "chmaquina-verificar=chmaquina.verificacion:main",
+            "chmaquina-servidor=chmaquina.servidor:main",
+            "chmaquina-traza=chmaquina.traza:main",
+        ]
+    },
     install_requires=requirements,
     license="MIT license",
     long_description=readme,
     include_package_data=True,
     keywords="ch-maquina",
     name="py-chmaquina",
-    packages=find_packages(include=["sc2reaper"]),
+    packages=find_packages(include=["chmaquina"]),
     setup_requires=setup_requirements,
     test_suite="tests",
     tests_require=test_requirements,
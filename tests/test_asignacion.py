@@ -0,0 +1,63 @@
+import pytest
+
+from chmaquina.asignacion import Huecos
+
+
+def test_reservar_sin_liberar_es_contiguo():
+    huecos = Huecos(10, 100)
+    assert [huecos.reservar(5), huecos.reservar(20), huecos.reservar(1)] == [10, 15, 35]
+    assert list(huecos) == [(36, 64)]
+
+
+def test_liberar_une_huecos_vecinos():
+    huecos = Huecos(0, 30)
+    a, b, c = huecos.reservar(10), huecos.reservar(10), huecos.reservar(10)
+    huecos.liberar(a, 10)
+    huecos.liberar(c, 10)
+    assert list(huecos) == [(0, 10), (20, 10)]
+    huecos.liberar(b, 10)
+    assert list(huecos) == [(0, 30)]
+
+
+@pytest.mark.parametrize(
+    "estrategia, posicion", [("primero", 0), ("mejor", 30), ("peor", 46)]
+)
+def test_estrategias(estrategia, posicion):
+    huecos = Huecos(0, 100, estrategia)
+    bloques = [huecos.reservar(tamano) for tamano in (20, 10, 6, 10, 54)]
+    huecos.liberar(bloques[0], 20)
+    huecos.liberar(bloques[2], 6)
+    huecos.liberar(bloques[4], 54)
+    assert huecos.reservar(5) == posicion
+
+
+def test_sin_hueco_suficiente():
+    huecos = Huecos(0, 10)
+    huecos.reservar(4)
+    assert not huecos.cabe(7)
+    assert huecos.reservar(7) is None
+
+
+def test_fragmentacion():
+    huecos = Huecos(0, 100)
+    bloques = [huecos.reservar(10) for _ in range(10)]
+    for bloque in bloques[::2]:
+        huecos.liberar(bloque, 10)
+    fragmentacion = huecos.fragmentacion()
+    assert fragmentacion.libre == 50
+    assert fragmentacion.huecos == 5
+    assert fragmentacion.mayor_hueco == 10
+    assert fragmentacion.externa == pytest.approx(0.8)
+
+
+def test_copias_independientes():
+    huecos = Huecos(0, 10)
+    copia = huecos.copiar()
+    copia.reservar(4)
+    assert list(huecos) == [(0, 10)]
+    assert list(copia) == [(4, 6)]
+
+
+def test_estrategia_desconocida():
+    with pytest.raises(ValueError):
+        Huecos(0, 10, "aleatorio")
@@ -0,0 +1,71 @@
+import csv
+import pathlib
+
+from chmaquina.barrido import (
+    COLUMNAS,
+    Configuracion,
+    barrer,
+    configuraciones,
+    correr_configuracion,
+    main,
+)
+from chmaquina.sintaxis import verificar
+
+EJEMPLOS = pathlib.Path(__file__).parent.parent / "ejemplos"
+FACTORIAL = (EJEMPLOS / "factorial.ch").read_text()
+
+
+def test_configuraciones_son_el_producto():
+    todas = configuraciones([512, 1024], [79], ["FCFS", "RR"], [5], [0, 1])
+    assert len(todas) == 8
+    assert todas[0] == Configuracion(512, 79, "FCFS", 5, 0)
+    assert todas[-1] == Configuracion(1024, 79, "RR", 5, 1)
+
+
+def test_correr_configuracion():
+    fila = correr_configuracion(
+        [verificar(FACTORIAL)] * 2, Configuracion(512, 79, "RR", 5, 0)
+    )
+    assert list(fila) == COLUMNAS
+    assert fila["terminados"] == 2
+    assert fila["error"] is None
+
+
+def test_memoria_insuficiente_queda_en_la_fila():
+    configuracion = Configuracion(80, 79, "RR", 5, 0)
+    fila = correr_configuracion([verificar(FACTORIAL)], configuracion)
+    assert fila["error"].startswith("SinMemoriaSuficiente")
+    assert fila["terminados"] == 0
+
+
+def test_barrer_en_paralelo_igual_que_en_serie():
+    todas = configuraciones([512], [79], ["FCFS", "SJF", "RR"], [2, 5], [0, 1])
+    en_serie = barrer([FACTORIAL, FACTORIAL], todas, procesos=1)
+    en_paralelo = barrer([FACTORIAL, FACTORIAL], todas, procesos=2)
+    assert en_serie == en_paralelo
+    assert [fila["algoritmo"] for fila in en_serie] == [c.algoritmo for c in todas]
+
+
+def test_main_escribe_csv(tmp_path):
+    salida = tmp_path / "barrido.csv"
+    argumentos = ["-a", "FCFS", "RR", "-s", "0", "1", "-p", "1", "-o", str(salida)]
+    assert main(argumentos + [str(EJEMPLOS / "factorial.ch")]) == 0
+    with open(salida) as archivo:
+        filas = list(csv.DictReader(archivo))
+    assert len(filas) == 4
+    assert all(fila["terminados"] == "1" for fila in filas)
+
+
+def test_main_con_un_programa_que_no_es_utf8(tmp_path, capsys):
+    programa = tmp_path / "latin1.ch"
+    programa.write_bytes("// año\nretorne 0\n".encode("latin-1"))
+    assert main([str(programa)]) == 1
+    assert "No se pudo cargar" in capsys.readouterr().err
+
+
+def test_cualquier_error_queda_en_la_fila():
+    texto = "\n".join(["nueva t C hola", "cargue t", "sume t", "retorne 0"])
+    todas = configuraciones([512], [79], ["FCFS", "RR"], [5], [0])
+    filas = barrer([texto, FACTORIAL], todas, procesos=2)
+    assert [fila["error"].split(":")[0] for fila in filas] == ["ValueError"] * 2
+    assert all(fila["reloj"] > 0 for fila in filas)
@@ -0,0 +1,61 @@
+from chmaquina.colas import ColaFifo, ColaPrioridad, Llegadas
+
+
+def programa(llegada, rafaga=1):
+    return {"tiempo_llegada": llegada, "tiempo_rafaga": rafaga}
+
+
+def test_cola_fifo():
+    cola = ColaFifo()
+    for nombre in ("000", "001", "002"):
+        cola.agregar(nombre)
+    assert cola == ["000", "001", "002"]
+    cola.rotar()
+    assert cola == ["002", "000", "001"]
+    cola.quitar("002")
+    assert cola[0] == "000"
+    assert "002" not in cola
+    assert len(cola) == 2
+
+
+def test_cola_prioridad_ordena_solo_al_planear():
+    cola = ColaPrioridad("tiempo_rafaga")
+    cola.agregar("000", programa(0, rafaga=5))
+    cola.agregar("001", programa(1, rafaga=2))
+    assert cola == ["000", "001"]
+    cola.ordenar()
+    assert cola == ["001", "000"]
+    cola.agregar("002", programa(2, rafaga=1))
+    assert cola == ["001", "000", "002"]
+    cola.ordenar()
+    assert cola == ["002", "001", "000"]
+    cola.quitar("002")
+    assert cola[0] == "001"
+
+
+def test_cola_prioridad_empates_por_orden_de_llegada():
+    cola = ColaPrioridad("tiempo_rafaga")
+    for nombre in ("000", "001", "002"):
+        cola.agregar(nombre, programa(0, rafaga=3))
+    cola.ordenar()
+    assert cola == ["000", "001", "002"]
+
+
+def test_copia_de_cola_independiente():
+    cola = ColaFifo(["000", "001"])
+    copia = cola.copiar()
+    copia.quitar("000")
+    cola.agregar("002")
+    assert cola == ["000", "001", "002"]
+    assert copia == ["001"]
+
+
+def test_llegadas():
+    llegadas = Llegadas()
+    llegadas.agregar("001", programa(4))
+    llegadas.agregar("000", programa(2))
+    llegadas.agregar("002", programa(4))
+    assert llegadas.proximo() == 2
+    assert list(llegadas.llegados(3)) == ["000"]
+    assert list(llegadas.llegados(4)) == ["001", "002"]
+    assert llegadas.proximo() is None
@@ -0,0 +1,109 @@
+import io
+import pathlib
+import sys
+
+from chmaquina.consola import main
+from chmaquina.traza import INSTRUCCION, LectorDeTraza
+
+FACTORIAL = str(pathlib.Path(__file__).parent.parent / "ejemplos" / "factorial.ch")
+
+
+def test_correr_programas(capsys):
+    assert main(["-a", "FCFS", "--pantalla", "/dev/null", FACTORIAL, FACTORIAL]) == 0
+    salida = capsys.readouterr()
+    assert salida.out == "[000] 120.0\n[001] 120.0\n"
+    assert "instrucciones/s" in salida.err
+
+
+def test_salidas_a_archivos(tmp_path):
+    impresora = tmp_path / "impresora.txt"
+    pantalla = tmp_path / "pantalla.txt"
+    argumentos = ["--impresora", str(impresora), "--pantalla", str(pantalla)]
+    assert main(argumentos + [FACTORIAL]) == 0
+    assert impresora.read_text() == "[000] 120.0\n"
+    assert pantalla.read_text() == "[000] 120.0\n"
+
+
+def test_programa_invalido(tmp_path, capsys):
+    programa = tmp_path / "invalido.ch"
+    programa.write_text("no es un programa")
+    assert main([str(programa)]) == 1
+    assert "No se pudo cargar" in capsys.readouterr().err
+
+
+def test_no_importa_gtk():
+    assert "gi" not in sys.modules
+
+
+def test_misma_semilla_mismo_reloj(capsys):
+    relojes = []
+    for _ in range(2):
+        assert main(["--semilla", "7", "--pantalla", "/dev/null", FACTORIAL]) == 0
+        err = capsys.readouterr().err
+        relojes.append(err.split("reloj ")[1].split("\n")[0])
+    assert relojes[0] == relojes[1]
+
+
+def test_entrada_desde_archivo(tmp_path, capsys):
+    programa = tmp_path / "lector.ch"
+    programa.write_text("nueva dato I 0\nlea dato\nimprima dato\nretorne 0\n")
+    entrada = tmp_path / "entrada.txt"
+    entrada.write_text("5\n")
+    assert main(["--entrada", str(entrada), str(programa)]) == 0
+    assert capsys.readouterr().out == "[000] 5\n"
+    assert main(["--entrada", str(tmp_path / "no-existe"), str(programa)]) == 1
+
+
+def test_traza(tmp_path, capsys):
+    traza = tmp_path / "traza.bin"
+    assert main(["--traza", str(traza), "--pantalla", "/dev/null", FACTORIAL]) == 0
+    pasos = int(capsys.readouterr().err.split(" instrucciones")[0])
+    with LectorDeTraza(traza) as lector:
+        instrucciones = [r for r in lector if r.tipo == INSTRUCCION]
+        assert len(instrucciones) <= pasos
+        assert ("impresora", "120.0") in (e for r in lector for e in r.eventos)
+
+
+def test_instantanea_y_restaurar(tmp_path, capsys):
+    instantanea = tmp_path / "estado.chi"
+    argumentos = ["--semilla", "1", "--pantalla", "/dev/null"]
+    guardar = ["--instantanea", str(instantanea), "--cada", "5"]
+    assert main(argumentos + guardar + [FACTORIAL]) == 0
+    capsys.readouterr()
+    assert main(argumentos + ["--restaurar", str(instantanea), FACTORIAL]) == 0
+    assert capsys.readouterr().out == "[001] 120.0\n"
+    assert main(["--restaurar", str(tmp_path / "no-existe")]) == 1
+    assert "No se pudo restaurar" in capsys.readouterr().err
+
+
+def test_programa_que_no_es_utf8(tmp_path, capsys):
+    programa = tmp_path / "latin1.ch"
+    programa.write_bytes("// año\nretorne 0\n".encode("latin-1"))
+    assert main([str(programa)]) == 1
+    assert "No se pudo cargar" in capsys.readouterr().err
+
+
+def test_cierra_el_archivo_de_entrada(tmp_path, monkeypatch, capsys):
+    abiertos = []
+    original = open
+
+    def registrar(ruta, *argumentos, **opciones):
+        archivo = original(ruta, *argumentos, **opciones)
+        abiertos.append(archivo)
+        return archivo
+
+    monkeypatch.setattr("builtins.open", registrar)
+    programa = tmp_path / "lector.ch"
+    programa.write_text("nueva dato I 0\nlea dato\nimprima dato\nretorne 0\n")
+    entrada = tmp_path / "entrada.txt"
+    entrada.write_text("5\n")
+    assert main(["--entrada", str(entrada), str(programa)]) == 0
+    assert abiertos and all(archivo.closed for archivo in abiertos)
+
+
+def test_se_acaba_la_entrada_del_teclado(tmp_path, capsys, monkeypatch):
+    programa = tmp_path / "lea.ch"
+    programa.write_text("nueva dato C\nlea dato\nretorne 0\n")
+    monkeypatch.setattr(sys, "stdin", io.StringIO(""))
+    assert main([str(programa)]) == 1
+    assert "se acabó la entrada del teclado" in capsys.readouterr().err
@@ -0,0 +1,138 @@
+import asyncio
+import io
+
+import pytest
+
+from chmaquina.entrada import EntradaDeArchivo, EntradaEnCola, EntradaProgramada
+from chmaquina.latencia import LatenciaFija
+from chmaquina.maquina import Maquina
+
+LECTOR = "\n".join(["nueva dato I 0", "lea dato", "muestre dato", "retorne 0"])
+
+CALCULO = "\n".join(
+    [
+        "nueva n I 20",
+        "nueva uno I 1",
+        "cargue n",
+        "reste uno",
+        "almacene n",
+        "vayasi itere fin",
+        "etiqueta itere 3",
+        "etiqueta fin 8",
+        "muestre n",
+        "retorne 0",
+    ]
+)
+
+
+class TecladoFijo:
+    def lea(self):
+        return "7"
+
+
+def cargar(maquina, *programas):
+    estado = maquina.encender()
+    for programa in programas:
+        estado = maquina.cargar(estado, programa)
+    return estado
+
+
+def test_los_demas_programas_corren_mientras_uno_espera():
+    entrada = EntradaEnCola()
+    maquina = Maquina(1024, 128, algoritmo="RR", quantum=3, entrada=entrada)
+    estado = cargar(maquina, LECTOR, CALCULO)
+    for estado in maquina.iterar(estado, en_sitio=True):
+        if "001" in estado.terminados and not entrada.cerrada:
+            assert "000" in estado.bloqueados
+            entrada.poner("42")
+            entrada.cerrar()
+    assert estado.pantalla == [("001", "0.0"), ("000", "42")]
+    assert estado.leer(estado.variables["000"]["dato"]) == 42
+    assert not estado.bloqueados
+
+
+def test_la_entrada_se_solapa_con_la_cpu():
+    def reloj_final(**opciones):
+        maquina = Maquina(1024, 128, latencia=LatenciaFija(10), **opciones)
+        return maquina.correr(cargar(maquina, LECTOR, CALCULO)).reloj
+
+    sin_bloqueo = reloj_final(entrada=EntradaProgramada(["7"]))
+    assert sin_bloqueo < reloj_final(teclado=TecladoFijo())
+
+
+def test_lea_espera_la_latencia_del_dispositivo():
+    maquina = Maquina(
+        1024, 128, latencia=LatenciaFija(5), entrada=EntradaProgramada(["7"])
+    )
+    estado = cargar(maquina, LECTOR)
+    estado = maquina.correr(estado, pasos=2)
+    dato = estado.variables["000"]["dato"] - estado.programas["000"]["inicio"]
+    assert estado.bloqueados == {"000": (dato, 5)}
+    final = maquina.correr(estado)
+    assert final.pantalla == [("000", "7")]
+    assert final.metricas.tiempo_ocioso == 5
+    assert final.metricas.programa("000").tiempo_cpu == 5
+
+
+def test_paso_no_modifica_el_estado_bloqueado():
+    maquina = Maquina(1024, 128, latencia=LatenciaFija(0), entrada=EntradaEnCola())
+    estado = maquina.correr(cargar(maquina, LECTOR), pasos=2)
+    maquina.entrada.poner("3")
+    siguiente = maquina.paso(estado)
+    assert "000" in estado.bloqueados
+    assert not siguiente.bloqueados
+    assert siguiente.leer(siguiente.variables["000"]["dato"]) == 3
+
+
+def test_entrada_agotada():
+    maquina = Maquina(1024, 128, entrada=EntradaProgramada([]))
+    with pytest.raises(EOFError):
+        maquina.correr(cargar(maquina, LECTOR))
+
+
+def test_entrada_de_archivo():
+    entrada = EntradaDeArchivo(io.StringIO("1\n2\n"))
+    assert entrada.esperar(1)
+    entrada._hilo.join(1)
+    assert [entrada.tomar(), entrada.tomar(), entrada.tomar()] == ["1", "2", None]
+    assert not entrada.esperar()
+
+
+def test_alimentar_desde_asyncio():
+    entrada = EntradaEnCola()
+
+    async def alimentar():
+        lector = asyncio.StreamReader()
+        lector.feed_data(b"uno\r\ndos\n")
+        lector.feed_eof()
+        await entrada.alimentar(lector)
+
+    asyncio.run(alimentar())
+    assert entrada.cerrada
+    assert [entrada.tomar(), entrada.tomar()] == ["uno", "dos"]
+    with pytest.raises(ValueError):
+        entrada.poner("tres")
+
+
+def test_compactar_con_un_programa_bloqueado():
+    corto = "\n".join(["nueva uno I 1", "retorne 0"])
+    maquina = Maquina(
+        30,
+        9,
+        algoritmo="FCFS",
+        latencia=LatenciaFija(1),
+        liberar_al_terminar=True,
+        compactacion=True,
+        entrada=EntradaEnCola(),
+    )
+    estado = cargar(maquina, corto, LECTOR)
+    estado = maquina.correr(estado, pasos=5)
+    assert "001" in estado.bloqueados and "000" not in estado.programas
+    inicio = estado.programas["001"]["inicio"]
+    estado = maquina.cargar(estado, CALCULO)
+    assert estado.programas["001"]["inicio"] < inicio
+    maquina.entrada.poner("42")
+    maquina.entrada.cerrar()
+    final = maquina.correr(estado)
+    assert ("001", "42") in final.pantalla
+    assert ("002", "0.0") in final.pantalla
@@ -0,0 +1,231 @@
+import json
+
+import pytest
+
+from chmaquina import instantanea
+from chmaquina.entrada import EntradaEnCola
+from chmaquina.errores import InstantaneaInvalida
+from chmaquina.latencia import (
+    Grabadora,
+    LatenciaAleatoria,
+    LatenciaFija,
+    LatenciaPorDispositivo,
+)
+from chmaquina.maquina import Maquina
+from chmaquina.paginacion import Paginacion
+from chmaquina.planificadores import Prioridad
+
+CALCULO = "\n".join(
+    [
+        "nueva n I 30",
+        "nueva uno I 1",
+        "nueva texto C hola",
+        "cargue n",
+        "reste uno",
+        "almacene n",
+        "muestre n",
+        "vayasi itere fin",
+        "etiqueta itere 4",
+        "etiqueta fin 10",
+        "imprima texto",
+        "retorne 0",
+    ]
+)
+
+
+def crear_maquina(**opciones):
+    latencia = LatenciaAleatoria(semilla=3)
+    return Maquina(4096, 128, algoritmo="RR", quantum=3, latencia=latencia, **opciones)
+
+
+def cargar(maquina, cuantos=3):
+    estado = maquina.encender()
+    for _ in range(cuantos):
+        estado = maquina.cargar(estado, CALCULO)
+    return estado
+
+
+def assert_iguales(a, b):
+    assert a.memoria == b.memoria
+    assert a.reloj == b.reloj
+    assert a.pantalla == b.pantalla
+    assert a.impresora == b.impresora
+    assert a.variables == b.variables
+    assert a.programas == b.programas
+    assert sorted(a.terminados) == sorted(b.terminados)
+    assert a.metricas.resumen(a.reloj) == b.metricas.resumen(b.reloj)
+
+
+def test_retomar_da_la_misma_corrida(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    maquina = crear_maquina()
+    mitad = maquina.correr(cargar(maquina), pasos=100)
+    maquina.guardar(mitad, ruta)
+    esperado = maquina.correr(mitad)
+
+    otra = crear_maquina()
+    restaurado = otra.restaurar(ruta)
+    assert_iguales(restaurado, mitad)
+    assert list(restaurado.listos) == list(mitad.listos)
+    assert_iguales(otra.correr(restaurado), esperado)
+
+
+def test_bifurcar(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    maquina = crear_maquina()
+    estado = maquina.correr(cargar(maquina), pasos=50)
+    maquina.guardar(estado, ruta)
+
+    a = instantanea.cargar(ruta)
+    b = instantanea.cargar(ruta)
+    posicion = a.variables["000"]["n"]
+    a.escribir(posicion, 99)
+    copia = a.copiar()
+    copia.escribir(posicion, 7)
+    assert b.leer(posicion) == estado.leer(posicion)
+    assert a.leer(posicion) == 99
+    assert copia.leer(posicion) == 7
+
+
+def test_paginas_se_leen_al_usarse(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    maquina = Maquina(1 << 16, 128, latencia=LatenciaAleatoria(semilla=1))
+    maquina.guardar(cargar(maquina, 1), ruta)
+    restaurado = maquina.restaurar(ruta)
+    distintas = {id(pagina): pagina for pagina in restaurado.memoria._paginas}
+    # Todas las páginas vacías se guardan como una sola
+    assert len(distintas) == 2
+    assert not any("valores" in vars(pagina) for pagina in distintas.values())
+    assert restaurado.leer(restaurado.variables["000"]["texto"]) == "hola"
+    assert sum("valores" in vars(pagina) for pagina in distintas.values()) == 1
+
+
+def test_memoria_virtual(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    maquina = crear_maquina(paginacion=Paginacion(4, "LRU"))
+    mitad = maquina.correr(cargar(maquina), pasos=80)
+    maquina.guardar(mitad, ruta)
+    esperado = maquina.correr(mitad)
+
+    otra = crear_maquina(paginacion=Paginacion(2, "FIFO"))
+    restaurado = otra.restaurar(ruta)
+    assert restaurado.memoria.estadisticas.fallos == 0
+    assert restaurado.memoria == mitad.memoria
+    assert_iguales(otra.correr(restaurado), esperado)
+
+
+def test_programas_bloqueados(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    lector = "\n".join(["nueva dato I 0", "lea dato", "muestre dato", "retorne 0"])
+    maquina = crear_maquina(entrada=EntradaEnCola())
+    estado = maquina.correr(maquina.cargar(maquina.encender(), lector), pasos=2)
+    assert estado.bloqueados
+    maquina.guardar(estado, ruta)
+
+    otra = crear_maquina(entrada=EntradaEnCola(["5"]))
+    final = otra.correr(otra.restaurar(ruta))
+    assert final.pantalla == [("000", "5")]
+
+
+def test_archivo_invalido(tmp_path):
+    ruta = tmp_path / "otro.chi"
+    for contenido in (b"", b"no es una instantanea", b"CHESTADO\x01" + b"\xff" * 20):
+        ruta.write_bytes(contenido)
+        with pytest.raises(InstantaneaInvalida):
+            instantanea.cargar(ruta)
+
+
+def test_instantanea_incompleta(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    maquina = crear_maquina()
+    maquina.guardar(maquina.correr(cargar(maquina), pasos=20), ruta)
+    contenido = ruta.read_bytes()
+    ruta.write_bytes(contenido[:-200])
+    with pytest.raises(InstantaneaInvalida):
+        instantanea.cargar(ruta)
+
+
+def test_pagina_danada(tmp_path):
+    ruta = tmp_path / "estado.chi"
+    maquina = crear_maquina()
+    maquina.guardar(cargar(maquina, 1), ruta)
+    contenido = bytearray(ruta.read_bytes())
+    # Daña los valores de la última página sin cambiar el tamaño del archivo
+    contenido[-20:] = b"\xff" * 20
+    ruta.write_bytes(bytes(contenido))
+    estado = instantanea.cargar(ruta)
+    with pytest.raises(InstantaneaInvalida):
+        list(estado.memoria)
+
+
+def test_prioridad_latencias_y_numeros_escritos(tmp_path):
+    ruta = tmp_path / "estado.chi"
+
+    def crear():
+        latencia = LatenciaPorDispositivo(
+            {"muestre": LatenciaAleatoria(semilla=5)}, LatenciaFija(2)
+        )
+        return Maquina(
+            4096,
+            128,
+            algoritmo=Prioridad({"001": 0, "000": 1}),
+            latencia=Grabadora(latencia),
+        )
+
+    maquina = crear()
+    estado = cargar(maquina)
+    estado = maquina.cargar(estado, "nueva codigo I 007\nmuestre codigo\nretorne 0")
+    mitad = maquina.correr(estado, pasos=40)
+    maquina.guardar(mitad, ruta)
+    esperado = maquina.correr(mitad)
+
+    otra = crear()
+    restaurado = otra.restaurar(ruta)
+    assert_iguales(restaurado, mitad)
+    final = otra.correr(restaurado)
+    assert_iguales(final, esperado)
+    assert ("003", "007") in final.pantalla
+    assert otra.latencia.duraciones == maquina.latencia.duraciones
+
+
+def cambiar_metadatos(ruta, cambiar):
+    """Reescribe los metadatos JSON de una instantánea con `cambiar`"""
+    contenido = ruta.read_bytes()
+    magia, version, longitud = instantanea._CABECERA.unpack_from(contenido)
+    inicio = instantanea._CABECERA.size
+    metadatos = json.loads(contenido[inicio : inicio + longitud])
+    cambiar(metadatos)
+    nuevos = json.dumps(metadatos).encode()
+    ruta.write_bytes(
+        instantanea._CABECERA.pack(magia, version, len(nuevos))
+        + nuevos
+        + contenido[inicio + longitud :]
+    )
+
+
+@pytest.mark.parametrize(
+    "cambiar",
+    [
+        # Una clase que no es de la máquina
+        lambda m: m["campos"].update(reloj={"objeto": ["Popen", {}]}),
+        # Una etiqueta desconocida
+        lambda m: m.update(latencia={"pickle": "cos\nsystem\n"}),
+        # Un campo del estado con otro tipo
+        lambda m: m["campos"].update(reloj="tarde"),
+        # Un objeto con atributos de más
+        lambda m: m["campos"]["llegadas"]["objeto"][1].update(extra=1),
+        # Un campo de más
+        lambda m: m["campos"].update(extra=1),
+        # Una latencia que no es un modelo de latencia
+        lambda m: m.update(latencia=[1, 2]),
+        # Una página que no existe
+        lambda m: m["paginas"].__setitem__(0, 99),
+    ],
+)
+def test_metadatos_invalidos(tmp_path, cambiar):
+    ruta = tmp_path / "estado.chi"
+    maquina = crear_maquina()
+    maquina.guardar(maquina.correr(cargar(maquina), pasos=20), ruta)
+    cambiar_metadatos(ruta, cambiar)
+    with pytest.raises(InstantaneaInvalida):
+        instantanea.cargar(ruta)
@@ -1,11 +1,26 @@
+import asyncio
+import math
+import pickle
+
 import pytest
 
+from chmaquina.entrada import EntradaEnCola
+from chmaquina.instrucciones import Operacion, decodificar_programa
+from chmaquina.latencia import (
+    Grabadora,
+    LatenciaAleatoria,
+    LatenciaFija,
+    LatenciaGrabada,
+    LatenciaPorDispositivo,
+)
 from chmaquina.maquina import (
     Maquina,
     ChProgramaInvalido,
     ErrorDeEjecucion,
     SinMemoriaSuficiente,
 )
+from chmaquina.sintaxis import CacheDeVerificacion, verificar
+from chmaquina.tipos import formatear
 
 
 class TecladoFalso:
@@ -61,7 +76,8 @@ def test_encender(maquina):
 def test_paso_sin_programa(maquina):
     estado = maquina.encender()
     siguiente = maquina.paso(estado)
-    assert estado == siguiente
+    assert siguiente is not estado
+    assert siguiente.reloj == estado.reloj + 1
 
 
 def test_cargar_programa(maquina):
@@ -391,8 +407,8 @@ def test_incremento_de_tiempo_al_correr(maquina, monkeypatch):
     assert estado.reloj == 1
 
 
-def test_incremento_operacion_io(maquina, monkeypatch):
-    monkeypatch.setattr("random.randint", lambda x, y: 3)
+def test_incremento_operacion_io():
+    maquina = Maquina(1024, 128, teclado=TecladoFalso(), latencia=LatenciaFija(3))
     programa = ["nueva variable I 3", "lea variable"]
     estado = maquina.encender()
     estado = maquina.cargar(estado, "\n".join(programa))
@@ -550,4 +566,424 @@ def test_correr_obedece_al_algoritmo():
     estado = maquina.planear(estado)
     estado = maquina.correr(estado, pasos=2)
     assert estado.reloj == 4
-    assert estado.programas['002']['contador'] == 2
\ No newline at end of file
+    assert estado.programas['002']['contador'] == 2
+
+
+def test_paso_no_modifica_el_estado_anterior(maquina, factorial):
+    estado = maquina.encender()
+    estado = maquina.cargar(estado, factorial)
+    anterior = maquina.correr(estado, pasos=6)
+    memoria = list(anterior.memoria)
+    programas = {n: dict(p) for n, p in anterior.programas.items()}
+    nuevo = maquina.correr(anterior, pasos=5)
+    assert list(anterior.memoria) == memoria
+    assert anterior.programas == programas
+    assert nuevo.programas["000"]["contador"] != programas["000"]["contador"]
+
+
+def test_copiar_comparte_la_memoria_no_modificada(maquina, factorial):
+    estado = maquina.cargar(maquina.encender(), factorial)
+    siguiente = maquina.paso(maquina.paso(estado))
+    paginas_compartidas = sum(
+        a is b for a, b in zip(estado.memoria._paginas, siguiente.memoria._paginas)
+    )
+    assert paginas_compartidas >= len(estado.memoria._paginas) - 1
+
+
+@pytest.mark.parametrize("algoritmo,quantum", [("FCFS", None), ("RR", 5), ("SJF", 3)])
+def test_correr_en_sitio_igual_al_inmutable(algoritmo, quantum, factorial):
+    maquina = Maquina(
+        tamano_memoria=1024,
+        tamano_kernel=128,
+        teclado=TecladoFalso(),
+        quantum=quantum,
+        algoritmo=algoritmo,
+        latencia=LatenciaAleatoria(semilla=42),
+    )
+    estado = maquina.encender()
+    for _ in range(3):
+        estado = maquina.cargar(estado, factorial)
+    inmutable = maquina.correr(estado)
+    maquina.latencia.reiniciar()
+    en_sitio = maquina.correr(estado, en_sitio=True)
+    assert list(en_sitio.memoria) == list(inmutable.memoria)
+    assert en_sitio.impresora == inmutable.impresora
+    assert en_sitio.pantalla == inmutable.pantalla
+    assert en_sitio.reloj == inmutable.reloj
+    assert en_sitio.terminados == inmutable.terminados
+
+
+def test_correr_en_sitio_no_modifica_el_estado_inicial(maquina, factorial):
+    estado = maquina.cargar(maquina.encender(), factorial)
+    memoria = list(estado.memoria)
+    maquina.correr(estado, en_sitio=True)
+    assert list(estado.memoria) == memoria
+    assert estado.programas["000"]["contador"] == 0
+    assert estado.listos == ["000"]
+
+
+def test_instantaneas(factorial):
+    maquina = Maquina(1024, 128, latencia=LatenciaAleatoria(semilla=7))
+    estado = maquina.cargar(maquina.encender(), factorial)
+    pasos = list(maquina.iterar(estado))
+    maquina.latencia.reiniciar()
+    instantaneas = list(maquina.instantaneas(estado, cada=10))
+    assert len(instantaneas) == math.ceil(len(pasos) / 10)
+    assert instantaneas[0].reloj == pasos[9].reloj
+    assert instantaneas[-1].impresora == pasos[-1].impresora
+    assert instantaneas[-1].reloj == pasos[-1].reloj
+
+
+def test_decodificar_una_instruccion_desconocida():
+    with pytest.raises(ChProgramaInvalido):
+        decodificar_programa(["nueva a I 3", "ret"], {"a": {}}, {})
+
+
+def test_cargar_decodifica_el_codigo(maquina):
+    instrucciones = [
+        "nueva a I 3",
+        "// comentario",
+        "cargue a",
+        "vaya fin",
+        "etiqueta fin 6",
+        "retorne 0",
+    ]
+    estado = maquina.cargar(maquina.encender(), "\n".join(instrucciones))
+    codigo = estado.codigo["000"]
+    assert [instruccion.operacion for instruccion in codigo] == [
+        Operacion.NUEVA,
+        Operacion.NADA,
+        Operacion.CARGUE,
+        Operacion.VAYA,
+        Operacion.ETIQUETA,
+        Operacion.RETORNE,
+    ]
+    # la variable y el acumulador quedan justo después del código
+    assert codigo[2].argumentos == (6, 7)
+    assert codigo[3].argumentos == (5,)
+    # la memoria conserva el texto original
+    assert estado.memoria[estado.programas["000"]["inicio"] + 2]["valor"] == "cargue a"
+
+
+def test_variables_con_valores_nativos(maquina):
+    instrucciones = [
+        "nueva entero I 5",
+        "nueva real R 2.5",
+        "nueva logico L 1",
+        "nueva cadena C hola",
+        "cargue entero",
+        "sume real",
+        "retorne 0",
+    ]
+    estado = maquina.cargar(maquina.encender(), "\n".join(instrucciones))
+    valores = [estado.leer(p) for p in list(estado.variables["000"].values())[:4]]
+    assert valores == [5, 2.5, True, "hola"]
+    nuevo = maquina.correr(estado, pasos=6)
+    assert nuevo.leer(nuevo.variables["000"]["acumulador"]) == 7.5
+    assert nuevo.acumulador("000") == "7.5"
+    assert nuevo.buscar_variable("000", "logico")["valor"] == "1"
+
+
+def test_los_numeros_se_muestran_como_se_escribieron(maquina):
+    instrucciones = [
+        "nueva real R 3",
+        "nueva codigo I 007",
+        "nueva suma R",
+        "imprima real",
+        "muestre codigo",
+        "cargue real",
+        "sume codigo",
+        "almacene suma",
+        "imprima suma",
+        "retorne 0",
+    ]
+    estado = maquina.cargar(maquina.encender(), "\n".join(instrucciones))
+    assert estado.leer(estado.variables["000"]["codigo"]) == 7
+    nuevo = maquina.correr(estado)
+    assert nuevo.impresora == [("000", "3"), ("000", "10.0")]
+    assert nuevo.pantalla == [("000", "007")]
+    copia = pickle.loads(pickle.dumps(estado.leer(estado.variables["000"]["real"])))
+    assert copia == 3.0 and formatear(copia) == "3"
+
+
+def test_metricas_de_un_programa(maquina, factorial):
+    estado = maquina.cargar(maquina.encender(), factorial)
+    estado = maquina.correr(estado)
+    resumen = estado.metricas.programa("000")
+    assert resumen.respuesta == 0
+    assert resumen.retorno == estado.reloj
+    assert resumen.espera == 0
+    total = estado.metricas.resumen(estado.reloj)
+    assert total.terminados == 1
+    assert total.tiempo_ocioso == 0
+    assert total.utilizacion == 1
+
+
+def test_metricas_espera_en_fcfs(maquina, factorial):
+    estado = maquina.encender()
+    estado = maquina.cargar(estado, factorial)
+    estado = maquina.cargar(estado, factorial)
+    estado = maquina.correr(estado)
+    primero = estado.metricas.programa("000")
+    segundo = estado.metricas.programa("001")
+    assert segundo.llegada == 5
+    assert segundo.respuesta == primero.retorno - segundo.llegada
+    assert segundo.espera == segundo.respuesta
+
+
+def test_cpu_ociosa_hasta_que_llega_un_programa(maquina):
+    instantaneo = "\n".join(["nueva variable I 1"] * 39 + ["retorne 0"])
+    estado = maquina.encender()
+    estado = maquina.cargar(estado, instantaneo)
+    estado = maquina.cargar(estado, "nueva variable I 1\nretorne 0")
+    assert not estado.nada_por_hacer()
+    estado = maquina.correr(estado)
+    assert set(estado.terminados) == {"000", "001"}
+    assert estado.metricas.tiempo_ocioso == 10
+    assert estado.metricas.resumen(estado.reloj).utilizacion == 0
+
+
+def test_un_paso_ocioso_no_cambia_el_estado_dado(maquina):
+    instantaneo = "\n".join(["nueva variable I 1"] * 39 + ["retorne 0"])
+    estado = maquina.cargar(maquina.encender(), instantaneo)
+    estado = maquina.cargar(estado, "nueva variable I 1\nretorne 0")
+    vistos = []
+    for paso in maquina.iterar(estado):
+        vistos.append((paso, paso.reloj, paso.metricas.tiempo_ocioso))
+    assert vistos[-1][2] == 10
+    assert all(
+        paso.reloj == reloj and paso.metricas.tiempo_ocioso == ocio
+        for paso, reloj, ocio in vistos
+    )
+
+
+def test_misma_semilla_mismo_reloj(factorial):
+    relojes = []
+    for _ in range(2):
+        maquina = Maquina(1024, 128, latencia=LatenciaAleatoria(semilla=3))
+        estado = maquina.cargar(maquina.encender(), factorial)
+        relojes.append(maquina.correr(estado).reloj)
+    assert relojes[0] == relojes[1]
+
+
+def test_latencia_por_dispositivo():
+    latencia = LatenciaPorDispositivo(
+        {"imprima": LatenciaFija(7)}, por_defecto=LatenciaFija(1)
+    )
+    maquina = Maquina(1024, 128, latencia=latencia)
+    programa = "nueva a I 1\ncargue a\nimprima a\nretorne 0"
+    estado = maquina.correr(maquina.cargar(maquina.encender(), programa))
+    assert estado.reloj == 8
+
+
+def test_repetir_latencias_grabadas(factorial):
+    grabadora = Grabadora(LatenciaAleatoria())
+    maquina = Maquina(1024, 128, latencia=grabadora)
+    estado = maquina.cargar(maquina.encender(), factorial)
+    original = maquina.correr(estado)
+    maquina.latencia = LatenciaGrabada(grabadora.duraciones)
+    assert maquina.correr(estado).reloj == original.reloj
+
+
+def test_cargar_usa_la_cache(maquina):
+    cache = CacheDeVerificacion()
+    maquina.cache = cache
+    estado = maquina.encender()
+    for _ in range(3):
+        estado = maquina.cargar(estado, "nueva a I 1\nretorne 0")
+    assert (cache.aciertos, cache.fallos) == (2, 1)
+    assert len(estado.programas) == 3
+
+
+def test_cargar_flujo_igual_que_cargar(maquina, factorial):
+    estado = maquina.encender()
+    cargado = maquina.cargar(estado, factorial)
+    en_flujo = maquina.cargar_flujo(estado, iter(factorial.splitlines(True)))
+    verificar_estados_iguales(cargado, en_flujo)
+    assert cargado.codigo == en_flujo.codigo
+
+
+def test_cargar_flujo_sin_memoria_suficiente():
+    maquina = Maquina(tamano_memoria=20, tamano_kernel=10)
+    lineas = ("retorne 0\n" for _ in range(100))
+    with pytest.raises(SinMemoriaSuficiente):
+        maquina.cargar_flujo(maquina.encender(), lineas)
+
+
+def test_cargar_flujo_programa_invalido(maquina):
+    with pytest.raises(ChProgramaInvalido):
+        maquina.cargar_flujo(maquina.encender(), ["nueva a I hola\n"])
+
+
+def test_cargar_lote_igual_que_cargar_uno_por_uno(maquina, factorial):
+    programas = [factorial, verificar(factorial), factorial]
+    estado = maquina.encender()
+    uno_por_uno = estado
+    for programa in programas:
+        uno_por_uno = maquina.cargar(uno_por_uno, programa)
+    en_lote = maquina.cargar_lote(estado, programas)
+    verificar_estados_iguales(uno_por_uno, en_lote)
+    assert list(en_lote.programas) == ["000", "001", "002"]
+    assert uno_por_uno.codigo == en_lote.codigo
+    assert list(uno_por_uno.llegadas) == list(en_lote.llegadas)
+
+
+def test_cargar_lote_en_paralelo(maquina, factorial):
+    estado = maquina.encender()
+    en_serie = maquina.cargar_lote(estado, [factorial] * 3)
+    en_paralelo = maquina.cargar_lote(estado, [factorial] * 3, procesos=2)
+    verificar_estados_iguales(en_serie, en_paralelo)
+
+
+def test_cargar_lote_sin_memoria_no_carga_ninguno(factorial):
+    maquina = Maquina(tamano_memoria=100, tamano_kernel=10)
+    estado = maquina.encender()
+    with pytest.raises(SinMemoriaSuficiente):
+        maquina.cargar_lote(estado, [factorial] * 10)
+    assert not estado.programas
+    assert estado.pivote == 11
+
+
+@pytest.mark.parametrize("procesos", [None, 2])
+def test_cargar_lote_programa_invalido(maquina, factorial, procesos):
+    with pytest.raises(ChProgramaInvalido):
+        maquina.cargar_lote(maquina.encender(), [factorial, "basura"], procesos)
+
+
+def test_liberar_memoria_al_terminar():
+    maquina = Maquina(
+        tamano_memoria=40, tamano_kernel=9, liberar_al_terminar=True, quantum=None
+    )
+    estado = maquina.encender()
+    estado = maquina.cargar(estado, "nueva a I 1\nretorne 0")
+    estado = maquina.correr(estado)
+    assert "000" in estado.terminados
+    assert "000" not in estado.variables
+    assert "000" not in estado.etiquetas
+    assert "000" not in estado.codigo
+    assert all(not estado.memoria[posicion] for posicion in range(10, 40))
+    assert list(estado.libres) == [(10, 30)]
+
+
+def test_sin_liberar_la_memoria_se_agota():
+    programa = "nueva a I 1\nretorne 0"
+    for liberar in (False, True):
+        maquina = Maquina(
+            tamano_memoria=14, tamano_kernel=9, liberar_al_terminar=liberar
+        )
+        estado = maquina.correr(maquina.cargar(maquina.encender(), programa))
+        if liberar:
+            assert maquina.cargar(estado, programa).programas["001"]["inicio"] == 10
+        else:
+            with pytest.raises(SinMemoriaSuficiente):
+                maquina.cargar(estado, programa)
+
+
+def test_compactar_reubica_programas(maquina, factorial):
+    estado = maquina.encender()
+    for programa in ["nueva a I 1\nretorne 0", factorial, "nueva b I 2\nretorne 0"]:
+        estado = maquina.cargar(estado, programa)
+    estado.terminados["000"] = estado.programas.pop("000")
+    estado.listos.quitar("000")
+    estado.liberar("000")
+
+    compactado = maquina.compactar(estado)
+    inicio = maquina.tamano_kernel + 1
+    assert compactado.programas["001"]["inicio"] == inicio
+    datos = compactado.programas["001"]["datos"]
+    assert compactado.variables["001"]["unidad"] == datos
+    assert compactado.memoria[datos]["nombre"] == "unidad"
+    assert compactado.programas["002"]["inicio"] == compactado.programas["001"]["final"]
+    assert len(compactado.libres) == 1
+    # El estado original no cambia
+    assert estado.programas["001"]["inicio"] == inicio + 4
+
+    final = maquina.correr(compactado)
+    assert final.impresora == [("001", "120.0")]
+
+
+def test_compactar_olvida_los_programas_terminados(maquina, factorial):
+    estado = maquina.encender()
+    for programa in [factorial, "nueva b I 2\nretorne 0"]:
+        estado = maquina.cargar(estado, programa)
+    estado.terminados["000"] = estado.programas.pop("000")
+    estado.listos.quitar("000")
+
+    compactado = maquina.compactar(estado)
+    for tabla in ("variables", "etiquetas", "codigo"):
+        assert "000" not in getattr(compactado, tabla)
+        assert "001" in getattr(compactado, tabla)
+    assert compactado.programas["001"]["inicio"] == maquina.tamano_kernel + 1
+
+
+def test_compactar_cuando_no_hay_hueco():
+    maquina = Maquina(tamano_memoria=22, tamano_kernel=9, compactacion=True)
+    estado = maquina.encender()
+    for _ in range(3):
+        estado = maquina.cargar(estado, "nueva a I 1\nretorne 0")
+    estado.reloj = 10
+    estado.admitir_llegadas()
+    # Terminan el primero y el último: quedan dos huecos de 4 celdas
+    for nombre in ("000", "002"):
+        estado.listos.quitar(nombre)
+        estado.terminados[nombre] = estado.programas.pop(nombre)
+        estado.liberar(nombre)
+    assert list(estado.libres) == [(10, 4), (18, 4)]
+
+    nuevo = maquina.cargar(estado, "nueva a I 1\nnueva b I 2\nnueva c I 3\nretorne 0")
+    assert nuevo.programas["001"]["inicio"] == 10
+    assert nuevo.programas["003"]["inicio"] == 14
+
+    maquina.compactacion = False
+    with pytest.raises(SinMemoriaSuficiente):
+        maquina.cargar(estado, "nueva a I 1\nnueva b I 2\nnueva c I 3\nretorne 0")
+
+
+def test_aiterar_igual_que_iterar(factorial):
+    maquina = Maquina(1024, 128, teclado=TecladoFalso(), latencia=LatenciaFija(2))
+    estado = maquina.cargar(maquina.encender(), factorial)
+
+    async def relojes():
+        return [e.reloj async for e in maquina.aiterar(estado, cada=3)]
+
+    assert asyncio.run(relojes()) == [e.reloj for e in maquina.iterar(estado)]
+
+
+def test_aiterar_espera_la_entrada():
+    entrada = EntradaEnCola()
+    maquina = Maquina(1024, 128, latencia=LatenciaFija(1), entrada=entrada)
+    programa = ["nueva dato C", "lea dato", "muestre dato", "retorne 0"]
+    estado = maquina.cargar(maquina.encender(), "\n".join(programa))
+
+    async def correr():
+        asyncio.get_running_loop().call_later(0.01, entrada.poner, "hola")
+        async for final in maquina.aiterar(estado, en_sitio=True):
+            pass
+        return final
+
+    assert asyncio.run(correr()).pantalla == [("000", "hola")]
+
+
+def test_cambios_de_un_paso(maquina, factorial):
+    estado = maquina.cargar(maquina.encender(), factorial)
+    cambios = estado.cambios_desde(maquina.encender())
+    assert cambios.completo
+    cargado = maquina.cargar(estado, factorial)
+    cambios = cargado.cambios_desde(estado)
+    programa = cargado.programas["001"]
+    assert cambios.celdas == list(range(programa["inicio"], programa["final"]))
+    assert cambios.programas == cambios.variables == cambios.etiquetas == {"001"}
+
+    estado = maquina.correr(estado, pasos=4)
+    siguiente = maquina.paso(estado)
+    cambios = siguiente.cambios_desde(estado)
+    assert cambios.celdas == [estado.variables["000"]["acumulador"]]
+    assert cambios.programas == {"000"}
+    assert not cambios.variables and not cambios.impresora and not cambios.completo
+
+    anterior = estado
+    for estado in maquina.iterar(estado):
+        if estado.pantalla:
+            break
+        anterior = estado
+    assert estado.cambios_desde(anterior).pantalla == [("000", "120.0")]
@@ -0,0 +1,72 @@
+import pytest
+
+from chmaquina.memoria import Memoria
+
+
+def celda(valor):
+    return {"nombre": "x", "programa": "000", "tipo": "I", "valor": valor}
+
+
+def test_memoria_nueva_vacia():
+    memoria = Memoria(10, tamano_pagina=4)
+    assert len(memoria) == 10
+    assert list(memoria) == [{}] * 10
+
+
+def test_escribir_y_leer_celda():
+    memoria = Memoria(10, tamano_pagina=4)
+    memoria[5] = celda(3)
+    assert memoria[5] == celda(3)
+    assert memoria.valor(5) == 3
+    assert memoria.tipo(5) == "I"
+    assert memoria.programa(5) == "000"
+    assert memoria[4] == {}
+
+
+def test_asignar_valor_conserva_la_celda():
+    memoria = Memoria(10, tamano_pagina=4)
+    memoria[5] = celda(3)
+    memoria.asignar_valor(5, None)
+    assert memoria[5] == celda(None)
+
+
+def test_copia_no_afecta_al_original():
+    memoria = Memoria(10, tamano_pagina=4)
+    memoria[1] = celda(1)
+    copia = memoria.copiar()
+    copia[1] = celda(2)
+    memoria.asignar_valor(9, 7)
+    assert memoria[1] == celda(1)
+    assert copia[1] == celda(2)
+    assert copia.valor(9) is None
+    # las paginas no modificadas se comparten
+    assert memoria._paginas[1] is copia._paginas[1]
+
+
+def test_comparar_memorias():
+    memoria = Memoria(10, tamano_pagina=4)
+    memoria[1] = celda(1)
+    assert memoria == memoria.copiar()
+    assert memoria == list(memoria)
+    otra = Memoria(10, tamano_pagina=4)
+    assert memoria != otra
+    otra[1] = celda(1)
+    assert memoria == otra
+
+
+def test_posicion_fuera_de_rango():
+    memoria = Memoria(10, tamano_pagina=4)
+    with pytest.raises(IndexError):
+        memoria[10]
+
+
+def test_diferencias_con_una_copia():
+    memoria = Memoria(10, tamano_pagina=4)
+    memoria[1] = celda(1)
+    copia = memoria.copiar()
+    assert copia.diferencias(memoria) == []
+    copia[9] = celda(2)
+    copia.asignar_valor(1, "otro")
+    copia[2] = {}
+    assert copia.diferencias(memoria) == [1, 9]
+    assert Memoria(10, tamano_pagina=4).diferencias(memoria) is None
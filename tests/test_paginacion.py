@@ -0,0 +1,147 @@
+import pathlib
+import random
+
+import pytest
+
+from chmaquina.latencia import LatenciaFija
+from chmaquina.maquina import Maquina
+from chmaquina.memoria import Memoria
+from chmaquina.paginacion import (
+    AlmacenEnArchivo,
+    MemoriaVirtual,
+    Paginacion,
+    ReemplazoFifo,
+    ReemplazoLru,
+    ReemplazoReloj,
+)
+
+FACTORIAL = pathlib.Path(__file__).parent.parent / "ejemplos" / "factorial.ch"
+
+
+@pytest.mark.parametrize("reemplazo", ["FIFO", "LRU", "RELOJ"])
+@pytest.mark.parametrize("almacen", [None, AlmacenEnArchivo])
+def test_igual_que_la_memoria_plana(reemplazo, almacen):
+    plana = Memoria(100, tamano_pagina=8)
+    virtual = MemoriaVirtual(
+        100, 3, reemplazo, almacen and almacen(), tamano_pagina=8
+    )
+    aleatorio = random.Random(0)
+    for _ in range(500):
+        posicion = aleatorio.randrange(100)
+        if aleatorio.random() < 0.5:
+            dato = {"nombre": "x", "programa": "000", "valor": aleatorio.random()}
+            plana[posicion] = dato
+            virtual[posicion] = dato
+        else:
+            assert virtual[posicion] == plana[posicion]
+            assert virtual.valor(posicion) == plana.valor(posicion)
+    assert list(virtual) == list(plana)
+    assert virtual._paginas.cargadas <= 3
+    assert virtual.estadisticas.fallos > 0
+
+
+def test_copias_independientes():
+    memoria = MemoriaVirtual(64, 2, tamano_pagina=8)
+    for posicion in range(0, 64, 8):
+        memoria[posicion] = {"valor": posicion}
+    copia = memoria.copiar()
+    copia[0] = {"valor": "cambiado"}
+    for posicion in range(0, 64, 8):
+        copia[posicion + 1] = {"valor": "otro"}
+    assert memoria.valor(0) == 0
+    assert memoria.valor(1) is None
+    assert copia.valor(0) == "cambiado"
+    assert [copia.valor(p) for p in range(8, 64, 8)] == list(range(8, 64, 8))
+
+
+def test_leer_paginas_sin_escribir_no_ocupa_marcos():
+    memoria = MemoriaVirtual(64, 1, tamano_pagina=8)
+    assert all(memoria[posicion] == {} for posicion in range(64))
+    assert memoria.estadisticas.fallos == 0
+    assert memoria._paginas.cargadas == 0
+
+
+@pytest.mark.parametrize(
+    "politica, victimas",
+    [
+        (ReemplazoFifo, [1, 2]),
+        (ReemplazoLru, [2, 3]),
+        (ReemplazoReloj, [1, 2]),
+    ],
+)
+def test_victimas(politica, victimas):
+    reemplazo = politica()
+    for pagina in (1, 2, 3):
+        reemplazo.cargada(pagina)
+    reemplazo.usada(1)
+    escogidas = [reemplazo.victima()]
+    reemplazo.cargada(4)
+    escogidas.append(reemplazo.victima())
+    assert escogidas == victimas
+
+
+def test_correr_con_memoria_virtual():
+    programa = FACTORIAL.read_text()
+    resultados = []
+    for paginacion in (None, Paginacion(marcos=2, tamano_pagina=8)):
+        maquina = Maquina(
+            tamano_memoria=512,
+            tamano_kernel=79,
+            latencia=LatenciaFija(1),
+            paginacion=paginacion,
+        )
+        estado = maquina.encender()
+        for _ in range(3):
+            estado = maquina.cargar(estado, programa)
+        estado = maquina.correr(estado, en_sitio=True)
+        resultados.append(estado)
+    plana, virtual = resultados
+    assert virtual.impresora == plana.impresora
+    assert virtual.reloj == plana.reloj
+    assert list(virtual.memoria) == list(plana.memoria)
+    assert virtual.memoria.estadisticas.reemplazos > 0
+
+
+def test_reemplazo_desconocido():
+    with pytest.raises(ValueError):
+        MemoriaVirtual(64, 2, "aleatorio")
+
+
+def test_diferencias_sin_cargar_paginas():
+    memoria = MemoriaVirtual(64, 1, tamano_pagina=8)
+    for posicion in (3, 20, 40):
+        memoria[posicion] = {"valor": posicion}
+    copia = memoria.copiar()
+    copia.asignar_valor(20, "otro")
+    fallos = copia.estadisticas.fallos
+    assert copia.diferencias(memoria) == [20]
+    assert copia.estadisticas.fallos == fallos
+
+
+@pytest.mark.parametrize("almacen", [None, AlmacenEnArchivo])
+def test_el_almacen_reutiliza_los_bloques_propios(almacen):
+    memoria = MemoriaVirtual(64, 2, "FIFO", almacen and almacen(), tamano_pagina=8)
+    for vuelta in range(200):
+        for posicion in range(0, 64, 8):
+            memoria.asignar_valor(posicion, vuelta)
+    assert [memoria.valor(p) for p in range(0, 64, 8)] == [199] * 8
+    assert memoria.estadisticas.escrituras > 1000
+    almacen = memoria._paginas.almacen
+    if almacen.__class__ is AlmacenEnArchivo:
+        # Cada página ocupa un bloque, más los huecos que dejan las que crecen
+        guardadas = [e for e in memoria._paginas._entradas if e.__class__ is tuple]
+        assert almacen._tamano <= 3 * 8 * max(tamano for _, tamano in guardadas)
+    else:
+        assert len(almacen._bloques) == 8
+
+
+def test_las_copias_conservan_los_bloques_compartidos():
+    memoria = MemoriaVirtual(64, 1, "FIFO", tamano_pagina=8)
+    for posicion in range(0, 64, 8):
+        memoria.asignar_valor(posicion, "original")
+    copia = memoria.copiar()
+    for vuelta in range(20):
+        for posicion in range(0, 64, 8):
+            copia.asignar_valor(posicion, vuelta)
+    assert [memoria.valor(p) for p in range(0, 64, 8)] == ["original"] * 8
+    assert [copia.valor(p) for p in range(0, 64, 8)] == [19] * 8
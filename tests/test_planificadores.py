@@ -0,0 +1,106 @@
+import pytest
+
+from chmaquina.maquina import Maquina
+from chmaquina.planificadores import (
+    PLANIFICADORES,
+    FCFS,
+    MultinivelRetroalimentado,
+    Planificador,
+    Prioridad,
+    planificador_para,
+    registrar,
+)
+
+
+class TecladoFalso:
+    def lea(self):
+        return "1"
+
+
+def programa_de(sumas):
+    return "\n".join(["nueva var I 1"] + ["sume var"] * sumas + ["retorne 0"])
+
+
+def cargar(maquina, *programas):
+    estado = maquina.encender()
+    for programa in programas:
+        estado = maquina.cargar(estado, programa)
+    return estado
+
+
+def orden_de_terminacion(maquina, estado):
+    orden = []
+    for estado in maquina.iterar(estado):
+        for nombre in estado.terminados:
+            if nombre not in orden:
+                orden.append(nombre)
+    return orden
+
+
+def test_planificador_por_nombre():
+    assert isinstance(planificador_para("FCFS"), FCFS)
+    planificador = Prioridad()
+    assert planificador_para(planificador) is planificador
+    with pytest.raises(ValueError):
+        planificador_para("NO-EXISTE")
+
+
+def test_maquina_con_planificador():
+    maquina = Maquina(1024, 128, algoritmo=Prioridad({"001": 0}, por_defecto=1))
+    assert maquina.algoritmo == "PRIORIDAD"
+
+
+def test_srtf_expropia_al_llegar_un_programa_mas_corto():
+    maquina = Maquina(1024, 128, teclado=TecladoFalso(), algoritmo="SRTF")
+    # el primero es largo, el segundo llega en el tiempo 6 y es más corto
+    estado = cargar(maquina, programa_de(20), programa_de(2))
+    assert orden_de_terminacion(maquina, estado) == ["001", "000"]
+
+
+def test_sjf_no_expropia():
+    maquina = Maquina(1024, 128, teclado=TecladoFalso(), algoritmo="SJF")
+    estado = cargar(maquina, programa_de(20), programa_de(2))
+    assert orden_de_terminacion(maquina, estado) == ["000", "001"]
+
+
+def test_prioridad():
+    maquina = Maquina(
+        1024,
+        128,
+        teclado=TecladoFalso(),
+        algoritmo=Prioridad({"002": 0}, por_defecto=5),
+    )
+    estado = cargar(maquina, programa_de(1), programa_de(1), programa_de(1))
+    estado.reloj = estado.tiempo_llegada
+    estado = maquina.planear(estado)
+    assert estado.listos == ["002", "000", "001"]
+
+
+def test_multinivel_baja_de_nivel_al_agotar_el_quantum():
+    maquina = Maquina(
+        1024,
+        128,
+        teclado=TecladoFalso(),
+        algoritmo=MultinivelRetroalimentado((2, 4)),
+    )
+    estado = cargar(maquina, programa_de(10), programa_de(1))
+    niveles = set()
+    for estado in maquina.iterar(estado):
+        if "000" in estado.listos:
+            niveles.add(estado.listos.nivel("000"))
+    assert niveles == {0, 1}
+    assert set(estado.terminados) == {"000", "001"}
+
+
+def test_registrar_planificador():
+    @registrar
+    class Ultimo(Planificador):
+        nombre = "ULTIMO"
+
+        def nueva_cola(self):
+            return FCFS().nueva_cola()
+
+    try:
+        assert Maquina(1024, 128, algoritmo="ULTIMO").algoritmo == "ULTIMO"
+    finally:
+        del PLANIFICADORES["ULTIMO"]
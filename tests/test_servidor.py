@@ -0,0 +1,79 @@
+import asyncio
+
+from chmaquina.servidor import Servidor
+
+DOBLE = "\n".join(
+    [
+        "nueva dato I 0",
+        "nueva dos I 2",
+        "lea dato",
+        "cargue dato",
+        "multiplique dos",
+        "almacene dato",
+        "imprima dato",
+        "retorne 0",
+    ]
+)
+
+
+async def sesion(puerto, programa, *entradas):
+    lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+    escritor.write(f"{programa}\n.\n".encode())
+    for entrada in entradas:
+        escritor.write(f"{entrada}\n".encode())
+    escritor.write_eof()
+    respuesta = (await lector.read()).decode().splitlines()
+    escritor.close()
+    return respuesta
+
+
+def servir(*sesiones):
+    async def correr():
+        servidor = Servidor(cada=10)
+        escuchando = await servidor.iniciar()
+        puerto = escuchando.sockets[0].getsockname()[1]
+        async with escuchando:
+            return await asyncio.gather(
+                *(sesion(puerto, *argumentos) for argumentos in sesiones)
+            )
+
+    return asyncio.run(correr())
+
+
+def test_muchas_sesiones_a_la_vez():
+    respuestas = servir(*((DOBLE, numero) for numero in range(50)))
+    for numero, respuesta in enumerate(respuestas):
+        assert respuesta[0] == f"[000] {float(numero * 2)}"
+        assert respuesta[1].startswith("fin ")
+
+
+def test_programa_invalido():
+    (respuesta,) = servir(("no es un programa",))
+    assert len(respuesta) == 1
+    assert respuesta[0].startswith("error ")
+
+
+def test_sin_entrada():
+    (respuesta,) = servir((DOBLE,))
+    assert respuesta == ["error Se acabó la entrada con programas esperando un lea"]
+
+
+def test_entrada_que_no_es_un_numero():
+    (respuesta,) = servir((DOBLE, "hola"))
+    assert len(respuesta) == 1
+    assert respuesta[0].startswith("error ")
+
+
+def test_programa_que_no_es_texto():
+    async def correr():
+        escuchando = await Servidor().iniciar()
+        puerto = escuchando.sockets[0].getsockname()[1]
+        async with escuchando:
+            lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+            escritor.write(b"nueva a I 1\n\xff\xfe\n.\n")
+            escritor.write_eof()
+            respuesta = (await lector.read()).decode().splitlines()
+            escritor.close()
+            return respuesta
+
+    assert asyncio.run(correr()) == ["error El programa no es texto UTF-8"]
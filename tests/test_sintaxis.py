@@ -1,6 +1,14 @@
 import pytest
 
-from chmaquina.sintaxis import verificar, ErrorDeSintaxis
+from chmaquina.sintaxis import (
+    CacheDeVerificacion,
+    Diagnostico,
+    ErrorDeSintaxis,
+    VerificadorCh,
+    diagnosticar,
+    estimar,
+    verificar,
+)
 
 
 @pytest.fixture
@@ -163,6 +171,12 @@ def test_retorne_con_parametros_validos():
     verificar("retorne 1")
 
 
+@pytest.mark.parametrize("linea", ["ret", "e", "torne 0"])
+def test_retorne_incompleto(linea):
+    with pytest.raises(ErrorDeSintaxis):
+        verificar(linea)
+
+
 def test_operacion_desconocida():
     with pytest.raises(ErrorDeSintaxis):
         verificar("operacion desconocida")
@@ -209,3 +223,109 @@ def test_verificar_remueve_espacios_en_codigo():
 def test_verificar_no_remueve_espacios_en_cadenas():
     codigo, *_ = verificar("nueva  variable     C  hola que    hace  ")
     assert codigo[0] == "nueva variable C hola que    hace  "
+
+
+def test_cache_de_verificacion(factorial):
+    cache = CacheDeVerificacion()
+    primero = cache.analizar(factorial)
+    assert cache.analizar(factorial) is primero
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+    assert primero.verificado == verificar(factorial)
+    assert primero.rafaga == estimar(primero.verificado.codigo)
+
+
+def test_cache_no_guarda_errores():
+    cache = CacheDeVerificacion()
+    for _ in range(2):
+        with pytest.raises(ErrorDeSintaxis):
+            cache.verificar("operacion desconocida")
+    assert (len(cache), cache.fallos) == (0, 2)
+
+
+def test_cache_descarta_el_menos_usado():
+    cache = CacheDeVerificacion(capacidad=2)
+    cache.verificar("retorne 1")
+    cache.verificar("retorne 2")
+    cache.verificar("retorne 1")
+    cache.verificar("retorne 3")
+    assert len(cache) == 2
+    cache.verificar("retorne 1")
+    cache.verificar("retorne 2")
+    assert (cache.aciertos, cache.fallos) == (2, 4)
+
+
+def test_cache_en_disco(tmp_path, factorial):
+    ruta = tmp_path / "cache.json"
+    cache = CacheDeVerificacion(ruta=ruta)
+    cache.verificar(factorial)
+    cache.guardar()
+    otra = CacheDeVerificacion(ruta=ruta)
+    assert otra.verificar(factorial) == verificar(factorial)
+    assert (otra.aciertos, otra.fallos) == (1, 0)
+
+
+def test_cache_en_disco_danada(tmp_path):
+    ruta = tmp_path / "cache.json"
+    for contenido in (
+        b"basura",
+        b"\xff\xfe",
+        b"[]",
+        b'{"version": 2, "entradas": [[1, 2]]}',
+        b'{"version": 2, "entradas": [["a", "b", [], [], 1]]}',
+        b'{"version": 2, "entradas": [["a", [], [["x", 1]], [], 1]]}',
+    ):
+        ruta.write_bytes(contenido)
+        assert len(CacheDeVerificacion(ruta=ruta)) == 0
+
+
+def test_verificar_reporta_todos_los_errores():
+    programa = "nueva a I 1\ncargue b\nretorne hola\nvaya fin"
+    with pytest.raises(ErrorDeSintaxis) as error:
+        verificar(programa)
+    mensaje = str(error.value)
+    assert "En la linea 2: cargue b" in mensaje
+    assert "En la linea 3: retorne hola" in mensaje
+    assert "la etiqueta 'fin'" in mensaje
+
+
+def test_verificar_flujo_desde_archivo(tmp_path, factorial):
+    ruta = tmp_path / "factorial.ch"
+    ruta.write_text(factorial)
+    verificador = VerificadorCh(None)
+    with open(ruta) as archivo:
+        lineas = list(verificador.verificar_flujo(archivo))
+    codigo, variables, etiquetas = verificar(factorial)
+    assert lineas == codigo
+    assert verificador.contexto.variables == variables
+    assert verificador.contexto.etiquetas == etiquetas
+
+
+def test_verificar_flujo_produce_lineas_a_medida_que_lee():
+    leidas = []
+
+    def fuente():
+        for linea in ["nueva a I 1\n", "cargue a\n", "retorne 0\n"]:
+            leidas.append(linea)
+            yield linea
+
+    flujo = VerificadorCh(None).verificar_flujo(fuente())
+    assert next(flujo) == "nueva a I 1"
+    assert len(leidas) == 1
+    assert list(flujo) == ["cargue a", "retorne 0", ""]
+
+
+def test_diagnosticar_programa_valido(factorial):
+    assert diagnosticar(factorial) == []
+
+
+def test_diagnosticar_todos_los_errores():
+    programa = "\n".join(
+        ["nueva a I 1", "cargue   b", "nueva c X", "vayasi fin otra", "retorne 0"]
+    )
+    no_definida = "La variable 'b' no está definida antes de usarla"
+    assert diagnosticar(programa) == [
+        Diagnostico(2, 10, "cargue   b", no_definida),
+        Diagnostico(3, 9, "nueva c X", "X no es un tipo válido"),
+        Diagnostico(4, 8, "vayasi fin otra", "No se ha definido la etiqueta 'fin'"),
+        Diagnostico(4, 12, "vayasi fin otra", "No se ha definido la etiqueta 'otra'"),
+    ]
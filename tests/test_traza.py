@@ -0,0 +1,223 @@
+import pytest
+
+from chmaquina.entrada import EntradaProgramada
+from chmaquina.errores import TrazaInvalida
+from chmaquina.instrucciones import Operacion
+from chmaquina.latencia import LatenciaFija
+from chmaquina.maquina import Maquina
+from chmaquina.traza import (
+    ENTRADA,
+    INSTRUCCION,
+    MEMORIA,
+    EscritorDeTraza,
+    LectorDeTraza,
+    main,
+)
+from chmaquina.tipos import convertir, formatear
+
+CALCULO = "\n".join(
+    [
+        "nueva n I 20",
+        "nueva uno I 1",
+        "nueva texto C hola",
+        "cargue n",
+        "reste uno",
+        "almacene n",
+        "vayasi itere fin",
+        "etiqueta itere 4",
+        "etiqueta fin 9",
+        "muestre n",
+        "imprima texto",
+        "retorne 0",
+    ]
+)
+
+LECTOR = "\n".join(["nueva dato I 0", "lea dato", "muestre dato", "retorne 0"])
+
+
+def correr_con_traza(ruta, *programas, tamano_bloque=1 << 16, **opciones):
+    with EscritorDeTraza(ruta, tamano_bloque) as traza:
+        maquina = Maquina(1024, 128, algoritmo="RR", quantum=3, traza=traza, **opciones)
+        inicial = maquina.encender()
+        for programa in programas:
+            inicial = maquina.cargar(inicial, programa)
+        final = maquina.correr(inicial)
+    return inicial, final
+
+
+def test_registra_cada_instruccion(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    inicial, final = correr_con_traza(ruta, CALCULO, latencia=LatenciaFija(2))
+    with LectorDeTraza(ruta) as lector:
+        registros = list(lector)
+    assert len(registros) == len(lector)
+    assert [r.numero for r in registros] == list(range(len(registros)))
+    # La carga del programa se registra completa antes de ejecutarlo
+    assert registros[0].tipo == MEMORIA
+    registros = [r for r in registros if r.tipo == INSTRUCCION]
+    assert registros[0].operacion is Operacion.NUEVA
+    assert registros[-1].operacion is Operacion.RETORNE
+
+    cargue = next(r for r in registros if r.operacion is Operacion.CARGUE)
+    acumulador = inicial.variables["000"]["acumulador"]
+    assert cargue.escrituras == ((acumulador, 20),)
+    assert cargue.duracion == 2
+
+    eventos = [evento for registro in registros for evento in registro.eventos]
+    assert eventos == [("pantalla", "0.0"), ("impresora", "hola")]
+    assert registros[-1].reloj == final.reloj
+
+
+def test_reproducir_sin_la_maquina(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    inicial, final = correr_con_traza(ruta, CALCULO, CALCULO, tamano_bloque=64)
+    with LectorDeTraza(ruta) as lector:
+        assert lector.bloques > 1
+        reproducido = lector.reproducir(inicial)
+        assert reproducido.memoria == final.memoria
+        assert reproducido.pantalla == final.pantalla
+        assert reproducido.impresora == final.impresora
+        assert reproducido.reloj == final.reloj
+
+        mitad = lector.reproducir(inicial, hasta=len(lector) // 2)
+    assert inicial.memoria != mitad.memoria
+    assert not inicial.pantalla
+
+
+def test_buscar(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    correr_con_traza(ruta, CALCULO, CALCULO, tamano_bloque=100)
+    with LectorDeTraza(ruta) as lector:
+        registros = list(lector)
+        for numero in (0, 1, 57, len(lector) - 1):
+            assert lector[numero] == registros[numero]
+            assert list(lector.registros(numero, numero + 3)) == registros[
+                numero : numero + 3
+            ]
+        assert lector[-1] == registros[-1]
+        with pytest.raises(IndexError):
+            lector[len(lector)]
+
+        reloj = registros[80].reloj
+        numero = lector.buscar_reloj(reloj)
+        assert registros[numero].reloj >= reloj
+        assert registros[numero - 1].reloj < reloj
+        assert lector.buscar_reloj(10 ** 9) == len(lector)
+
+
+def test_entrada_de_un_programa_bloqueado(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    inicial, final = correr_con_traza(
+        ruta,
+        LECTOR,
+        latencia=LatenciaFija(1),
+        entrada=EntradaProgramada(["42"]),
+    )
+    dato = inicial.variables["000"]["dato"]
+    with LectorDeTraza(ruta) as lector:
+        registros = list(lector)
+        assert lector.reproducir(inicial).memoria == final.memoria
+    lea = next(r for r in registros if r.operacion is Operacion.LEA)
+    assert lea.tipo == INSTRUCCION and lea.escrituras == ()
+    (entrada,) = [r for r in registros if r.tipo == ENTRADA]
+    assert entrada.escrituras == ((dato, 42),)
+    assert entrada.eventos == (("entrada", "42"),)
+
+
+def test_valores_de_todos_los_tipos(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    valores = [None, True, False, -3, 2 ** 70, 0.5, "ñandú", ""]
+    with EscritorDeTraza(ruta) as traza:
+        for posicion, valor in enumerate(valores):
+            escrituras = [(posicion, valor)]
+            traza.instruccion(posicion, "007", 1, Operacion.CARGUE, 1, escrituras)
+    with LectorDeTraza(ruta) as lector:
+        leidos = [registro.escrituras[0][1] for registro in lector]
+        assert {registro.programa for registro in lector} == {"007"}
+    assert leidos == valores
+    assert [type(valor) for valor in leidos] == [type(valor) for valor in valores]
+
+
+def test_numeros_escritos_y_celdas(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    entero, real = convertir("I", "007"), convertir("R", "3")
+    celda = {"nombre": "n", "programa": "000", "tipo": "I", "valor": entero}
+    with EscritorDeTraza(ruta) as traza:
+        traza.instruccion(0, "000", 1, Operacion.CARGUE, 1, [(1, entero), (2, real)])
+        traza.celdas(1, None, [(3, celda), (4, {})])
+        with pytest.raises(TypeError):
+            traza.instruccion(2, "000", 1, Operacion.CARGUE, 1, [(5, object())])
+    with LectorDeTraza(ruta) as lector:
+        instruccion, memoria = lector
+    assert [formatear(valor) for _, valor in instruccion.escrituras] == ["007", "3"]
+    assert memoria.escrituras == ((3, celda), (4, {}))
+    assert formatear(memoria.escrituras[0][1]["valor"]) == "007"
+
+
+def test_etiqueta_de_valor_desconocida(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    with EscritorDeTraza(ruta) as traza:
+        traza.instruccion(0, "000", 1, Operacion.CARGUE, 1, [(1, "x")])
+    datos = bytearray(ruta.read_bytes())
+    # La etiqueta de la cadena va justo antes de su longitud y su texto
+    datos[datos.index(b"\x05\x01\x00\x00\x00x")] = 200
+    ruta.write_bytes(bytes(datos))
+    with LectorDeTraza(ruta) as lector:
+        with pytest.raises(TrazaInvalida):
+            list(lector)
+
+
+def test_bloque_incompleto_y_archivo_invalido(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    correr_con_traza(ruta, CALCULO, tamano_bloque=64)
+    with LectorDeTraza(ruta) as lector:
+        completos = lector.bloques
+    ruta.write_bytes(ruta.read_bytes()[:-10])
+    with LectorDeTraza(ruta) as lector:
+        assert lector.bloques == completos - 1
+
+    otro = tmp_path / "otro.bin"
+    otro.write_bytes(b"no es una traza")
+    with pytest.raises(TrazaInvalida):
+        LectorDeTraza(otro)
+
+
+def test_main(tmp_path, capsys):
+    ruta = tmp_path / "traza.bin"
+    correr_con_traza(ruta, CALCULO)
+    assert main([str(ruta), "--desde", "3", "-n", "2"]) == 0
+    lineas = capsys.readouterr().out.splitlines()
+    assert len(lineas) == 2
+    assert lineas[0].startswith("3 ")
+    assert main([str(tmp_path / "no-existe")]) == 1
+
+
+def test_reproducir_con_liberar_y_compactar(tmp_path):
+    ruta = tmp_path / "traza.bin"
+    corto = "\n".join(["nueva uno I 1", "muestre uno", "retorne 0"])
+    with EscritorDeTraza(ruta) as traza:
+        maquina = Maquina(
+            60,
+            9,
+            algoritmo="RR",
+            quantum=3,
+            latencia=LatenciaFija(1),
+            liberar_al_terminar=True,
+            compactacion=True,
+            traza=traza,
+        )
+        inicial = maquina.encender()
+        estado = maquina.cargar(inicial, corto)
+        estado = maquina.cargar(estado, CALCULO)
+        estado = maquina.cargar(estado, corto)
+        estado = maquina.correr(estado, pasos=12)
+        assert "000" in estado.terminados
+        # No cabe en ningún hueco: se compacta mientras los demás siguen cargados
+        estado = maquina.cargar(estado, CALCULO)
+        estado = maquina.compactar(estado)
+        final = maquina.correr(estado)
+    with LectorDeTraza(ruta) as lector:
+        assert any(registro.tipo == MEMORIA for registro in lector)
+        reproducido = lector.reproducir(inicial)
+    assert reproducido.memoria == final.memoria
+    assert reproducido.pantalla == final.pantalla
@@ -0,0 +1,30 @@
+import json
+import pathlib
+
+from chmaquina.verificacion import main
+
+EJEMPLOS = pathlib.Path(__file__).parent.parent / "ejemplos"
+
+
+def test_programas_validos(capsys):
+    assert main([str(EJEMPLOS / "factorial.ch"), str(EJEMPLOS / "peq.ch")]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_errores_en_json(tmp_path, capsys):
+    programa = tmp_path / "errores.ch"
+    programa.write_text("nueva x R o\nlea x\nvaya fin\n")
+    assert main(["--json", str(programa)]) == 1
+    resultado, = json.loads(capsys.readouterr().out)
+    assert resultado["archivo"] == str(programa)
+    assert not resultado["valido"]
+    assert [(d["linea"], d["columna"]) for d in resultado["diagnosticos"]] == [
+        (1, 11),
+        (2, 5),
+        (3, 6),
+    ]
+
+
+def test_archivo_inexistente(tmp_path, capsys):
+    assert main([str(tmp_path / "no_existe.ch")]) == 1
+    assert "No se pudo leer" in capsys.readouterr().out